@@ -23,6 +23,19 @@ whitelist=(
   v4/CHANGELOG.md
   v4/hakpak4.py
   v4/hakpak4_core.py
+  v4/catalog.py
+  v4/catalog_sqlite.py
+  v4/catalog_columns.py
+  v4/catalog_search.py
+  v4/catalog_query.py
+  v4/pkgcache.py
+  v4/pkgindex.py
+  v4/install_scheduler.py
+  v4/gitmirror.py
+  v4/wheelhouse.py
+  v4/venvbase.py
+  v4/downloadcache.py
+  v4/toolcaches.py
   v4/version.py
   v4/VERSION
   v4/hakpak4.sh
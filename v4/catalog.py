@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Tool Catalog
+Parses kali-tools-db.yaml into Tool objects and keeps a compiled copy of the
+result under HAKPAK4_ROOT/cache.  The compiled artifact is keyed by the YAML
+file's mtime, size and SHA-256, so the (slow, pure-Python) YAML parse only
+runs again when the database actually changes.
+
+``ToolCatalog.get()`` is the process-wide view shared by the menus, the
+``-t`` runner and the GUI.  It re-checks kali-tools-db.yaml and state.json
+with a stat() on each access and reloads only what changed.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import stat
+import struct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from hakpak4 import (
+    CACHE_DIR,
+    KALI_TOOLS_PATH,
+    PATH_INDEX,
+    STATE_FILE,
+    CompatibilityScorer,
+    InstallParams,
+    SystemInfo,
+    Tool,
+    ToolCategory,
+    ToolMetrics,
+)
+
+
+CATALOG_CACHE_PATH = CACHE_DIR / "kali-tools-db.cache"
+
+# "memory" (default) filters with the bitmap columns in catalog_columns.py;
+# "sqlite" answers filters and searches from the indexed backend in
+# catalog_sqlite.py.
+CATALOG_BACKEND = os.environ.get("HAKPAK4_CATALOG_BACKEND", "memory").lower()
+
+# Bump whenever the layout of the compiled payload changes.
+_FORMAT_VERSION = 2
+_MAGIC = b"HPK4CAT"
+_PREFIX = struct.Struct("<7sBQ")  # magic, format version, header length
+
+# Keys that mark a top-level YAML entry as a single tool rather than a group.
+_TOOL_SPEC_KEYS = ("binary", "description", "packages", "metrics", "tags")
+
+# Group label used for tools declared directly at the top level.
+_TOP_LEVEL_GROUP = "Utilities"
+
+
+@dataclass
+class CompiledCatalog:
+    """Parsed tool database plus the fingerprint it was compiled from"""
+    tools: Dict[str, Tool]
+    groups: Dict[str, str]  # tool name -> display group label
+    sha256: str
+
+
+# ── YAML -> Tool conversion ───────────────────────────────────────────────────
+
+def format_group_label(group_name: str) -> str:
+    """Turn a YAML group key (e.g. ``web_application``) into a display label"""
+    return group_name.replace("_", " ").strip().title()
+
+
+def _tool_from_spec(name: str, spec: Dict) -> Tool:
+    metrics_data = spec.get("metrics", {})
+    return Tool(
+        name=name,
+        binary=spec.get("binary", name),
+        category=ToolCategory.STANDARD,
+        description=spec.get("description", ""),
+        packages=spec.get("packages", {}),
+        source=spec.get("source"),
+        dependencies=spec.get("dependencies", []),
+        metrics=ToolMetrics(
+            estimated_size_mb=metrics_data.get("estimated_size_mb", 10.0),
+            dependencies_size_mb=metrics_data.get("dependencies_size_mb", 5.0),
+            ram_required_mb=metrics_data.get("ram_required_mb", 128),
+            compatibility_score=0  # Will be calculated
+        ),
+        kali_metapackage=spec.get("kali_metapackage"),
+        tags=spec.get("tags", [])
+    )
+
+
+def parse_tool_db(data: Dict) -> Tuple[Dict[str, Tool], Dict[str, str]]:
+    """Convert the raw YAML mapping into ``(tools, groups)``"""
+    tools: Dict[str, Tool] = {}
+    groups: Dict[str, str] = {}
+    for category, category_tools in (data or {}).items():
+        if not isinstance(category_tools, dict):
+            continue
+
+        # If this looks like a single tool spec (top-level tool), load it directly
+        if any(key in category_tools for key in _TOOL_SPEC_KEYS):
+            tools[category] = _tool_from_spec(category, category_tools)
+            groups[category] = _TOP_LEVEL_GROUP
+            continue
+
+        # Otherwise, treat as a category with tools inside
+        label = format_group_label(category)
+        for name, spec in category_tools.items():
+            if not isinstance(spec, dict):
+                continue
+            tools[name] = _tool_from_spec(name, spec)
+            groups[name] = label
+
+    return tools, groups
+
+
+# ── Compiled cache ────────────────────────────────────────────────────────────
+#
+# Layout:  prefix (magic, format, header length)
+#          header  pickled {mtime_ns, size, sha256, groups, index}
+#          blobs   one pickled Tool per entry; index maps name -> (offset, length)
+#
+# The per-tool blobs let ``load_tool()`` deserialise a single spec for
+# ``hakpak4 -t <tool>`` without materialising the whole catalog.
+
+class _CompiledFile:
+    """Read-only, memory-mapped view of a compiled catalog file"""
+
+    def __init__(self, mm: mmap.mmap, header: Dict, base: int):
+        self._mm = mm
+        self.header = header
+        self._base = base
+
+    @classmethod
+    def open(cls, cache_path: Path) -> Optional["_CompiledFile"]:
+        """Map the cache file, or None if missing/corrupt/untrusted"""
+        try:
+            with open(cache_path, "rb") as f:
+                st = os.fstat(f.fileno())
+                # Never unpickle a file that other users could have tampered with.
+                if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                    return None
+                if st.st_uid not in (0, os.getuid()):
+                    return None
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, fmt, header_len = _PREFIX.unpack_from(mm, 0)
+            if magic != _MAGIC or fmt != _FORMAT_VERSION:
+                return None
+            header = pickle.loads(mm[_PREFIX.size:_PREFIX.size + header_len])
+        except Exception:
+            return None
+        return cls(mm, header, _PREFIX.size + header_len)
+
+    def matches(self, st: os.stat_result) -> bool:
+        return self.header["size"] == st.st_size and self.header["mtime_ns"] == st.st_mtime_ns
+
+    def blob(self, name: str) -> Optional[bytes]:
+        entry = self.header["index"].get(name)
+        if entry is None:
+            return None
+        offset, length = entry
+        start = self._base + offset
+        return self._mm[start:start + length]
+
+    def load_tool(self, name: str) -> Optional[Tool]:
+        data = self.blob(name)
+        return pickle.loads(data) if data is not None else None
+
+    def load_all(self) -> CompiledCatalog:
+        tools = {name: pickle.loads(self.blob(name)) for name in self.header["index"]}
+        return CompiledCatalog(tools, self.header["groups"], self.header["sha256"])
+
+
+def _write_cache(cache_path: Path, st: os.stat_result, sha256: str,
+                 groups: Dict[str, str], blobs: Dict[str, bytes]):
+    """Atomically write the compiled catalog; failures are non-fatal"""
+    import tempfile
+
+    index: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for name, data in blobs.items():
+        index[name] = (offset, len(data))
+        offset += len(data)
+    header = pickle.dumps({
+        "mtime_ns": st.st_mtime_ns,
+        "size":     st.st_size,
+        "sha256":   sha256,
+        "groups":   groups,
+        "index":    index,
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".catalog-", dir=str(cache_path.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_PREFIX.pack(_MAGIC, _FORMAT_VERSION, len(header)))
+                f.write(header)
+                for data in blobs.values():
+                    f.write(data)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, cache_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        # Read-only HAKPAK4_ROOT (e.g. non-root user): just skip caching.
+        pass
+
+
+def load_compiled_catalog(db_path: Path = KALI_TOOLS_PATH,
+                          cache_path: Path = CATALOG_CACHE_PATH) -> CompiledCatalog:
+    """
+    Return the parsed tool database, using the compiled cache when it matches.
+
+    The cache is accepted without hashing when mtime and size are unchanged.
+    If only the mtime moved (touch, checkout, copy), the content hash decides
+    and the cache header is refreshed instead of re-parsing the YAML.
+    """
+    if not db_path.exists():
+        raise SystemExit(f"Kali tools database not found: {db_path}")
+
+    st = db_path.stat()
+    cached = _CompiledFile.open(cache_path)
+    if cached and cached.matches(st):
+        return cached.load_all()
+
+    raw = db_path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached.header["sha256"] == digest:
+        blobs = {name: cached.blob(name) for name in cached.header["index"]}
+        _write_cache(cache_path, st, digest, cached.header["groups"], blobs)
+        return cached.load_all()
+
+    try:
+        import yaml
+    except ImportError:
+        raise SystemExit("PyYAML is required. Install with: pip install pyyaml")
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    tools, groups = parse_tool_db(yaml.load(raw, Loader=loader) or {})
+    blobs = {name: pickle.dumps(tool, protocol=pickle.HIGHEST_PROTOCOL)
+             for name, tool in tools.items()}
+    _write_cache(cache_path, st, digest, groups, blobs)
+    return CompiledCatalog(tools, groups, digest)
+
+
+def load_tool(name: str, db_path: Path = KALI_TOOLS_PATH,
+              cache_path: Path = CATALOG_CACHE_PATH) -> Optional[Tool]:
+    """
+    Look up a single tool, deserialising only its own entry when the compiled
+    cache is current.  Falls back to a full (re)compile otherwise.
+    """
+    try:
+        st = db_path.stat()
+    except OSError:
+        raise SystemExit(f"Kali tools database not found: {db_path}")
+    cached = _CompiledFile.open(cache_path)
+    if cached and cached.matches(st):
+        return cached.load_tool(name)
+    return load_compiled_catalog(db_path, cache_path).tools.get(name)
+
+
+# ── Shared catalog ────────────────────────────────────────────────────────────
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ToolCatalog:
+    """
+    Process-wide tool database + install state with change-driven reloads.
+
+    Derived indexes (tag index, binary index, and anything registered through
+    ``derived()``) are memoised per ``generation`` and dropped automatically
+    whenever kali-tools-db.yaml changes.  state.json has its own
+    ``state_generation`` so installs do not throw away database indexes.
+    """
+
+    _instance: Optional["ToolCatalog"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, db_path: Path = KALI_TOOLS_PATH, state_path: Path = STATE_FILE,
+                 cache_path: Path = CATALOG_CACHE_PATH):
+        self.db_path = db_path
+        self.state_path = state_path
+        self.cache_path = cache_path
+        self.generation = 0
+        self.state_generation = 0
+        self._lock = threading.RLock()
+        self._db_sig = None
+        self._state_sig = None
+        self._compiled: Optional[CompiledCatalog] = None
+        self._state: Dict = {}
+        self._state_loaded = False
+        self._derived: Dict[str, object] = {}
+
+    @classmethod
+    def get(cls) -> "ToolCatalog":
+        """Return the shared catalog for this process"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def refresh(self) -> bool:
+        """Reload whatever changed on disk; returns True if anything did"""
+        db_changed = self._refresh_db()
+        state_changed = self._refresh_state()
+        return db_changed or state_changed
+
+    def _refresh_db(self) -> bool:
+        with self._lock:
+            db_sig = _file_signature(self.db_path)
+            if self._compiled is not None and db_sig == self._db_sig:
+                return False
+            self._compiled = load_compiled_catalog(self.db_path, self.cache_path)
+            self._db_sig = db_sig
+            self.generation += 1
+            self._derived.clear()
+            return True
+
+    def _refresh_state(self) -> bool:
+        with self._lock:
+            state_sig = _file_signature(self.state_path)
+            if self.state_generation and state_sig == self._state_sig:
+                return False
+            self._state, self._state_loaded = self._read_state()
+            # A torn/invalid read (e.g. mid-write by another process) is
+            # retried on the next access instead of being pinned.
+            self._state_sig = state_sig if self._state_loaded else None
+            self.state_generation += 1
+            return True
+
+    def _read_state(self) -> Tuple[Dict, bool]:
+        if not self.state_path.exists():
+            return {"installed": {}, "custom": {}}, False
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f), True
+        except Exception:
+            return {"installed": {}, "custom": {}}, False
+
+    # ── Data ──────────────────────────────────────────────────────────────────
+
+    @property
+    def tools(self) -> Dict[str, Tool]:
+        self._refresh_db()
+        return self._compiled.tools
+
+    @property
+    def groups(self) -> Dict[str, str]:
+        self._refresh_db()
+        return self._compiled.groups
+
+    @property
+    def state(self) -> Dict:
+        """Read-only snapshot of state.json (use StateManager to modify)"""
+        self._refresh_state()
+        return self._state
+
+    @property
+    def state_loaded(self) -> bool:
+        self._refresh_state()
+        return self._state_loaded
+
+    def tool(self, name: str) -> Optional[Tool]:
+        """Single-tool lookup that avoids loading the full catalog if possible"""
+        with self._lock:
+            if self._compiled is not None and _file_signature(self.db_path) == self._db_sig:
+                return self._compiled.tools.get(name)
+        return load_tool(name, self.db_path, self.cache_path)
+
+    def installed_names(self) -> Set[str]:
+        return set(self.state.get("installed", {}))
+
+    def custom_names(self) -> List[str]:
+        return list(self.state.get("custom", {}))
+
+    def installed_sources(self, package_manager: Optional[str],
+                          which: Callable[[str], Optional[str]] = PATH_INDEX.which) -> Dict[str, str]:
+        """
+        tool name -> how it was found installed: "state" (recorded by HakPak4),
+        "package" (its native package is in the local package database) or
+        "path" (binary on PATH; only checked for tools the database can't answer).
+        """
+        from pkgindex import installed_packages
+
+        sources = dict.fromkeys(self.state.get("installed", {}), "state")
+        installed = installed_packages(package_manager) if package_manager else None
+        owners: Dict[str, List[str]] = {}
+        if installed is not None:
+            owners = self.by_package().get(package_manager, {})
+            for package in owners.keys() & installed.keys():
+                for name in owners[package]:
+                    sources.setdefault(name, "package")
+        for name, tool in self.tools.items():
+            if name not in sources and tool.packages.get(package_manager) not in owners:
+                if which(tool.binary or name):
+                    sources[name] = "path"
+        return sources
+
+    # ── Derived indexes ───────────────────────────────────────────────────────
+
+    def derived(self, key: str, builder: Callable[["ToolCatalog"], object]):
+        """Memoise ``builder(self)`` until kali-tools-db.yaml next changes"""
+        self._refresh_db()
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self)
+            return self._derived[key]
+
+    def by_tag(self) -> Dict[str, List[str]]:
+        """tag -> sorted tool names"""
+        def build(cat: "ToolCatalog") -> Dict[str, List[str]]:
+            index: Dict[str, List[str]] = {}
+            for name in sorted(cat._compiled.tools):
+                for tag in cat._compiled.tools[name].tags:
+                    index.setdefault(tag, []).append(name)
+            return index
+        return self.derived("by_tag", build)
+
+    def by_binary(self) -> Dict[str, str]:
+        """binary name -> tool name"""
+        return self.derived("by_binary", lambda cat: {
+            tool.binary: name for name, tool in cat._compiled.tools.items()
+        })
+
+    def by_package(self) -> Dict[str, Dict[str, List[str]]]:
+        """package manager -> native package -> tool names"""
+        def build(cat: "ToolCatalog") -> Dict[str, Dict[str, List[str]]]:
+            index: Dict[str, Dict[str, List[str]]] = {}
+            for name in sorted(cat._compiled.tools):
+                for pm, package in cat._compiled.tools[name].packages.items():
+                    index.setdefault(pm, {}).setdefault(package, []).append(name)
+            return index
+        return self.derived("by_package", build)
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+
+    def sqlite(self):
+        """The SQLite backend for the current database, or None if not enabled"""
+        if CATALOG_BACKEND != "sqlite":
+            return None
+
+        def build(cat: "ToolCatalog"):
+            from catalog_sqlite import SqliteCatalog
+            return SqliteCatalog.open(cat._compiled)
+        return self.derived("sqlite", build)
+
+    def columns(self):
+        """Columnar view (size/RAM columns, package and tag bitmaps) of the catalog"""
+        def build(cat: "ToolCatalog"):
+            from catalog_columns import ColumnarView
+            return ColumnarView(cat._compiled.tools, cat.generation)
+        return self.derived("columns", build)
+
+    def filter_tools(self, params: InstallParams, system_info: SystemInfo) -> List[Tool]:
+        """Tools matching ``params``, in catalog order"""
+        tools = self.tools
+        backend = self.sqlite()
+        if backend is not None:
+            names = backend.filter_names(params, system_info)
+        else:
+            view = self.columns()
+            names = view.names_in(view.filter_mask(params, system_info))
+        return [tools[name] for name in names if name in tools]
+
+    def scores(self, tools: List[Tool], system_info: SystemInfo, generation: int) -> Dict[str, int]:
+        """
+        Compatibility scores for ``tools`` read from this catalog at
+        ``generation``.  Long lists use the columnar score table (memoised per
+        system fingerprint); short lists, and tools from an older generation,
+        are scored one by one.
+        """
+        view = self.columns()
+        table = None
+        if view.generation == generation and (
+                len(tools) * 4 >= len(view.names) or view.has_score_table(system_info)):
+            table = view.score_table(system_info)
+        return CompatibilityScorer.score_all(tools, system_info, table)
+
+    def count_matching(self, params: InstallParams, system_info: SystemInfo) -> int:
+        """Number of tools matching ``params``"""
+        backend = self.sqlite()
+        if backend is not None:
+            return len(backend.filter_names(params, system_info))
+        return bin(self.columns().filter_mask(params, system_info)).count("1")  # int.bit_count needs 3.10
+
+    def search_index(self):
+        """Token/trigram search index over names, binaries, tags and descriptions"""
+        def build(cat: "ToolCatalog"):
+            from catalog_search import SearchIndex
+            return SearchIndex(cat._compiled.tools)
+        return self.derived("search", build)
+
+    def search(self, query: str, pool: Optional[List[Tool]] = None) -> List[Tool]:
+        """Ranked search over names, binaries, tags and descriptions, optionally within ``pool``"""
+        tools = self.tools
+        names = self.search_index().search(query)
+        if pool is not None:
+            allowed = {t.name for t in pool}
+            names = [name for name in names if name in allowed]
+        return [tools[name] for name in names if name in tools]
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """"Did you mean" candidates for an unknown tool name"""
+        return self.search_index().suggest(name, limit)
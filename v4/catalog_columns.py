@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Columnar Catalog View
+Column arrays and bitmaps over the tool catalog so InstallParams filters are
+a handful of big-integer mask operations instead of a per-tool Python loop.
+
+Bit ``i`` of every mask refers to ``ColumnarView.names[i]`` (catalog order).
+Size and RAM thresholds are answered from sorted distinct values with
+prefix bitmaps; compatibility scores are decomposed into the independent
+components of CompatibilityScorer.score_tool, each of which is a mask.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from hakpak4 import CompatibilityScorer, InstallParams, SystemInfo, Tool
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yield the indexes of set bits in ascending order"""
+    bits = format(mask, "b")[::-1] if mask else ""
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+class ThresholdAxis:
+    """Sorted distinct values of one column with cumulative (<=) bitmaps"""
+
+    def __init__(self, column: array):
+        by_value: Dict[float, int] = {}
+        for i, value in enumerate(column):
+            by_value[value] = by_value.get(value, 0) | (1 << i)
+        self.values: List[float] = sorted(by_value)
+        self.prefix: List[int] = []
+        acc = 0
+        for value in self.values:
+            acc |= by_value[value]
+            self.prefix.append(acc)
+
+    def _prefix_mask(self, count: int) -> int:
+        return self.prefix[count - 1] if count > 0 else 0
+
+    def at_most(self, limit: float) -> int:
+        """Mask of rows whose value is <= ``limit``"""
+        return self._prefix_mask(bisect_right(self.values, limit))
+
+    def less_than(self, limit: float) -> int:
+        """Mask of rows whose value is < ``limit``"""
+        return self._prefix_mask(bisect_left(self.values, limit))
+
+    def where(self, pred: Callable[[float], bool]) -> int:
+        """Mask of rows satisfying ``pred``, which must hold for all small values
+        up to some cut-off and fail above it (evaluated only O(log n) times)"""
+        lo, hi = 0, len(self.values)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if pred(self.values[mid]):
+                lo = mid + 1
+            else:
+                hi = mid
+        return self._prefix_mask(lo)
+
+
+class ColumnarView:
+    """Column arrays, availability masks and tag bitmaps for a tool catalog"""
+
+    def __init__(self, tools: Dict[str, Tool], generation: int = 0):
+        self.tools = tools
+        self.generation = generation
+        self.names: List[str] = list(tools)
+        self.position: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.all_mask = (1 << len(self.names)) - 1
+
+        self.estimated_size_mb = array("d")
+        self.dependencies_size_mb = array("d")
+        self.total_size_mb = array("d")
+        self.ram_required_mb = array("d")
+        self.pm_masks: Dict[str, int] = {}
+        self.tag_masks: Dict[str, int] = {}
+        self.source_mask = 0
+
+        for i, tool in enumerate(tools.values()):
+            bit = 1 << i
+            m = tool.metrics
+            self.estimated_size_mb.append(m.estimated_size_mb)
+            self.dependencies_size_mb.append(m.dependencies_size_mb)
+            self.total_size_mb.append(m.estimated_size_mb + m.dependencies_size_mb)
+            self.ram_required_mb.append(m.ram_required_mb)
+            for pm in (tool.packages or {}):
+                self.pm_masks[pm] = self.pm_masks.get(pm, 0) | bit
+            for tag in tool.tags:
+                self.tag_masks[tag] = self.tag_masks.get(tag, 0) | bit
+            if tool.source:
+                self.source_mask |= bit
+
+        self.size_axis = ThresholdAxis(self.total_size_mb)
+        self.ram_axis = ThresholdAxis(self.ram_required_mb)
+        self._score_cache: Dict[Tuple, Dict[int, int]] = {}
+        self._score_tables: Dict[Tuple, Dict[str, int]] = {}
+
+    # ── Masks ─────────────────────────────────────────────────────────────────
+
+    def tags_any(self, tags: List[str]) -> int:
+        mask = 0
+        for tag in tags:
+            mask |= self.tag_masks.get(tag, 0)
+        return mask
+
+    def _tier_levels(self, axis, required: Callable[[float], float], available: float,
+                     tiers) -> Dict[int, int]:
+        """``{points: mask}`` for a resource axis, best tier first (see CompatibilityScorer.tier_points)"""
+        levels: Dict[int, int] = {}
+        taken = 0
+        for factor, points in tiers:
+            mask = axis.where(lambda v: available > required(v) * factor) & ~taken
+            levels[points] = levels.get(points, 0) | mask
+            taken |= mask
+        levels[0] = levels.get(0, 0) | (self.all_mask & ~taken)
+        return levels
+
+    def score_masks(self, system_info: SystemInfo) -> Dict[int, int]:
+        """
+        ``{score: mask}`` for every compatibility score present on this system.
+
+        Built component by component from CompatibilityScorer's rule
+        constants, like score_tool.
+        """
+        key = CompatibilityScorer.fingerprint(system_info)
+        cached = self._score_cache.get(key)
+        if cached is not None:
+            return cached
+
+        scorer = CompatibilityScorer
+        everything = self.all_mask
+        pm, os_id = system_info.package_manager, system_info.os_id
+        ram, disk = system_info.available_ram_mb, system_info.available_disk_gb
+
+        # Package manager compatibility (native package, else source build)
+        native = self.pm_masks.get(pm, 0)
+        source = self.source_mask & ~native
+        pm_levels = {scorer.PM_POINTS: native, scorer.SOURCE_POINTS: source,
+                     0: everything & ~(native | source)}
+
+        # OS-specific packages
+        if os_id in scorer.SECURITY_DISTROS:
+            os_levels = {scorer.SECURITY_DISTRO_POINTS: everything}
+        elif os_id in scorer.OS_BONUS_PM:
+            bonus = self.pm_masks.get(scorer.OS_BONUS_PM[os_id], 0)
+            os_levels = {scorer.OS_PM_POINTS: bonus, 0: everything & ~bonus}
+        else:
+            os_levels = {0: everything}
+
+        # Resource availability (RAM and disk tiers)
+        ram_levels = self._tier_levels(self.ram_axis, lambda r: r, ram, scorer.RAM_TIERS)
+        disk_levels = self._tier_levels(self.size_axis, lambda t: t / 1024, disk, scorer.DISK_TIERS)
+
+        scores: Dict[int, int] = {}
+        for a, m_pm in pm_levels.items():
+            for b, m_os in os_levels.items():
+                m_ab = m_pm & m_os
+                if not m_ab:
+                    continue
+                for c, m_ram in ram_levels.items():
+                    m_abc = m_ab & m_ram
+                    if not m_abc:
+                        continue
+                    for d, m_disk in disk_levels.items():
+                        mask = m_abc & m_disk
+                        if mask:
+                            score = min(a + b + c + d, scorer.MAX_SCORE)
+                            scores[score] = scores.get(score, 0) | mask
+
+        self._score_cache[key] = scores
+        return scores
+
+    def score_table(self, system_info: SystemInfo) -> Dict[str, int]:
+        """``{tool name: score}`` for the whole catalog, memoised per system fingerprint"""
+        key = CompatibilityScorer.fingerprint(system_info)
+        table = self._score_tables.get(key)
+        if table is None:
+            names = self.names
+            table = {}
+            for score, mask in self.score_masks(system_info).items():
+                for i in iter_bits(mask):
+                    table[names[i]] = score
+            self._score_tables[key] = table
+        return table
+
+    def has_score_table(self, system_info: SystemInfo) -> bool:
+        return CompatibilityScorer.fingerprint(system_info) in self._score_tables
+
+    def filter_mask(self, params: InstallParams, system_info: SystemInfo) -> int:
+        """Mask of tools matching ``params`` (same semantics as InstallParams.matches)"""
+        mask = 0
+        for score, score_mask in self.score_masks(system_info).items():
+            if params.min_compatibility <= score <= params.max_compatibility:
+                mask |= score_mask
+        if params.max_size_mb is not None:
+            mask &= self.size_axis.at_most(params.max_size_mb)
+        if params.max_ram_mb is not None:
+            mask &= self.ram_axis.at_most(params.max_ram_mb)
+        if params.tags_filter:
+            mask &= self.tags_any(params.tags_filter)
+        if params.exclude_tags:
+            mask &= ~self.tags_any(params.exclude_tags)
+        return mask
+
+    # ── Materialisation ───────────────────────────────────────────────────────
+
+    def names_in(self, mask: int, limit: Optional[int] = None) -> List[str]:
+        """Tool names for ``mask`` in catalog order"""
+        names = self.names
+        result = []
+        for i in iter_bits(mask):
+            result.append(names[i])
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def ranked_names(self, mask: int, system_info: SystemInfo,
+                     limit: Optional[int] = None) -> List[str]:
+        """Names for ``mask`` by descending compatibility (catalog order within a score)"""
+        result: List[str] = []
+        for score, score_mask in sorted(self.score_masks(system_info).items(), reverse=True):
+            remaining = None if limit is None else limit - len(result)
+            if remaining is not None and remaining <= 0:
+                break
+            result.extend(self.names_in(mask & score_mask, remaining))
+        return result
+
+    def mask_of(self, names) -> int:
+        """Mask for an iterable of tool names (unknown names are ignored)"""
+        mask = 0
+        position = self.position
+        for name in names:
+            i = position.get(name)
+            if i is not None:
+                mask |= 1 << i
+        return mask
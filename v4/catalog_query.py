@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Catalog Query Language
+Non-interactive tool selection for scripts:
+
+    hakpak4 query 'tag:web size<50 ram<=512 compat>=70 pm:apt'
+
+Terms are separated by whitespace and combined with AND:
+
+  tag:web,network    tool has any of the listed tags
+  pm:apt             native package available for that package manager
+  pm:source          tool can be built from source
+  group:<label>      catalog group, e.g. group:information_gathering
+  size<50            total install size in MB        (< <= > >= = !=)
+  ram<=512           RAM requirement in MB
+  compat>=70         compatibility score on the target system
+  <word>             ranked name/binary/tag/description search
+  -<term>, !<term>   negate any term
+
+An expression is compiled into a QueryPlan of bitmap steps over the columnar
+catalog view (catalog_columns.py), so no per-tool predicate is evaluated.
+"""
+
+import json
+import operator
+import re
+import shlex
+import sys
+from dataclasses import dataclass, replace
+from typing import Callable, List, Optional, TextIO
+
+from catalog import ToolCatalog
+from hakpak4 import SystemInfo, format_compatibility, format_size
+
+
+class QueryError(ValueError):
+    """Raised for malformed query expressions"""
+
+
+_COMPARISONS = {
+    "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+}
+_NUMERIC_TERM = re.compile(r"^(size|ram|compat)(<=|>=|==|!=|<|>|=)(\d+(?:\.\d+)?)$")
+_FIELD_TERM = re.compile(r"^(tag|pm|group):(.+)$")
+
+
+# ── Plan ──────────────────────────────────────────────────────────────────────
+
+@dataclass
+class QueryStep:
+    """One term of a query: ``build(view, catalog, system_info) -> mask``"""
+    text: str
+    build: Callable
+    negate: bool = False
+    needs_system: bool = False
+
+
+@dataclass
+class QueryPlan:
+    steps: List[QueryStep]
+
+    @property
+    def needs_system(self) -> bool:
+        return any(step.needs_system for step in self.steps)
+
+    def execute(self, catalog: ToolCatalog, system_info: Optional[SystemInfo]) -> int:
+        """Mask of matching tools over ``catalog.columns()``"""
+        view = catalog.columns()
+        mask = view.all_mask
+        for step in self.steps:
+            step_mask = step.build(view, catalog, system_info)
+            mask &= (view.all_mask & ~step_mask) if step.negate else step_mask
+            if not mask:
+                break
+        return mask
+
+
+def _axis_step(column: str, op: str, value: float) -> Callable:
+    def build(view, catalog, system_info) -> int:
+        axis = view.size_axis if column == "size" else view.ram_axis
+        if op == "<":
+            return axis.less_than(value)
+        if op == "<=":
+            return axis.at_most(value)
+        if op == ">":
+            return view.all_mask & ~axis.at_most(value)
+        if op == ">=":
+            return view.all_mask & ~axis.less_than(value)
+        equal = axis.at_most(value) & ~axis.less_than(value)
+        return (view.all_mask & ~equal) if op == "!=" else equal
+    return build
+
+
+def _compat_step(op: str, value: float) -> Callable:
+    compare = _COMPARISONS[op]
+
+    def build(view, catalog, system_info) -> int:
+        mask = 0
+        for score, score_mask in view.score_masks(system_info).items():
+            if compare(score, value):
+                mask |= score_mask
+        return mask
+    return build
+
+
+def _group_key(label: str) -> str:
+    return re.sub(r"[\s_-]+", "_", label.strip().lower())
+
+
+def _field_step(field: str, values: List[str]) -> Callable:
+    def build(view, catalog, system_info) -> int:
+        if field == "tag":
+            return view.tags_any(values)
+        if field == "pm":
+            mask = 0
+            for pm in values:
+                mask |= view.source_mask if pm == "source" else view.pm_masks.get(pm, 0)
+            return mask
+        wanted = {_group_key(v) for v in values}
+        return view.mask_of(name for name, label in catalog.groups.items()
+                            if _group_key(label) in wanted)
+    return build
+
+
+def _search_step(word: str) -> Callable:
+    def build(view, catalog, system_info) -> int:
+        return view.mask_of(catalog.search_index().search(word))
+    return build
+
+
+def compile_query(expression: str) -> QueryPlan:
+    """Parse ``expression`` into a QueryPlan (raises QueryError)"""
+    try:
+        terms = shlex.split(expression)
+    except ValueError as e:
+        raise QueryError(str(e))
+
+    steps = []
+    for term in terms:
+        negate = term[:1] in ("-", "!") and len(term) > 1
+        body = term[1:] if negate else term
+
+        numeric = _NUMERIC_TERM.match(body)
+        field = _FIELD_TERM.match(body)
+        if numeric:
+            column, op, value = numeric.group(1), numeric.group(2), float(numeric.group(3))
+            if column == "compat":
+                steps.append(QueryStep(term, _compat_step(op, value), negate, needs_system=True))
+            else:
+                steps.append(QueryStep(term, _axis_step(column, op, value), negate))
+        elif field:
+            values = [v for v in field.group(2).split(",") if v]
+            if not values:
+                raise QueryError(f"empty value in '{term}'")
+            steps.append(QueryStep(term, _field_step(field.group(1), values), negate))
+        elif re.match(r"^[A-Za-z_]+\s*(<|>|=|!|:)", body):
+            raise QueryError(f"unrecognised term '{term}'")
+        else:
+            steps.append(QueryStep(term, _search_step(body), negate))
+    return QueryPlan(steps)
+
+
+# ── Output ────────────────────────────────────────────────────────────────────
+
+def _ordered_names(view, mask: int, system_info: Optional[SystemInfo],
+                   sort: str, limit: Optional[int]) -> List[str]:
+    if sort == "compat":
+        return view.ranked_names(mask, system_info, limit)
+    if sort == "catalog":
+        return view.names_in(mask, limit)
+    names = view.names_in(mask)
+    if sort == "name":
+        names.sort()
+    else:
+        column = view.total_size_mb if sort == "size" else view.ram_required_mb
+        names.sort(key=lambda name: column[view.position[name]])
+    return names[:limit] if limit is not None else names
+
+
+def run_query(plan: QueryPlan, system_info: Optional[SystemInfo], fmt: str = "table",
+              sort: str = "catalog", limit: Optional[int] = None,
+              out: TextIO = sys.stdout) -> int:
+    """Execute ``plan`` and stream matching tools as a table, JSON lines or bare names"""
+    catalog = ToolCatalog.get()
+    view = catalog.columns()
+    mask = plan.execute(catalog, system_info)
+    names = _ordered_names(view, mask, system_info, sort, limit)
+    scores = view.score_table(system_info) if system_info is not None else {}
+    tools = catalog.tools
+
+    if fmt == "table" and names:
+        out.write(f"{'Tool':<22} {'Compat':<18} {'Size':<10} {'RAM':<10} Tags\n")
+        out.write("-" * 80 + "\n")
+    for name in names:
+        tool = tools[name]
+        size = tool.metrics.estimated_size_mb + tool.metrics.dependencies_size_mb
+        score = scores.get(name)
+        if fmt == "json":
+            out.write(json.dumps({
+                "name": name,
+                "binary": tool.binary,
+                "compatibility": score,
+                "size_mb": size,
+                "ram_mb": tool.metrics.ram_required_mb,
+                "packages": tool.packages,
+                "source": bool(tool.source),
+                "tags": tool.tags,
+                "group": catalog.groups.get(name),
+                "description": tool.description,
+            }) + "\n")
+        elif fmt == "names":
+            out.write(name + "\n")
+        else:
+            compat = format_compatibility(score) if score is not None else "-"
+            out.write(f"{name:<22} {compat:<18} {format_size(size):<10} "
+                      f"{format_size(tool.metrics.ram_required_mb):<10} {', '.join(tool.tags)}\n")
+        out.flush()
+    return len(names)
+
+
+def _override_system(overrides: dict) -> Optional[SystemInfo]:
+    """SystemInfo made only from --os/--pm/--ram/--disk when all four are given (no host detection)"""
+    if len(overrides) < 4:
+        return None
+    return SystemInfo(
+        os_name=overrides["os_id"], os_version="", os_id=overrides["os_id"], os_id_like="",
+        kernel="", architecture="", cpu_count=1,
+        total_ram_mb=overrides["available_ram_mb"], available_ram_mb=overrides["available_ram_mb"],
+        total_disk_gb=overrides["available_disk_gb"], available_disk_gb=overrides["available_disk_gb"],
+        package_manager=overrides["package_manager"],
+    )
+
+
+def cmd_query(args, detect_system: Callable[[], SystemInfo]) -> int:
+    """Entry point for ``hakpak4 query``"""
+    expression = " ".join(args.expression)
+    try:
+        plan = compile_query(expression)
+    except QueryError as e:
+        print(f"ERROR: Invalid query: {e}", file=sys.stderr)
+        return 1
+
+    overrides = {
+        "os_id": args.os, "package_manager": args.pm,
+        "available_ram_mb": args.ram, "available_disk_gb": args.disk,
+    }
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    system_info = None
+    if plan.needs_system or args.sort == "compat" or args.format != "names":
+        system_info = _override_system(overrides) or replace(detect_system(), **overrides)
+
+    try:
+        count = run_query(plan, system_info, args.format, args.sort, args.limit)
+    except BrokenPipeError:
+        return 0
+    if args.format == "table":
+        print(f"\n{count} tools", file=sys.stderr)
+    return 0
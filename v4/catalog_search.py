@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Catalog Search Index
+Token and trigram index over tool names, binaries, tags and descriptions.
+
+Posting lists are bitmaps over catalog positions (bit ``i`` is the i-th tool,
+as in catalog_columns.py).  A term of three or more characters narrows the
+candidates to tools containing all of its trigrams before the exact substring
+check, so a search touches only plausible tools.  Name/binary trigrams also
+drive "did you mean" suggestions for misspelled tool names.
+"""
+
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from catalog_columns import iter_bits
+from hakpak4 import Tool
+
+
+# Match quality per field, best first (lower ranks sort earlier).
+_RANK_EXACT_NAME = 0
+_RANK_NAME_PREFIX = 1
+_RANK_NAME = 2
+_RANK_BINARY = 3
+_RANK_EXACT_TAG = 4
+_RANK_TAG = 5
+_RANK_DESCRIPTION = 6
+
+# Minimum similarity for a "did you mean" suggestion.
+_SUGGEST_CUTOFF = 0.6
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _name_trigrams(text: str) -> set:
+    # Pad so short names and first/last characters still produce trigrams.
+    return _trigrams(f"  {text} ")
+
+
+class SearchIndex:
+    """Ranked substring search and fuzzy name resolution over a tool catalog"""
+
+    def __init__(self, tools: Dict[str, Tool]):
+        self.names: List[str] = list(tools)
+        self.all_mask = (1 << len(self.names)) - 1
+        self._fields: List[Tuple[str, str, Tuple[str, ...], str]] = []
+        self._trigrams: Dict[str, int] = {}
+        self._name_trigrams: Dict[str, int] = {}
+        self._spellings: List[Tuple[str, ...]] = []
+
+        for i, tool in enumerate(tools.values()):
+            bit = 1 << i
+            name = tool.name.lower()
+            binary = (tool.binary or "").lower()
+            tags = tuple(tag.lower() for tag in tool.tags)
+            description = (tool.description or "").lower()
+            self._fields.append((name, binary, tags, description))
+
+            grams = set()
+            for text in (name, binary, description) + tags:
+                grams |= _trigrams(text)
+            for gram in grams:
+                self._trigrams[gram] = self._trigrams.get(gram, 0) | bit
+
+            spellings = tuple(dict.fromkeys(s for s in (name, binary) if s))
+            self._spellings.append(spellings)
+            grams = set()
+            for text in spellings:
+                grams |= _name_trigrams(text)
+            for gram in grams:
+                self._name_trigrams[gram] = self._name_trigrams.get(gram, 0) | bit
+
+    # ── Search ────────────────────────────────────────────────────────────────
+
+    def _candidates(self, term: str) -> int:
+        if len(term) < 3:
+            return self.all_mask
+        mask = self.all_mask
+        for gram in _trigrams(term):
+            mask &= self._trigrams.get(gram, 0)
+            if not mask:
+                break
+        return mask
+
+    def _rank(self, i: int, term: str) -> Optional[int]:
+        name, binary, tags, description = self._fields[i]
+        if term == name or term == binary:
+            return _RANK_EXACT_NAME
+        if name.startswith(term):
+            return _RANK_NAME_PREFIX
+        if term in name:
+            return _RANK_NAME
+        if term in binary:
+            return _RANK_BINARY
+        if term in tags:
+            return _RANK_EXACT_TAG
+        if any(term in tag for tag in tags):
+            return _RANK_TAG
+        if term in description:
+            return _RANK_DESCRIPTION
+        return None
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Names of tools containing every whitespace-separated term of ``query``
+        in their name, binary, tags or description, best matches first
+        (catalog order among equal ranks).  An empty query returns everything.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return list(self.names) if limit is None else self.names[:limit]
+
+        mask = self.all_mask
+        for term in terms:
+            mask &= self._candidates(term)
+
+        ranked = []
+        for i in iter_bits(mask):
+            total = 0
+            for term in terms:
+                rank = self._rank(i, term)
+                if rank is None:
+                    break
+                total += rank
+            else:
+                ranked.append((total, i))
+        ranked.sort()
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.names[i] for _, i in ranked]
+
+    # ── Suggestions ───────────────────────────────────────────────────────────
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """Closest tool names to a misspelled ``name`` (by name or binary)"""
+        name = name.strip().lower()
+        if not name:
+            return []
+        mask = 0
+        for gram in _name_trigrams(name):
+            mask |= self._name_trigrams.get(gram, 0)
+
+        scored = []
+        for i in iter_bits(mask):
+            ratio = max(SequenceMatcher(None, name, spelling).ratio()
+                        for spelling in self._spellings[i])
+            if ratio >= _SUGGEST_CUTOFF:
+                scored.append((-ratio, i))
+        scored.sort()
+        return [self.names[i] for _, i in scored[:limit]]
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – SQLite Catalog Backend
+Optional indexed backend generated from the compiled tool catalog.  Enable it
+with ``HAKPAK4_CATALOG_BACKEND=sqlite``; the database lives next to the
+compiled cache and is rebuilt whenever kali-tools-db.yaml changes.
+
+Schema:
+  tools          one row per tool with size/RAM columns (indexed)
+  tool_packages  (tool, package manager, package) availability
+  tags           (tag, tool) join table
+  tools_fts      FTS5 index over name/description/tags/group
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from hakpak4 import CACHE_DIR, CompatibilityScorer, InstallParams, SystemInfo
+
+
+SQLITE_CATALOG_PATH = CACHE_DIR / "kali-tools-db.sqlite"
+
+_SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE tools (
+    id            INTEGER PRIMARY KEY,
+    name          TEXT NOT NULL UNIQUE,
+    binary        TEXT NOT NULL,
+    description   TEXT NOT NULL,
+    grp           TEXT NOT NULL,
+    est_size_mb   REAL NOT NULL,
+    dep_size_mb   REAL NOT NULL,
+    total_size_mb REAL NOT NULL,
+    ram_mb        REAL NOT NULL,
+    has_source    INTEGER NOT NULL
+);
+CREATE INDEX tools_total_size ON tools (total_size_mb);
+CREATE INDEX tools_ram ON tools (ram_mb);
+CREATE TABLE tool_packages (
+    tool_id INTEGER NOT NULL REFERENCES tools (id),
+    pm      TEXT NOT NULL,
+    package TEXT NOT NULL,
+    PRIMARY KEY (pm, tool_id)
+) WITHOUT ROWID;
+CREATE TABLE tags (
+    tag     TEXT NOT NULL,
+    tool_id INTEGER NOT NULL REFERENCES tools (id),
+    PRIMARY KEY (tag, tool_id)
+) WITHOUT ROWID;
+"""
+
+def _tier_sql(available: str, required: str, tiers) -> str:
+    """SQL for CompatibilityScorer.tier_points"""
+    whens = " ".join(f"WHEN {available} > {required} * {factor} THEN {points}" for factor, points in tiers)
+    return f"CASE {whens} ELSE 0 END"
+
+
+# CompatibilityScorer.score_tool as SQL, generated from the scorer's rule constants
+_S = CompatibilityScorer
+_SCORE_SQL = f"""
+MIN({_S.MAX_SCORE},
+    CASE WHEN EXISTS (SELECT 1 FROM tool_packages p WHERE p.tool_id = t.id AND p.pm = :pm)
+         THEN {_S.PM_POINTS} WHEN t.has_source THEN {_S.SOURCE_POINTS} ELSE 0 END
+  + :os_flat
+  + CASE WHEN :os_pm IS NOT NULL AND EXISTS (
+             SELECT 1 FROM tool_packages p WHERE p.tool_id = t.id AND p.pm = :os_pm)
+         THEN {_S.OS_PM_POINTS} ELSE 0 END
+  + {_tier_sql(":ram", "t.ram_mb", _S.RAM_TIERS)}
+  + {_tier_sql(":disk", "(t.est_size_mb + t.dep_size_mb) / 1024.0", _S.DISK_TIERS)}
+)
+"""
+
+
+def _fts_supports_trigram(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._probe")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_sqlite_catalog(compiled, db_path: Path = SQLITE_CATALOG_PATH) -> Path:
+    """Write a fresh SQLite catalog for ``compiled`` and atomically install it"""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".catalog-", suffix=".sqlite", dir=str(db_path.parent))
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.executescript(_SCHEMA)
+            trigram = _fts_supports_trigram(conn)
+            tokenizer = "trigram" if trigram else "unicode61"
+            conn.execute(
+                "CREATE VIRTUAL TABLE tools_fts USING fts5("
+                f"name, description, tags, grp, tokenize='{tokenizer}')"
+            )
+            for tool_id, (name, tool) in enumerate(compiled.tools.items(), 1):
+                m = tool.metrics
+                grp = compiled.groups.get(name, "Other")
+                conn.execute(
+                    "INSERT INTO tools VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (tool_id, name, tool.binary, tool.description, grp,
+                     m.estimated_size_mb, m.dependencies_size_mb,
+                     m.estimated_size_mb + m.dependencies_size_mb,
+                     m.ram_required_mb, 1 if tool.source else 0),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tool_packages VALUES (?, ?, ?)",
+                    [(tool_id, pm, str(pkg)) for pm, pkg in (tool.packages or {}).items()],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                    [(tag, tool_id) for tag in tool.tags],
+                )
+                conn.execute(
+                    "INSERT INTO tools_fts (rowid, name, description, tags, grp) VALUES (?, ?, ?, ?, ?)",
+                    (tool_id, name, tool.description, " ".join(tool.tags), grp),
+                )
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("schema", _SCHEMA_VERSION),
+                ("sha256", compiled.sha256),
+                ("trigram", "1" if trigram else "0"),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, db_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return db_path
+
+
+class SqliteCatalog:
+    """Indexed queries over the tool catalog"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self.trigram = self._meta("trigram") == "1"
+
+    @classmethod
+    def open(cls, compiled, db_path: Path = SQLITE_CATALOG_PATH) -> "SqliteCatalog":
+        """Open the on-disk catalog, rebuilding it if it is stale or unreadable"""
+        conn = cls._connect_if_current(db_path, compiled.sha256)
+        if conn is None:
+            try:
+                build_sqlite_catalog(compiled, db_path)
+                conn = cls._connect_if_current(db_path, compiled.sha256)
+            except OSError:
+                conn = None
+            if conn is None:
+                # Unwritable cache dir: keep an in-memory copy for this process.
+                conn = sqlite3.connect(":memory:", check_same_thread=False)
+                with tempfile.TemporaryDirectory() as tmp:
+                    tmp_db = build_sqlite_catalog(compiled, Path(tmp) / "catalog.sqlite")
+                    disk = sqlite3.connect(str(tmp_db))
+                    disk.backup(conn)
+                    disk.close()
+        return cls(conn)
+
+    @staticmethod
+    def _connect_if_current(db_path: Path, sha256: str) -> Optional[sqlite3.Connection]:
+        if not db_path.exists():
+            return None
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        except sqlite3.Error:
+            return None
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error:
+            conn.close()
+            return None
+        if meta.get("schema") != _SCHEMA_VERSION or meta.get("sha256") != sha256:
+            conn.close()
+            return None
+        return conn
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _query(self, sql: str, params=()) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    # ── InstallParams ─────────────────────────────────────────────────────────
+
+    def filter_names(self, params: InstallParams, system_info: SystemInfo) -> List[str]:
+        """Tool names matching ``params`` (same semantics as InstallParams.matches)"""
+        os_id = system_info.os_id
+        args: Dict[str, object] = {
+            "pm": system_info.package_manager,
+            "os_flat": _S.SECURITY_DISTRO_POINTS if os_id in _S.SECURITY_DISTROS else 0,
+            "os_pm": _S.OS_BONUS_PM.get(os_id),
+            "ram": system_info.available_ram_mb,
+            "disk": system_info.available_disk_gb,
+            "min_compat": params.min_compatibility,
+            "max_compat": params.max_compatibility,
+        }
+        where = [f"{_SCORE_SQL} BETWEEN :min_compat AND :max_compat"]
+        if params.max_size_mb is not None:
+            where.append("t.total_size_mb <= :max_size")
+            args["max_size"] = params.max_size_mb
+        if params.max_ram_mb is not None:
+            where.append("t.ram_mb <= :max_ram")
+            args["max_ram"] = params.max_ram_mb
+        if params.tags_filter:
+            where.append(self._tag_clause("EXISTS", "inc", params.tags_filter, args))
+        if params.exclude_tags:
+            where.append(self._tag_clause("NOT EXISTS", "exc", params.exclude_tags, args))
+        sql = f"SELECT t.name FROM tools t WHERE {' AND '.join(where)} ORDER BY t.id"
+        return self._query(sql, args)
+
+    @staticmethod
+    def _tag_clause(op: str, prefix: str, tags: List[str], args: Dict[str, object]) -> str:
+        keys = []
+        for i, tag in enumerate(tags):
+            key = f"{prefix}{i}"
+            args[key] = tag
+            keys.append(f":{key}")
+        return (f"{op} (SELECT 1 FROM tags g WHERE g.tool_id = t.id "
+                f"AND g.tag IN ({', '.join(keys)}))")
+
+    # ── Search ────────────────────────────────────────────────────────────────
+
+    def match_names(self, term: str, columns: Iterable[str] = ("name", "tags")) -> List[str]:
+        """Case-insensitive substring match of ``term`` against ``columns`` (catalog order)"""
+        term = term.strip().lower()
+        columns = list(columns)
+        if not term:
+            return []
+        if self.trigram and len(term) >= 3:
+            phrase = '"' + term.replace('"', '""') + '"'
+            sql = ("SELECT t.name FROM tools_fts f JOIN tools t ON t.id = f.rowid "
+                   "WHERE tools_fts MATCH ? ORDER BY t.id")
+            return self._query(sql, (f"{{{' '.join(columns)}}} : {phrase}",))
+
+        # Short terms (or no trigram tokenizer): fall back to LIKE scans.
+        like = f"%{_escape_like(term)}%"
+        clauses = []
+        for col in columns:
+            if col == "tags":
+                clauses.append("EXISTS (SELECT 1 FROM tags g WHERE g.tool_id = t.id "
+                               "AND g.tag LIKE :q ESCAPE '\\')")
+            else:
+                clauses.append(f"t.{col} LIKE :q ESCAPE '\\'")
+        sql = f"SELECT t.name FROM tools t WHERE {' OR '.join(clauses)} ORDER BY t.id"
+        return self._query(sql, {"q": like})
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Download Cache
+In-process downloader for source artifacts (.deb packages, wine-binary
+archives), replacing ``wget`` into ``HAKPAK4_ROOT/downloads``.
+
+Artifacts are stored by content under ``HAKPAK4_ROOT/cache/downloads``:
+
+  objects/<aa>/<sha256>     verified artifact bodies
+  partial/<url-hash>.part   interrupted downloads, resumed with HTTP Range
+  partial/<url-hash>.lock   flock held while a process fetches that URL
+  index.json                url -> {sha256, etag, last_modified}
+
+The SHA-256 is computed while streaming and checked against the ``sha256``
+pinned in kali-tools-db.yaml when there is one, so truncated or tampered
+downloads never reach dpkg/unzip.  Unpinned URLs are revalidated with
+If-None-Match / If-Modified-Since once per run.  When the objects exceed
+``HAKPAK4_DOWNLOAD_CACHE_MB`` (default 2048) the least recently used ones
+are evicted, except those this run has handed out.
+"""
+
+import fcntl
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from hakpak4 import CACHE_DIR, Shell
+
+
+DOWNLOAD_CACHE_DIR = CACHE_DIR / "downloads"
+DEFAULT_CACHE_BUDGET_MB = 2048
+
+
+def _cache_budget_mb() -> int:
+    """Budget from HAKPAK4_DOWNLOAD_CACHE_MB, falling back to the default on bad values"""
+    try:
+        return max(0, int(os.environ.get("HAKPAK4_DOWNLOAD_CACHE_MB", DEFAULT_CACHE_BUDGET_MB)))
+    except ValueError:
+        return DEFAULT_CACHE_BUDGET_MB
+
+
+CACHE_BUDGET_MB = _cache_budget_mb()
+
+_CHUNK = 1 << 16
+_TIMEOUT = 60
+
+_validated = set()
+_handed_out: Set[Path] = set()     # objects returned by fetch() in this run; never evicted
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+_index_lock = threading.Lock()
+
+
+class DownloadError(RuntimeError):
+    """A download failed or did not match its pinned SHA-256"""
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def object_path(digest: str) -> Path:
+    return DOWNLOAD_CACHE_DIR / "objects" / digest[:2] / digest
+
+
+def _url_lock(url: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(url, threading.Lock())
+
+
+def partial_path(url: str) -> Path:
+    return DOWNLOAD_CACHE_DIR / "partial" / f"{_url_key(url)}.part"
+
+
+@contextmanager
+def download_lock(url: str):
+    """Exclusive flock on ``partial/<url-hash>.lock`` (shared with other hakpak4 processes)"""
+    lock_path = partial_path(url).with_suffix(".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# ── URL index ─────────────────────────────────────────────────────────────────
+
+def _load_index() -> Dict[str, Dict]:
+    try:
+        with open(DOWNLOAD_CACHE_DIR / "index.json", "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _record(url: str, entry: Dict):
+    with _index_lock:
+        index = _load_index()
+        index[url] = entry
+        fd, tmp = tempfile.mkstemp(prefix=".index-", dir=str(DOWNLOAD_CACHE_DIR))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f, indent=1)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, DOWNLOAD_CACHE_DIR / "index.json")
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+
+def _touch(path: Path) -> Path:
+    """Mark a cache object as recently used (LRU order is by mtime)"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return _hand_out(path)
+
+
+def _hand_out(path: Path) -> Path:
+    with _index_lock:
+        _handed_out.add(path)
+    return path
+
+
+# ── Downloading ───────────────────────────────────────────────────────────────
+
+def _request(url: str, headers: Dict[str, str]):
+    request = urllib.request.Request(url, headers={"User-Agent": "hakpak4", **headers})
+    try:
+        return urllib.request.urlopen(request, timeout=_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code in (304, 416):
+            return e
+        raise DownloadError(f"{url}: HTTP {e.code} {e.reason}")
+    except (urllib.error.URLError, OSError) as e:
+        raise DownloadError(f"{url}: {getattr(e, 'reason', e)}")
+
+
+def _download(url: str, sha256: Optional[str], response=None) -> Path:
+    """
+    Download ``url`` into the object store, resuming its partial file, or
+    from ``response`` (an already open 200 response) when given.
+    """
+    partial = partial_path(url)
+    meta_path = partial.with_suffix(".json")
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        meta = {}
+
+    digest = hashlib.sha256()
+    offset = partial.stat().st_size if partial.exists() and meta.get("url") == url else 0
+    headers = {}
+    validator = meta.get("etag") or meta.get("last_modified")
+    if offset and validator and response is None:
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+    else:
+        offset = 0
+
+    if response is None:
+        response = _request(url, headers)
+    if response.getcode() == 416:
+        # The partial file is no longer a prefix of the artifact; start over
+        response.close()
+        response = _request(url, {})
+    with response:
+        if response.getcode() == 206 and offset:
+            print(f"  Resuming download at {offset} bytes")
+            with open(partial, "rb") as f:
+                for chunk in iter(lambda: f.read(_CHUNK), b""):
+                    digest.update(chunk)
+            mode = "ab"
+        else:
+            offset, mode = 0, "wb"
+        length = response.headers.get("Content-Length")
+        expected = offset + int(length) if length and length.isdigit() else None
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        meta_path.write_text(json.dumps(entry))
+        try:
+            with open(partial, mode) as out:
+                for chunk in iter(lambda: response.read(_CHUNK), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+        except (OSError, http.client.HTTPException) as e:
+            raise DownloadError(f"{url}: download interrupted ({e}); it will resume next time")
+        # http.client ends a short body silently, so check the length ourselves
+        if expected is not None and partial.stat().st_size != expected:
+            raise DownloadError(f"{url}: download interrupted at {partial.stat().st_size} of "
+                                f"{expected} bytes; it will resume next time")
+
+    actual = digest.hexdigest()
+    if sha256 and actual != sha256.lower():
+        partial.unlink()
+        meta_path.unlink()
+        raise DownloadError(f"{url}: SHA-256 mismatch (expected {sha256}, got {actual})")
+    target = object_path(actual)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.chmod(partial, 0o644)
+    os.replace(partial, target)
+    meta_path.unlink()
+    _record(url, {"sha256": actual, "etag": entry["etag"], "last_modified": entry["last_modified"]})
+    return target
+
+
+def _revalidate(url: str, entry: Dict):
+    """
+    Conditional GET for the cached copy of ``url``: None if it is still
+    current (or the server can't be reached), otherwise the open 200
+    response carrying the new body.
+    """
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    if not headers:
+        return None
+    try:
+        response = _request(url, headers)
+    except DownloadError:
+        return None
+    if response.getcode() == 304:
+        response.close()
+        return None
+    return response
+
+
+def fetch(url: str, sha256: Optional[str] = None, shell: Optional[Shell] = None) -> Path:
+    """
+    Path of the cached artifact for ``url`` (downloading or resuming it if
+    needed).  Raises DownloadError on network errors or a hash mismatch.
+    """
+    if shell is not None and shell.dry_run:
+        print(f"[dry-run] download {url}")
+        return object_path(sha256 or _url_key(url))
+
+    with _url_lock(url), download_lock(url):
+        if sha256 and object_path(sha256.lower()).exists():
+            print(f"  Using cached download: {url}")
+            return _touch(object_path(sha256.lower()))
+
+        entry = _load_index().get(url)
+        cached = object_path(entry["sha256"]) if entry and entry.get("sha256") else None
+        response = None
+        if cached is not None and cached.exists() and not sha256:
+            if url not in _validated:
+                response = _revalidate(url, entry)
+            if response is None:
+                _validated.add(url)
+                print(f"  Using cached download: {url}")
+                return _touch(cached)
+
+        print(f"  Downloading from {url}...")
+        target = _hand_out(_download(url, sha256, response))
+        _validated.add(url)
+    evict()
+    return target
+
+
+# ── Eviction ──────────────────────────────────────────────────────────────────
+
+def cache_size() -> int:
+    """Bytes used by cached objects"""
+    return sum(p.stat().st_size for p in (DOWNLOAD_CACHE_DIR / "objects").glob("*/*"))
+
+
+def evict(budget_mb: Optional[int] = None) -> int:
+    """
+    Delete least recently used objects until the cache fits the budget;
+    returns bytes freed.  Objects fetch() returned in this run are kept, since
+    the install plan may not have used them yet.
+    """
+    budget = (CACHE_BUDGET_MB if budget_mb is None else budget_mb) * 1024 * 1024
+    objects = []
+    for path in (DOWNLOAD_CACHE_DIR / "objects").glob("*/*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        objects.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in objects)
+    with _index_lock:
+        protected = set(_handed_out)
+    freed = 0
+    for _, size, path in sorted(objects):
+        if total <= budget:
+            break
+        if path in protected:
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        freed += size
+    return freed
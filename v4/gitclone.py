@@ -413,10 +413,21 @@ def install_repo_dependencies(
     if not deps:
         return
 
-    from hakpak4 import PackageInstaller
+    from toolcaches import caches_in_use
+    with caches_in_use():
+        _install_dependencies(repo_path, deps, system_info, shell)
+
+
+def _install_dependencies(repo_path: Path, deps: Dict[str, str], system_info, shell) -> None:
+    from hakpak4_core import PackageInstaller
+    from toolcaches import bundle_install_commands, with_toolchain_env
 
     installer = PackageInstaller(shell, system_info)
 
+    def run(cmd):
+        # Shared HakPak caches (GOMODCACHE, CARGO_HOME, npm, pip) and job counts
+        shell.run(with_toolchain_env(cmd, system_info), check=False)
+
     for manifest, dep_type in deps.items():
         manifest_path = repo_path / manifest
         print(f"\n  [{dep_type}] Installing from {manifest} …")
@@ -426,37 +437,35 @@ def install_repo_dependencies(
                 installer.install_packages(["python3-pip"])
             pip = shell.which("pip3") or "pip3"
             if manifest_path.name == "requirements.txt":
-                shell.run([pip, "install", "--user", "-r", str(manifest_path)], check=False)
+                run([pip, "install", "--user", "-r", str(manifest_path)])
             else:
-                shell.run([pip, "install", "--user", str(repo_path)], check=False)
+                run([pip, "install", "--user", str(repo_path)])
 
         elif dep_type == "bundler":
             if not shell.which("bundle"):
                 installer.install_packages(["ruby-bundler"])
-            shell.run(
-                ["bundle", "install", "--path", str(repo_path / ".bundle")],
-                check=False,
-            )
+            for cmd in bundle_install_commands(repo_path, system_info):
+                shell.run(cmd, check=False)
 
         elif dep_type == "npm":
             if not shell.which("npm"):
                 installer.install_packages(["nodejs", "npm"])
-            shell.run(["npm", "install", "--prefix", str(repo_path)], check=False)
+            run(["npm", "install", "--prefix", str(repo_path)])
 
         elif dep_type == "go":
             if not shell.which("go"):
                 installer.install_packages(["golang"])
-            shell.run(["go", "mod", "download"], check=False)
+            run(["go", "mod", "download"])
 
         elif dep_type == "cargo":
             if not shell.which("cargo"):
                 installer.install_packages(["cargo"])
-            shell.run(["cargo", "build", "--release"], check=False)
+            run(["cargo", "build", "--release"])
 
         elif dep_type == "make":
             if not shell.which("make"):
                 installer.install_packages(["make", "build-essential"])
-            shell.run(["make"], check=False)
+            run(["make"])
 
         elif dep_type == "cmake":
             for pkg in ["cmake", "make", "build-essential"]:
@@ -464,7 +473,7 @@ def install_repo_dependencies(
                     installer.install_packages(["cmake", "make", "build-essential"])
                     break
             shell.run(["cmake", "."], check=False)
-            shell.run(["make"], check=False)
+            run(["make"])
 
         elif dep_type == "autoconf":
             for pkg in ["autoconf", "automake", "make", "build-essential"]:
@@ -475,7 +484,7 @@ def install_repo_dependencies(
                 shell.run(["autoreconf", "-fi"], check=False)
             if (repo_path / "configure").exists():
                 shell.run(["./configure"], check=False)
-            shell.run(["make"], check=False)
+            run(["make"])
 
 
 # ── URL validation ────────────────────────────────────────────────────────────
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Git Mirror Cache
+Keeps a bare mirror of every source tool's upstream repository under
+``HAKPAK4_ROOT/cache/git/<host>/<owner>/<repo>.git``.  A mirror tracks only
+branches and tags (never GitHub's ``refs/pull/*``) as a ``blob:none``
+partial clone, plus the blobs of HEAD's tree, so creating one costs about
+as much as the old shallow clone.  Afterwards it is only updated with
+``git fetch``; working trees in ``HAKPAK4_ROOT/src`` are cloned from the
+mirror, so reinstalls, ``rm -rf src/`` and machines sharing the cache
+directory no longer download the repository again.
+
+Each mirror is fetched at most once per run, and a flock on
+``<repo>.git.lock`` keeps concurrent jobs and processes sharing the cache
+from updating the same mirror at once.  If the fetch fails (offline) an
+existing mirror is used as it is.  ``HAKPAK4_GIT_MIRRORS=0`` disables the
+cache and restores direct shallow clones.
+"""
+
+import fcntl
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+from hakpak4 import CACHE_DIR, Shell
+
+
+MIRROR_DIR = CACHE_DIR / "git"
+
+# Remote name under which working trees know their mirror
+MIRROR_REMOTE = "hakpak4-mirror"
+
+_fetched: Set[Path] = set()
+_locks: Dict[Path, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def mirrors_enabled() -> bool:
+    return os.environ.get("HAKPAK4_GIT_MIRRORS", "1") != "0"
+
+
+def _safe(part: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", part).lstrip(".") or "_"
+
+
+def mirror_path(url: str) -> Path:
+    """Mirror location for ``url``: https://host/owner/repo(.git), git@host:owner/repo or a local path"""
+    scp = re.match(r"^[\w.-]+@([\w.-]+):(.+)$", url)
+    if scp:
+        host, path = scp.group(1), scp.group(2)
+    elif "://" in url:
+        parsed = urlparse(url)
+        host, path = parsed.hostname or "local", parsed.path
+    else:
+        host, path = "local", os.path.abspath(url)
+    parts = [_safe(p) for p in path.strip("/").split("/") if p] or ["repo"]
+    name = parts[-1][:-4] if parts[-1].endswith(".git") else parts[-1]
+    return MIRROR_DIR.joinpath(_safe(host), *parts[:-1], f"{name}.git")
+
+
+def _thread_lock(mirror: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(mirror, threading.Lock())
+
+
+_MIRROR_CONFIG = [
+    ("remote.origin.fetch", "+refs/heads/*:refs/heads/*"),
+    ("remote.origin.fetch", "+refs/tags/*:refs/tags/*"),
+    ("remote.origin.promisor", "true"),
+    ("remote.origin.partialclonefilter", "blob:none"),
+    # Working trees clone from the mirror with a filter and fetch HEAD's blobs by id
+    ("uploadpack.allowFilter", "true"),
+    ("uploadpack.allowAnySHA1InWant", "true"),
+]
+
+
+@contextmanager
+def mirror_lock(mirror: Path):
+    """Exclusive flock on ``<mirror>.lock`` (shared with other hakpak4 processes)"""
+    mirror.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{mirror}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _git(mirror: Path, *args: str) -> List[str]:
+    return ["git", "--git-dir", str(mirror), *args]
+
+
+def _fetch(mirror: Path, shell: Shell) -> bool:
+    return shell.run(_git(mirror, "fetch", "--prune", "--quiet", "--filter=blob:none", "origin"),
+                     check=False).returncode == 0
+
+
+def _create(url: str, mirror: Path, shell: Shell) -> bool:
+    """Bare repo tracking only branches and tags of ``url`` (no refs/pull/*), without blobs"""
+    partial = mirror.with_name(mirror.name + ".part")
+    shutil.rmtree(partial, ignore_errors=True)
+    shell.run(["git", "init", "--bare", "--quiet", str(partial)])
+    shell.run(_git(partial, "remote", "add", "origin", url))
+    shell.run(_git(partial, "config", "--unset-all", "remote.origin.fetch"))
+    for key, value in _MIRROR_CONFIG:
+        shell.run(_git(partial, "config", "--add", key, value))
+    if not _fetch(partial, shell):
+        shutil.rmtree(partial, ignore_errors=True)
+        return False
+    head = shell.run(_git(partial, "ls-remote", "--symref", "origin", "HEAD"), check=False, capture=True)
+    match = re.match(r"^ref: (refs/heads/\S+)\tHEAD", head.stdout or "")
+    if match:
+        shell.run(_git(partial, "symbolic-ref", "HEAD", match.group(1)))
+    os.replace(partial, mirror)
+    return True
+
+
+def _hydrate_head(mirror: Path, shell: Shell):
+    """
+    Fetch the blobs of HEAD's tree into the mirror, so working trees can be
+    cloned from it locally.  A checkout into a scratch directory makes git
+    fetch all missing blobs in one batch from the promisor remote.
+    """
+    listing = shell.run(_git(mirror, "rev-list", "--objects", "--missing=print", "--no-walk", "HEAD"),
+                        check=False, capture=True)
+    if not any(line.startswith("?") for line in (listing.stdout or "").splitlines()):
+        return
+    scratch = Path(tempfile.mkdtemp(prefix=".hydrate-", dir=str(mirror.parent)))
+    try:
+        shell.run(["env", f"GIT_INDEX_FILE={scratch}/.index",
+                   *_git(mirror, "--work-tree", str(scratch), "checkout", "HEAD", "--", ".")],
+                  capture=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def update_mirror(url: str, shell: Shell) -> Optional[Path]:
+    """
+    Create or fetch the mirror of ``url`` and return its path, or None if
+    mirrors are disabled or no usable mirror could be obtained.
+    """
+    if not mirrors_enabled():
+        return None
+    mirror = mirror_path(url)
+    if shell.dry_run:
+        if mirror.exists():
+            shell.run(_git(mirror, "fetch", "--prune", "--quiet", "--filter=blob:none", "origin"))
+        else:
+            shell.run(["git", "init", "--bare", "--quiet", str(mirror)])
+            shell.run(_git(mirror, "fetch", "--quiet", "--filter=blob:none", "origin"))
+        return mirror
+
+    with _thread_lock(mirror):
+        if mirror in _fetched:
+            return mirror
+        try:
+            with mirror_lock(mirror):
+                if mirror.exists():
+                    if not _fetch(mirror, shell):
+                        print(f"WARNING: Could not update mirror of {url}; using cached copy")
+                elif not _create(url, mirror, shell):
+                    return None
+                _hydrate_head(mirror, shell)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"WARNING: Git mirror cache unavailable ({e}); cloning directly")
+            return None
+        _fetched.add(mirror)
+        return mirror
+
+
+def checkout(url: str, dest: Path, shell: Shell):
+    """
+    Create or update the working tree ``dest`` of ``url`` from its mirror,
+    falling back to a direct shallow clone / pull when there is no mirror.
+
+    Trees are blob-less partial clones: HEAD's blobs come from the mirror,
+    older ones are fetched on demand from ``origin`` (the upstream URL).
+    """
+    mirror = update_mirror(url, shell)
+    if dest.exists():
+        if mirror is None:
+            shell.run(["git", "-C", str(dest), "pull"])
+        else:
+            shell.run(["git", "-C", str(dest), "config", f"remote.{MIRROR_REMOTE}.url", str(mirror)])
+            shell.run(["git", "-C", str(dest), "fetch", "--quiet", "--filter=blob:none",
+                       MIRROR_REMOTE, "HEAD"])
+            shell.run(["git", "-C", str(dest), "merge", "--quiet", "--no-edit", "FETCH_HEAD"])
+        return
+    if mirror is None:
+        shell.run(["git", "clone", "--depth", "1", url, str(dest)])
+        return
+    if not shell.dry_run:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+    shell.run(["git", "clone", "--quiet", "--no-local", "--filter=blob:none", str(mirror), str(dest)])
+    shell.run(["git", "-C", str(dest), "remote", "set-url", "origin", url])
+    shell.run(["git", "-C", str(dest), "config", f"remote.{MIRROR_REMOTE}.url", str(mirror)])
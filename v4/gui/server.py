@@ -9,6 +9,7 @@ needed because the server accepts only local connections.  All user-supplied
 strings are validated before being written to disk.
 """
 
+import functools
 import json
 import os
 import re
@@ -20,11 +21,6 @@ from pathlib import Path
 
 from flask import Flask, Response, jsonify, request, send_from_directory
 
-try:
-    import yaml
-except ImportError:
-    yaml = None
-
 # ── Marketing icon directory (served at /icons/<filename>) ────────────────────
 _MARKETING_ICONS = Path(os.path.expanduser("~/Marketing/Icons"))
 
@@ -58,9 +54,6 @@ except ImportError:
 APP = Flask(__name__, static_folder=str(_STATIC), static_url_path="/static")
 APP.config["SEND_FILE_MAX_AGE_DEFAULT"] = 0
 
-_TOOL_GROUP_CACHE: dict[str, str] | None = None
-
-
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def _load_state() -> tuple[dict, bool]:
@@ -114,43 +107,6 @@ def _list_script_commands() -> dict:
     return result
 
 
-def _format_group_label(group_name: str) -> str:
-    return group_name.replace("_", " ").strip().title()
-
-
-def _load_tool_groups() -> dict[str, str]:
-    """Map tool names to their YAML top-level group/category label."""
-    global _TOOL_GROUP_CACHE
-    if _TOOL_GROUP_CACHE is not None:
-        return _TOOL_GROUP_CACHE
-
-    groups: dict[str, str] = {}
-    if yaml is None:
-        _TOOL_GROUP_CACHE = groups
-        return groups
-
-    try:
-        raw = yaml.safe_load((_V4_DIR / "kali-tools-db.yaml").read_text()) or {}
-        for group_name, group_tools in raw.items():
-            if not isinstance(group_tools, dict):
-                continue
-
-            # Some tools are declared directly at the top level.
-            if any(key in group_tools for key in ["binary", "description", "packages", "metrics", "tags"]):
-                groups[group_name] = "Utilities"
-                continue
-
-            label = _format_group_label(group_name)
-            for tool_name, spec in group_tools.items():
-                if isinstance(spec, dict):
-                    groups[tool_name] = label
-    except Exception:
-        groups = {}
-
-    _TOOL_GROUP_CACHE = groups
-    return groups
-
-
 def _tokenize_prompt(text: str) -> list[str]:
     return re.findall(r"[a-z0-9][a-z0-9_\-]{1,}", text.lower())
 
@@ -357,15 +313,39 @@ def _build_advisor_plan_with_llm(prompt: str, installed_only: bool, model: str)
         return None
 
 
+def _advisor_candidates(prompt_terms: list[str], boosted: set[str], tools: dict) -> set[str] | None:
+    """Tools that can score > 0, via the SQLite FTS index (None = scan everything).
+
+    Installed tools and tools with profiles always earn a base score, so they
+    are kept; everything else must match a prompt term or be hint-boosted.
+    """
+    try:
+        from catalog import ToolCatalog
+        backend = ToolCatalog.get().sqlite()
+    except BaseException:
+        return None
+    if backend is None:
+        return None
+
+    candidates = set(boosted) | set(TOOL_PROFILES)
+    candidates.update(name for name, meta in tools.items() if meta.get("installed"))
+    for term in prompt_terms:
+        candidates.update(backend.match_names(term, ("name", "description", "tags", "grp")))
+    return candidates
+
+
 def _build_advisor_plan(prompt: str, installed_only: bool = True) -> dict:
     tools = _load_tools()
     prompt_terms = _tokenize_prompt(prompt)
     boosted = _advisor_hint_tools(prompt_terms)
+    candidates = None if installed_only else _advisor_candidates(prompt_terms, boosted, tools)
 
     ranked: list[tuple[int, dict]] = []
     for tool_name, meta in tools.items():
         if installed_only and not meta.get("installed"):
             continue
+        if candidates is not None and tool_name not in candidates:
+            continue
 
         use_case = _find_best_use_case(tool_name, prompt_terms)
         haystack = " ".join([
@@ -421,36 +401,49 @@ def _build_advisor_plan(prompt: str, installed_only: bool = True) -> dict:
     }
 
 
+@functools.lru_cache(maxsize=None)
+def _package_manager():
+    """System package manager, detected once per server process."""
+    try:
+        from hakpak4 import OSDetector, Shell
+        return OSDetector.detect_package_manager(Shell())
+    except (Exception, SystemExit):
+        # No supported package manager: fall back to state + PATH detection
+        return None
+
+
 def _load_tools() -> dict:
     """Load kali-tools-db and merge with installed state.
 
-    Installed status uses two sources in priority order:
+    Installed status uses three sources in priority order:
       1. state.json written by the HakPak4 CLI (single source of truth)
-      2. Live PATH check via shutil.which() as a fallback when state.json
-         does not yet exist (e.g. dev environment before first install).
+      2. The local package database (dpkg status, pacman local, rpmdb),
+         mapped onto each tool's native package in one pass and re-read
+         only when the database changes.
+      3. Live PATH check (served from the shared PATH index), only for
+         tools without a native package the database can answer for.
     The GUI and CLI therefore share the same backend state.
     """
     try:
-        # ToolLoader is defined in hakpak4_core; OS/Shell live in hakpak4.
-        from hakpak4_core import ToolLoader
+        # The shared catalog only re-reads the YAML/state.json when they change.
+        from catalog import ToolCatalog
     except ImportError:
         return {}
 
     try:
-        all_tools = ToolLoader.load_kali_tools()
+        catalog = ToolCatalog.get()
+        all_tools = catalog.tools
+        groups = catalog.groups
+        sources = catalog.installed_sources(_package_manager())
     except BaseException:
         return {}
 
-    state, state_loaded = _load_state()
-    installed_in_state = state.get("installed", {}) if isinstance(state, dict) else {}
+    state_loaded = catalog.state_loaded
 
     results = {}
     for name, tool in all_tools.items():
-        # Prefer CLI-managed state; keep PATH fallback so toolbox is never empty
-        # when state.json is missing/unreadable in dev contexts.
-        in_state = name in installed_in_state
-        on_path = bool(shutil.which(tool.binary or name))
-        is_installed = bool(in_state or on_path)
+        source = sources.get(name, "none")
+        is_installed = source != "none"
 
         results[name] = {
             "name":        tool.name,
@@ -458,14 +451,14 @@ def _load_tools() -> dict:
             "description": tool.description,
             "tags":        tool.tags,
             "category":    tool.category.value,
-            "tool_group":  _load_tool_groups().get(name, "Other"),
+            "tool_group":  groups.get(name, "Other"),
             "installed":   is_installed,
             "packages":    tool.packages,
             "size_mb":     round(
                 tool.metrics.estimated_size_mb + tool.metrics.dependencies_size_mb, 1
             ),
             "has_profile": name in TOOL_PROFILES,
-            "_installed_source": "state" if in_state else ("path" if on_path else "none"),
+            "_installed_source": source,
             "_state_loaded": state_loaded,
         }
     return results
@@ -531,14 +524,8 @@ def api_tools():
 @APP.get("/api/installed")
 def api_installed():
     """Return only installed tools (from state.json + PATH check)."""
-    state, _ = _load_state()
-    installed = state.get("installed", {})
     tools = _load_tools()
-    result = {
-        name: meta
-        for name, meta in tools.items()
-        if name in installed or shutil.which(meta.get("binary", name))
-    }
+    result = {name: meta for name, meta in tools.items() if meta.get("installed")}
     return jsonify({"ok": True, "tools": result})
 
 
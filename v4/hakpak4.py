@@ -12,8 +12,11 @@ import subprocess
 import shutil
 import platform
 import argparse
+import asyncio
 import json
 import re
+import threading
+import time
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from textwrap import dedent
@@ -21,17 +24,16 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 from version import VERSION
 
-try:
-    import yaml
-except ImportError:
-    yaml = None
-
 # Configuration
 HAKPAK4_ROOT = Path(os.environ.get("HAKPAK4_ROOT", "/opt/hakpak4")).resolve()
 TOOLS_MAP_PATH = Path(__file__).parent / "tools-map.yaml"
 KALI_TOOLS_PATH = Path(__file__).parent / "kali-tools-db.yaml"
 BIN_LINK_DIR = Path(os.environ.get("HAKPAK4_BIN", "/usr/local/bin"))
 STATE_FILE = HAKPAK4_ROOT / "state.json"
+CACHE_DIR = HAKPAK4_ROOT / "cache"
+# Concurrent read-only package-manager queries, and seconds before one is killed
+PROBE_CONCURRENCY = int(os.environ.get("HAKPAK4_PROBE_CONCURRENCY", "8"))
+PROBE_TIMEOUT = float(os.environ.get("HAKPAK4_PROBE_TIMEOUT", "120"))
 
 
 class ToolCategory(Enum):
@@ -127,6 +129,137 @@ class InstallParams:
         return True
 
 
+class PathIndex:
+    """
+    Executables on PATH, listed with one os.scandir() per directory and
+    rescanned only when that directory's mtime changes.  Answers the same
+    way as shutil.which() for plain command names.
+    """
+
+    # Misses re-stat the PATH directories at most this often (seconds).
+    REVALIDATE_INTERVAL = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._dirs: Dict[str, Tuple[int, Dict[str, str]]] = {}  # dir -> (mtime_ns, name -> path)
+        self._merged: Dict[str, str] = {}
+        self._checked = 0.0
+
+    @staticmethod
+    def _scan(directory: str) -> Dict[str, str]:
+        found = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            found[entry.name] = entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return found
+
+    def _revalidate(self):
+        path = os.environ.get("PATH", os.defpath)
+        directories = list(dict.fromkeys(d or os.curdir for d in path.split(os.pathsep)))
+        changed = path != self._path
+        dirs = {}
+        for directory in directories:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtime = -1
+            cached = self._dirs.get(directory)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, self._scan(directory) if mtime != -1 else {})
+                changed = True
+            dirs[directory] = cached
+        if changed:
+            merged: Dict[str, str] = {}
+            for directory in reversed(directories):
+                merged.update(dirs[directory][1])  # earlier PATH entries win
+            self._merged = merged
+        self._dirs = dirs
+        self._path = path
+        self._checked = time.monotonic()
+
+    def invalidate(self):
+        """Forget the scanned directories (e.g. after installing packages)"""
+        with self._lock:
+            self._dirs = {}
+            self._path = None
+
+    def which(self, name: str) -> Optional[str]:
+        if not name or os.sep in name:
+            return shutil.which(name) if name else None
+        with self._lock:
+            if self._path != os.environ.get("PATH", os.defpath):
+                self._revalidate()
+            found = self._merged.get(name)
+            if found is not None and os.access(found, os.X_OK):
+                return found
+            if time.monotonic() - self._checked >= self.REVALIDATE_INTERVAL or found is not None:
+                self._revalidate()
+                found = self._merged.get(name)
+            return found
+
+
+PATH_INDEX = PathIndex()
+
+
+class ProbePool:
+    """
+    Runs read-only probe commands (package queries) concurrently on asyncio
+    subprocesses: at most ``concurrency`` at once, each killed after
+    ``timeout`` seconds (returncode 124), identical commands run only once.
+    """
+
+    def __init__(self, concurrency: int = PROBE_CONCURRENCY, timeout: float = PROBE_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+
+    async def _probe(self, semaphore, cmd: List[str]) -> subprocess.CompletedProcess:
+        async with semaphore:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            except OSError as e:
+                return subprocess.CompletedProcess(cmd, 127, "", str(e))
+            try:
+                out, err = await asyncio.wait_for(proc.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                return subprocess.CompletedProcess(cmd, 124, "", f"timed out after {self.timeout:g}s")
+            return subprocess.CompletedProcess(cmd, proc.returncode,
+                                               out.decode(errors="ignore"),
+                                               err.decode(errors="ignore"))
+
+    async def _gather(self, commands: List[Tuple[str, ...]]) -> List[subprocess.CompletedProcess]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._probe(semaphore, list(cmd)) for cmd in commands))
+
+    def run(self, commands: List[List[str]]) -> List[subprocess.CompletedProcess]:
+        """Results for ``commands`` in order (stdout/stderr as text)"""
+        unique = list(dict.fromkeys(tuple(cmd) for cmd in commands))
+        if not unique:
+            return []
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            results = asyncio.run(self._gather(unique))
+        else:
+            # Already inside an event loop: give the probes their own loop and thread
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                results = executor.submit(asyncio.run, self._gather(unique)).result()
+        by_cmd = dict(zip(unique, results))
+        return [by_cmd[tuple(cmd)] for cmd in commands]
+
+
 class Shell:
     """Command execution wrapper"""
     def __init__(self, dry_run: bool = False):
@@ -142,7 +275,13 @@ class Shell:
         return subprocess.run(cmd, check=check)
 
     def which(self, name: str) -> Optional[str]:
-        return shutil.which(name)
+        return PATH_INDEX.which(name)
+
+    def probe_all(self, cmds: List[List[str]]) -> List[subprocess.CompletedProcess]:
+        """Run read-only query commands concurrently (see ProbePool); results in order"""
+        if self.dry_run:
+            return [self.run(cmd, check=False, capture=True) for cmd in cmds]
+        return ProbePool().run(cmds)
 
 
 class HardwareDetector:
@@ -274,7 +413,33 @@ class OSDetector:
 
 class CompatibilityScorer:
     """Calculate tool compatibility scores based on system info"""
-    
+
+    # Scoring rules.  catalog_columns (bitmaps) and catalog_sqlite (SQL) build
+    # their versions of score_tool from these, so change them only here.
+    PM_POINTS = 40              # native package for this package manager
+    SOURCE_POINTS = 20          # otherwise, can be built from source
+    # Security distros get a flat OS bonus; other distros get it when their
+    # package manager has the tool.
+    SECURITY_DISTRO_POINTS = 30
+    OS_PM_POINTS = 25
+    SECURITY_DISTROS = ("kali", "parrot")
+    OS_BONUS_PM = {
+        "ubuntu": "apt", "debian": "apt",
+        "arch": "pacman", "manjaro": "pacman",
+        "fedora": "dnf", "rhel": "dnf", "centos": "dnf",
+    }
+    # (available must exceed requirement * factor, points), best tier first
+    RAM_TIERS = ((2, 15), (1, 10))
+    DISK_TIERS = ((3, 15), (1, 10))
+    MAX_SCORE = 100
+
+    @staticmethod
+    def tier_points(available: float, required: float, tiers) -> int:
+        for factor, points in tiers:
+            if available > required * factor:
+                return points
+        return 0
+
     @staticmethod
     def score_tool(tool: Tool, system_info: SystemInfo) -> int:
         """
@@ -285,43 +450,50 @@ class CompatibilityScorer:
         pm = system_info.package_manager
         os_id = system_info.os_id
         
+        scorer = CompatibilityScorer
+        
         # Package manager compatibility (40 points)
         if pm in tool.packages:
-            score += 40
+            score += scorer.PM_POINTS
         elif tool.source:
-            score += 20  # Can be built from source
+            score += scorer.SOURCE_POINTS  # Can be built from source
         
         # OS-specific packages (30 points)
-        if os_id in ("kali", "parrot"):
-            score += 30  # Perfect match for security distros
-        elif os_id in ("ubuntu", "debian"):
-            if "apt" in tool.packages:
-                score += 25
-        elif os_id in ("arch", "manjaro"):
-            if "pacman" in tool.packages:
-                score += 25
-        elif os_id in ("fedora", "rhel", "centos"):
-            if "dnf" in tool.packages:
-                score += 25
+        if os_id in scorer.SECURITY_DISTROS:
+            score += scorer.SECURITY_DISTRO_POINTS  # Perfect match for security distros
+        elif scorer.OS_BONUS_PM.get(os_id) in tool.packages:
+            score += scorer.OS_PM_POINTS
         
         # Resource availability (30 points)
-        if system_info.available_ram_mb > tool.metrics.ram_required_mb * 2:
-            score += 15
-        elif system_info.available_ram_mb > tool.metrics.ram_required_mb:
-            score += 10
-        else:
-            score += 0
-        
+        score += scorer.tier_points(system_info.available_ram_mb,
+                                    tool.metrics.ram_required_mb, scorer.RAM_TIERS)
         total_required_gb = (tool.metrics.estimated_size_mb + 
                             tool.metrics.dependencies_size_mb) / 1024
-        if system_info.available_disk_gb > total_required_gb * 3:
-            score += 15
-        elif system_info.available_disk_gb > total_required_gb:
-            score += 10
-        else:
-            score += 0
+        score += scorer.tier_points(system_info.available_disk_gb,
+                                    total_required_gb, scorer.DISK_TIERS)
         
-        return min(score, 100)
+        return min(score, scorer.MAX_SCORE)
+
+    @staticmethod
+    def fingerprint(system_info: SystemInfo) -> Tuple:
+        """The SystemInfo fields that score_tool depends on"""
+        return (system_info.package_manager, system_info.os_id,
+                system_info.available_ram_mb, system_info.available_disk_gb)
+
+    @staticmethod
+    def score_all(tools: List[Tool], system_info: SystemInfo,
+                  table: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Scores for many tools at once, keyed by tool name.
+        ``table`` holds precomputed scores for the catalog the tools came from
+        (see ToolCatalog.scores); tools missing from it fall back to score_tool.
+        """
+        table = table or {}
+        return {
+            tool.name: table[tool.name] if tool.name in table
+            else CompatibilityScorer.score_tool(tool, system_info)
+            for tool in tools
+        }
 
 
 class StateManager:
@@ -4,8 +4,10 @@ HakPak4 Core Functionality - Installation, Dependency Resolution, and Menu Syste
 """
 
 from dataclasses import dataclass
+from typing import Callable, Iterator, TextIO
 
 from hakpak4 import *
+from catalog import ToolCatalog
 
 
 class DependencyResolver:
@@ -77,8 +79,8 @@ class DependencyResolver:
             "git-bash": ["git"],
             "git": ["git"],
             "pip": ["python3", "python3-pip"],
-            "deb": ["wget"],
-            "wine-binary": ["wine", "wget", "unzip"],
+            "deb": [],
+            "wine-binary": ["wine", "unzip"],
         }.get(source_type, [])
 
         packages = []
@@ -106,13 +108,56 @@ class DependencyResolver:
         }
 
 
+class TransactionAborted(RuntimeError):
+    """The package manager is locked or offline, so further install attempts are pointless"""
+
+
 class PackageInstaller:
     """Handles package installation across different package managers"""
     
+    # Packages per availability query (keeps argv well below ARG_MAX)
+    QUERY_BATCH = 200
+    # Packages per query when answers are consumed progressively (iter_candidates)
+    PROGRESS_CHUNK = 25
+    # Queries hold the zypp lock; a second concurrent zypper exits with 7
+    SERIAL_QUERY_PMS = {"zypper"}
+    # Failures that are not caused by any package (lock held, network down);
+    # package managers use one exit code for everything, so match the output
+    SYSTEMIC_FAILURE = re.compile(
+        r"Could not get lock|Unable to acquire the dpkg frontend lock|unable to lock database"
+        r"|System management is locked|Waiting for process with pid"
+        r"|Could not resolve|Temporary failure (?:resolving|in name resolution)"
+        r"|Network is unreachable|Failed to download metadata", re.I)
+
     def __init__(self, shell: Shell, system_info: SystemInfo):
         self.shell = shell
         self.system_info = system_info
         self._updated = False
+        # package -> candidate version ("" if unknown), None if unavailable
+        self._availability: Dict[str, Optional[str]] = {}
+        self._cache_loaded = False
+        self._native = None
+        self._native_loaded = False
+        self._bisecting = False
+
+    def _mark_updated(self):
+        # Refreshed indexes may change what is available.
+        self._updated = True
+        self._availability.clear()
+        self._cache_loaded = False
+        self._native_loaded = False
+
+    def native_index(self):
+        """In-process package index (pkgindex.PackageIndex) for this package manager, or None"""
+        if not self._native_loaded:
+            from pkgindex import native_index
+            self._native = native_index(self.system_info.package_manager)
+            self._native_loaded = True
+        return self._native
+
+    def _availability_cache(self):
+        from pkgcache import AvailabilityCache
+        return AvailabilityCache(self.system_info.package_manager)
 
     @staticmethod
     def _as_text(value) -> str:
@@ -120,24 +165,38 @@ class PackageInstaller:
             return value.decode(errors="ignore")
         return value or ""
     
-    def ensure_root(self):
+    @staticmethod
+    def ensure_root():
         """Ensure running as root"""
         if os.geteuid() != 0:
             raise SystemExit("ERROR: This operation requires root privileges. Please run with sudo.")
     
-    def apt_install(self, packages: List[str]):
+    def refresh_indexes(self):
+        """Refresh the package indexes once per installer (apt update, pacman -Sy, zypper refresh)"""
+        if self._updated:
+            return
+        refresh = {
+            "apt": ["apt", "update", "-y"],
+            "pacman": ["pacman", "-Sy", "--noconfirm"],
+            "zypper": ["zypper", "--non-interactive", "refresh"],
+        }.get(self.system_info.package_manager)
+        if refresh:
+            self.shell.run(refresh)
+            self._mark_updated()
+
+    def apt_install(self, packages: List[str], retry_downgrades: bool = True):
         """Install packages using apt"""
-        if not self._updated:
-            self.shell.run(["apt", "update", "-y"])
-            self._updated = True
+        self.refresh_indexes()
         try:
-            self.shell.run([
+            self._run_install([
                 "env", "DEBIAN_FRONTEND=noninteractive",
                 "apt", "install", "-y", "--no-install-recommends", *packages
             ])
         except subprocess.CalledProcessError:
+            if not retry_downgrades:
+                raise
             # Retry with downgrades
-            self.shell.run([
+            self._run_install([
                 "env", "DEBIAN_FRONTEND=noninteractive",
                 "apt", "install", "-y", "--allow-downgrades", 
                 "--no-install-recommends", *packages
@@ -145,28 +204,40 @@ class PackageInstaller:
     
     def dnf_install(self, packages: List[str]):
         """Install packages using dnf"""
-        self.shell.run(["dnf", "-y", "install", *packages])
+        self._run_install(["dnf", "-y", "install", *packages])
     
     def pacman_install(self, packages: List[str]):
         """Install packages using pacman"""
-        if not self._updated:
-            self.shell.run(["pacman", "-Sy", "--noconfirm"])
-            self._updated = True
-        self.shell.run(["pacman", "-S", "--noconfirm", *packages])
+        self.refresh_indexes()
+        self._run_install(["pacman", "-S", "--noconfirm", *packages])
     
     def zypper_install(self, packages: List[str]):
         """Install packages using zypper"""
-        if not self._updated:
-            self.shell.run(["zypper", "--non-interactive", "refresh"])
-            self._updated = True
-        self.shell.run(["zypper", "--non-interactive", "install", 
+        self.refresh_indexes()
+        self._run_install(["zypper", "--non-interactive", "install", 
                        "--no-recommends", *packages])
     
-    def install_packages(self, packages: List[str]):
+    def _run_install(self, cmd: List[str]):
+        """
+        shell.run for install commands.  While bisecting, the output is
+        captured (and echoed) so that lock and network errors can be told
+        apart from packages that fail to install.
+        """
+        if not self._bisecting:
+            return self.shell.run(cmd)
+        result = self.shell.run(cmd, check=False, capture=True)
+        stdout, stderr = self._as_text(result.stdout), self._as_text(result.stderr)
+        sys.stdout.write(stdout)
+        sys.stderr.write(stderr)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, cmd, stdout, stderr)
+        return result
+
+    def install_packages(self, packages: List[str], retry_downgrades: bool = True):
         """Install packages using detected package manager"""
         pm = self.system_info.package_manager
         installers = {
-            "apt": self.apt_install,
+            "apt": lambda pkgs: self.apt_install(pkgs, retry_downgrades),
             "dnf": self.dnf_install,
             "yum": self.dnf_install,
             "pacman": self.pacman_install,
@@ -178,51 +249,216 @@ class PackageInstaller:
         
         print(f"\nInstalling {len(packages)} package(s) using {pm}...")
         installers[pm](packages)
+        PATH_INDEX.invalidate()
         print("Package installation complete")
 
+    def install_transaction(self, packages: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Install ``packages`` in a single package-manager transaction.  If it
+        fails, the set is bisected so every package that can be installed
+        still is and the ones that can't are isolated (without apt's
+        downgrade retry).  Bisection stops early only when the package
+        manager reports a lock or network error (SYSTEMIC_FAILURE), which
+        would make every further attempt fail.  Returns (installed, failed).
+        """
+        packages = list(dict.fromkeys(p for p in packages if p))
+        if not packages:
+            return [], []
+        try:
+            self.install_packages(packages)
+            return packages, []
+        except subprocess.CalledProcessError:
+            if len(packages) == 1:
+                return [], packages
+            print(f"\nTransaction failed; bisecting {len(packages)} packages to isolate the failures...")
+        installed: List[str] = []
+        self._bisecting = True
+        try:
+            self._bisect_install(packages, installed)
+        except TransactionAborted as e:
+            print(f"\nWARNING: {e}; not retrying the remaining packages")
+        finally:
+            self._bisecting = False
+        return installed, [p for p in packages if p not in installed]
+
+    def _bisect_install(self, packages: List[str], installed: List[str]):
+        """Install what can be installed from ``packages``, adding it to ``installed``"""
+        for half in (packages[:len(packages) // 2], packages[len(packages) // 2:]):
+            try:
+                self.install_packages(half, retry_downgrades=False)
+                installed.extend(half)
+            except subprocess.CalledProcessError as e:
+                if self.SYSTEMIC_FAILURE.search(f"{e.stdout or ''}{e.stderr or ''}"):
+                    raise TransactionAborted(f"{self.system_info.package_manager} is locked or offline")
+                if len(half) > 1:
+                    self._bisect_install(half, installed)
+
     def is_package_available(self, package: str) -> bool:
         """Check if a package is available in the detected package manager"""
-        pm = self.system_info.package_manager
-
-        if pm == "apt":
-            result = self.shell.run(["apt-cache", "policy", package], check=False, capture=True)
-            output = self._as_text(result.stdout) + self._as_text(result.stderr)
-            if "Unable to locate package" in output or "N: Unable to locate package" in output:
-                return False
-            if "Candidate: (none)" in output:
-                return False
-            if "Candidate:" in output:
-                return True
+        return self.packages_available([package])[package]
 
-            result = self.shell.run(["apt-cache", "show", package], check=False, capture=True)
-            output = self._as_text(result.stdout) + self._as_text(result.stderr)
-            if "No packages found" in output or "Unable to locate package" in output:
-                return False
-            return result.returncode == 0 and bool(output.strip())
+    def packages_available(self, packages: List[str]) -> Dict[str, bool]:
+        """Availability for many packages at once (see package_candidates)"""
+        candidates = self.package_candidates(packages)
+        return {p: candidates[p] is not None for p in packages}
 
+    def package_candidates(self, packages: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Candidate version for many packages at once ("" if the version is
+        unknown, None if the package is unavailable).
+
+        Answers come from the on-disk availability cache while the package
+        indexes are unchanged; the rest are resolved with one package-manager
+        query per QUERY_BATCH names (``apt-cache policy p1 p2 ...``, ``dnf
+        list available ...``, ``pacman -Si ...``, ``zypper info ...``), the
+        batches and any per-package follow-ups running concurrently through
+        ``Shell.probe_all``.  A native index (pkgindex.py) answers without
+        any subprocess at all.
+        """
+        known = self.known_candidates(packages)
+        pending = [p for p in dict.fromkeys(packages) if p and p not in known]
+        answers = self._query_candidates(pending) if pending else {}
+        self._record(answers)
+        return {p: answers[p] if p in answers else known.get(p) for p in packages}
+
+    def known_candidates(self, packages: List[str]) -> Dict[str, Optional[str]]:
+        """Answers available without querying the package manager (native index, memo, disk cache)"""
+        native = self.native_index()
+        if native is not None:
+            return native.candidates(packages)
+
+        if not self._cache_loaded:
+            self._cache_loaded = True
+            for package, candidate in self._availability_cache().load().items():
+                self._availability.setdefault(package, candidate)
+        return {p: self._availability[p] for p in packages if p in self._availability}
+
+    def iter_candidates(self, packages: List[str]) -> Iterator[Dict[str, Optional[str]]]:
+        """
+        Like package_candidates, but yields answers as they arrive: everything
+        already known first (possibly empty, without waiting), then one dict per PROGRESS_CHUNK packages as the
+        concurrent queries finish (in completion order; one at a time for
+        SERIAL_QUERY_PMS).
+        """
+        known = self.known_candidates(packages)
+        yield known
+        pending = [p for p in dict.fromkeys(packages) if p and p not in known]
+        if not pending:
+            return
+        chunks = [pending[i:i + self.PROGRESS_CHUNK] for i in range(0, len(pending), self.PROGRESS_CHUNK)]
+
+        workers = 1 if self.system_info.package_manager in self.SERIAL_QUERY_PMS else PROBE_CONCURRENCY
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            futures = [executor.submit(self._query_candidates, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                answers = future.result()
+                self._record(answers)
+                yield answers
+
+    def _record(self, answers: Dict[str, Optional[str]]):
+        if answers:
+            self._availability.update(answers)
+            if not self.shell.dry_run:
+                self._availability_cache().store(answers)
+
+    def _query_command(self, packages: List[str]) -> Optional[List[str]]:
+        """Availability query for one batch, or None if the package manager has none"""
+        pm = self.system_info.package_manager
+        if pm == "apt":
+            return ["env", "LC_ALL=C", "apt-cache", "policy", *packages]
         if pm in {"dnf", "yum"}:
-            result = self.shell.run([pm, "list", "available", package], check=False, capture=True)
-            output = self._as_text(result.stdout) + self._as_text(result.stderr)
-            if "No matching Packages" in output:
-                return False
-            return result.returncode == 0
-
+            return ["env", "LC_ALL=C", pm, "list", "available", *packages]
         if pm == "pacman":
-            result = self.shell.run(["pacman", "-Si", package], check=False, capture=True)
-            output = self._as_text(result.stdout) + self._as_text(result.stderr)
-            if "error: package" in output and "was not found" in output:
-                return False
-            return result.returncode == 0
-
+            return ["env", "LC_ALL=C", "pacman", "-Si", *packages]
         if pm == "zypper":
-            result = self.shell.run(["zypper", "--non-interactive", "info", package], check=False, capture=True)
-            output = self._as_text(result.stdout) + self._as_text(result.stderr)
-            if "not found" in output.lower():
-                return False
-            return result.returncode == 0
+            return ["env", "LC_ALL=C", "zypper", "--non-interactive", "info", *packages]
+        return None
 
-        # Default to True for other package managers
-        return True
+    def _query_candidates(self, packages: List[str]) -> Dict[str, Optional[str]]:
+        pm = self.system_info.package_manager
+        batches = [packages[i:i + self.QUERY_BATCH] for i in range(0, len(packages), self.QUERY_BATCH)]
+        commands = [self._query_command(batch) for batch in batches]
+        if commands[0] is None:
+            # Default to available for other package managers
+            return {p: "" for p in packages}
+
+        answers: Dict[str, Optional[str]] = {}
+        unconfirmed: List[str] = []
+        for batch, result in zip(batches, self._probe(commands)):
+            stdout = self._as_text(result.stdout)
+
+            if pm == "apt":
+                candidates, blocks = self._parse_apt_policy(stdout)
+                for package in batch:
+                    if package in candidates:
+                        answers[package] = candidates[package]
+                    elif package in blocks:
+                        # Block without a Candidate line: confirm with apt-cache show
+                        unconfirmed.append(package)
+                    else:
+                        answers[package] = None
+
+            elif pm in {"dnf", "yum"}:
+                listed: Dict[str, str] = {}
+                for line in stdout.splitlines():
+                    fields = line.split()
+                    if fields and not line[0].isspace() and "." in fields[0]:
+                        listed[fields[0].rsplit(".", 1)[0]] = fields[1] if len(fields) > 1 else ""
+                answers.update({p: listed.get(p) for p in batch})
+
+            elif pm == "pacman":
+                versions = dict(re.findall(r"^Name\s*:\s*(\S+)\n(?:.*\n)*?Version\s*:\s*(\S+)",
+                                           stdout, re.M))
+                answers.update({p: versions.get(p.rsplit("/", 1)[-1]) for p in batch})
+
+            elif pm == "zypper":
+                output = stdout + self._as_text(result.stderr)
+                missing = {m.lower() for m in re.findall(r"package '([^']+)' not found", output, re.I)}
+                found: Dict[str, str] = {}
+                for block in re.split(r"^(?=Information for package )", output, flags=re.M):
+                    header = re.match(r"Information for package (\S+?):?$", block, re.M)
+                    if header:
+                        version = re.search(r"^Version\s*:\s*(\S+)", block, re.M)
+                        found[header.group(1).lower()] = version.group(1) if version else ""
+                answers.update({p: None if p.lower() in missing else found.get(p.lower())
+                                for p in batch})
+
+        if unconfirmed:
+            shows = self.shell.probe_all([["apt-cache", "show", p] for p in unconfirmed])
+            for package, result in zip(unconfirmed, shows):
+                answers[package] = "" if self._apt_show_found(result) else None
+        return answers
+
+    def _probe(self, commands: List[List[str]]) -> List[subprocess.CompletedProcess]:
+        """Shell.probe_all, one command at a time for package managers in SERIAL_QUERY_PMS"""
+        if self.system_info.package_manager in self.SERIAL_QUERY_PMS:
+            return [result for cmd in commands for result in self.shell.probe_all([cmd])]
+        return self.shell.probe_all(commands)
+
+    @staticmethod
+    def _parse_apt_policy(output: str) -> Tuple[Dict[str, Optional[str]], set]:
+        """
+        ``apt-cache policy`` output -> ({package: candidate or None}, packages seen).
+        Packages with a block but no Candidate line appear only in the second.
+        """
+        candidates: Dict[str, Optional[str]] = {}
+        blocks = set()
+        current = None
+        for line in output.splitlines():
+            if line and not line[0].isspace() and line.endswith(":"):
+                current = line[:-1]
+                blocks.add(current)
+            elif current is not None and line.strip().startswith("Candidate:"):
+                candidate = line.split(":", 1)[1].strip()
+                candidates[current] = None if candidate == "(none)" else candidate
+        return candidates, blocks
+
+    def _apt_show_found(self, result) -> bool:
+        output = self._as_text(result.stdout) + self._as_text(result.stderr)
+        if "No packages found" in output or "Unable to locate package" in output:
+            return False
+        return result.returncode == 0 and bool(output.strip())
 
 
 class ToolLoader:
@@ -230,74 +466,13 @@ class ToolLoader:
     
     @staticmethod
     def load_kali_tools() -> Dict[str, Tool]:
-        """Load tools from Kali tools database"""
-        if yaml is None:
-            raise SystemExit("PyYAML is required. Install with: pip install pyyaml")
-        
-        if not KALI_TOOLS_PATH.exists():
-            raise SystemExit(f"Kali tools database not found: {KALI_TOOLS_PATH}")
-        
-        with open(KALI_TOOLS_PATH, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
-        
-        tools = {}
-        for category, category_tools in data.items():
-            if not isinstance(category_tools, dict):
-                continue
-
-            # If this looks like a single tool spec (top-level tool), load it directly
-            if any(key in category_tools for key in ["binary", "description", "packages", "metrics", "tags"]):
-                spec = category_tools
-                metrics_data = spec.get("metrics", {})
-                tools[category] = Tool(
-                    name=category,
-                    binary=spec.get("binary", category),
-                    category=ToolCategory.STANDARD,
-                    description=spec.get("description", ""),
-                    packages=spec.get("packages", {}),
-                    source=spec.get("source"),
-                    dependencies=spec.get("dependencies", []),
-                    metrics=ToolMetrics(
-                        estimated_size_mb=metrics_data.get("estimated_size_mb", 10.0),
-                        dependencies_size_mb=metrics_data.get("dependencies_size_mb", 5.0),
-                        ram_required_mb=metrics_data.get("ram_required_mb", 128),
-                        compatibility_score=0  # Will be calculated
-                    ),
-                    kali_metapackage=spec.get("kali_metapackage"),
-                    tags=spec.get("tags", [])
-                )
-                continue
-            
-            # Otherwise, treat as a category with tools inside
-            for name, spec in category_tools.items():
-                if not isinstance(spec, dict):
-                    continue
-                
-                metrics_data = spec.get("metrics", {})
-                tools[name] = Tool(
-                    name=name,
-                    binary=spec.get("binary", name),
-                    category=ToolCategory.STANDARD,
-                    description=spec.get("description", ""),
-                    packages=spec.get("packages", {}),
-                    source=spec.get("source"),
-                    dependencies=spec.get("dependencies", []),
-                    metrics=ToolMetrics(
-                        estimated_size_mb=metrics_data.get("estimated_size_mb", 10.0),
-                        dependencies_size_mb=metrics_data.get("dependencies_size_mb", 5.0),
-                        ram_required_mb=metrics_data.get("ram_required_mb", 128),
-                        compatibility_score=0  # Will be calculated
-                    ),
-                    kali_metapackage=spec.get("kali_metapackage"),
-                    tags=spec.get("tags", [])
-                )
-        
-        return tools
+        """Load tools from Kali tools database (shared, change-driven catalog)"""
+        return ToolCatalog.get().tools
     
     @staticmethod
     def get_installed_tools(all_tools: Dict[str, Tool]) -> List[Tool]:
         """Get list of currently installed tools"""
-        installed_names = StateManager.get_installed_tools()
+        installed_names = ToolCatalog.get().state.get("installed", {})
         return [all_tools[name] for name in installed_names if name in all_tools]
     
     @staticmethod
@@ -316,7 +491,7 @@ class ToolLoader:
     @staticmethod
     def get_custom_tools(all_tools: Dict[str, Tool]) -> List[Tool]:
         """Get list of custom/extended Kali tools"""
-        custom_names = StateManager.get_custom_tools()
+        custom_names = ToolCatalog.get().custom_names()
         return [all_tools[name] for name in custom_names if name in all_tools]
 
 
@@ -350,6 +525,9 @@ def build_install_plan(tools: List[Tool], system_info: SystemInfo, shell: Shell)
     low_ram: List[InstallPlanItem] = []
     insufficient_disk: List[InstallPlanItem] = []
 
+    # One batched availability query for every native package up front
+    installer.packages_available([t.packages[pm] for t in tools if t.packages and t.packages.get(pm)])
+
     for tool in tools:
         resources = resolver.check_resources(tool)
         if not resources["disk_ok"]:
@@ -392,18 +570,73 @@ def build_install_plan(tools: List[Tool], system_info: SystemInfo, shell: Shell)
             low_ram.append(item)
 
     # Deduplicate dependency packages and filter unavailable ones
-    unique_deps = []
-    seen = set()
-    for dep in dep_packages:
-        if dep in seen:
-            continue
-        seen.add(dep)
-        if installer.is_package_available(dep):
-            unique_deps.append(dep)
+    dep_availability = installer.packages_available(dep_packages)
+    unique_deps = [dep for dep in dict.fromkeys(dep_packages) if dep_availability[dep]]
     return InstallPlan(items=items, dependency_packages=unique_deps,
                        skipped=skipped, low_ram=low_ram, insufficient_disk=insufficient_disk)
 
 
+GIT_SOURCE_TYPES = {"python-git", "ruby-git", "git-bash", "git"}
+
+
+class DownloadPrefetcher:
+    """
+    Download-ahead stage for an install plan: .deb/wine archives
+    (downloadcache.py) and git mirrors (gitmirror.py) are fetched
+    concurrently in the background while the indexes refresh and earlier
+    items install, so the install steps mostly consume local artifacts.
+    Native packages are left to the install transaction, which downloads
+    them itself.  Prefetch failures are not fatal; the install step then
+    fetches as it always did.
+    """
+
+    def __init__(self, shell: Shell, system_info: SystemInfo, workers: int = 4):
+        from concurrent.futures import ThreadPoolExecutor
+        self.shell = shell
+        self.system_info = system_info
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._futures = {}
+
+    def sources(self, tools: List[Tool]):
+        """Update git mirrors and download .deb/wine archives for source installs"""
+        for tool in tools:
+            if tool.name not in self._futures:
+                self._futures[tool.name] = self._executor.submit(self._prefetch_source, tool)
+
+    def _prefetch_source(self, tool: Tool) -> bool:
+        source = tool.source or {}
+        if source.get("type") in {"deb", "wine-binary"} and source.get("url"):
+            from downloadcache import DownloadError, fetch
+            try:
+                fetch(source["url"], source.get("sha256"), self.shell)
+            except DownloadError:
+                return False
+            return True
+
+        repo = source.get("repo")
+        if not repo or source.get("type") not in GIT_SOURCE_TYPES:
+            return False
+        from gitmirror import update_mirror
+        return update_mirror(repo, self.shell) is not None
+
+    def wait(self, name: str):
+        """Block until the prefetch of tool ``name`` has finished"""
+        future = self._futures.get(name)
+        if future is not None:
+            future.exception()  # a failed prefetch just leaves the fetch to the install step
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def _checkout_source(tool: Tool, repo: str, shell: Shell) -> Path:
+    """Working tree for a git source install, cloned or updated from the shared mirror cache"""
+    from gitmirror import checkout
+    src_dir = HAKPAK4_ROOT / "src" / tool.name
+    checkout(repo, src_dir, shell)
+    return src_dir
+
+
 def execute_install_plan(plan: InstallPlan, system_info: SystemInfo, shell: Shell):
     """Install dependencies first, then tools based on plan"""
     installable = [i for i in plan.items if i.method in {"native", "source"}]
@@ -435,98 +668,314 @@ def execute_install_plan(plan: InstallPlan, system_info: SystemInfo, shell: Shel
     installer = PackageInstaller(shell, system_info)
     installer.ensure_root()
 
-    # Install dependencies up front
-    if plan.dependency_packages:
-        print("\nOptimizing dependencies before tool installs...")
-        installer.install_packages(plan.dependency_packages)
+    outcomes: Dict[str, str] = {}
 
-    # Install tools
-    for item in installable:
+    from install_scheduler import install_jobs
+    from toolcaches import caches_in_use
+    with caches_in_use():
+        prefetcher = DownloadPrefetcher(shell, system_info, workers=install_jobs())
         try:
-            if item.method == "native":
-                pkg = item.package
-                if not pkg:
-                    print(f"\nERROR: Missing package mapping for {item.tool.name}")
-                    continue
-                if not installer.is_package_available(pkg):
-                    if item.tool.source:
-                        print(f"\nPackage '{pkg}' not available via {system_info.package_manager}. Falling back to source...")
-                        install_from_source(item.tool, shell, system_info)
-                        StateManager.mark_installed(item.tool.name, "source", "custom")
-                        print(f"\nSuccessfully installed {item.tool.name} from source")
-                    else:
-                        print(f"\nSKIPPED: Package '{pkg}' not available via {system_info.package_manager}")
-                    continue
+            _execute_with_prefetch(plan, installable, installer, prefetcher, system_info, shell, outcomes)
+        finally:
+            prefetcher.close()
 
-                print(f"\nInstalling native package for {item.tool.name}...")
-                installer.install_packages([pkg])
+    print("\n" + "="*70)
+    print("  INSTALL RESULTS")
+    print("="*70)
+    for item in installable:
+        print(f"  {item.tool.name:<24} {outcomes.get(item.tool.name, 'not attempted')}")
+
+
+def _execute_with_prefetch(plan: InstallPlan, installable: List[InstallPlanItem],
+                           installer: "PackageInstaller", prefetcher: DownloadPrefetcher,
+                           system_info: SystemInfo, shell: Shell, outcomes: Dict[str, str]):
+    # Source artifacts start downloading while the package indexes refresh
+    prefetcher.sources([i.tool for i in installable if i.method == "source"])
+
+    # Availability is re-checked (in one query) against freshly updated indexes
+    installer.refresh_indexes()
+    native_items = [i for i in installable if i.method == "native"]
+    available = installer.packages_available([i.package for i in native_items if i.package])
+    fallback: List[InstallPlanItem] = []
+    transaction_items: List[InstallPlanItem] = []
+    for item in native_items:
+        if not item.package:
+            print(f"\nERROR: Missing package mapping for {item.tool.name}")
+            outcomes[item.tool.name] = "FAILED (missing package mapping)"
+        elif available[item.package]:
+            transaction_items.append(item)
+        elif item.tool.source:
+            print(f"\nPackage '{item.package}' not available via {system_info.package_manager}. Falling back to source...")
+            fallback.append(item)
+        else:
+            print(f"\nSKIPPED: Package '{item.package}' not available via {system_info.package_manager}")
+            outcomes[item.tool.name] = "skipped (package not available)"
+
+    # Dependencies and every native tool package in one transaction
+    packages = list(plan.dependency_packages) + [i.package for i in transaction_items]
+    prefetcher.sources([i.tool for i in fallback])
+    if packages:
+        print(f"\nInstalling {len(transaction_items)} native tool(s) and "
+              f"{len(plan.dependency_packages)} dependency package(s) in one transaction...")
+        _, failed = installer.install_transaction(packages)
+        failed_deps = [p for p in failed if p in plan.dependency_packages]
+        if failed_deps:
+            print(f"\nWARNING: Dependency packages failed to install: {', '.join(failed_deps)}")
+        for item in transaction_items:
+            if item.package not in failed:
                 StateManager.mark_installed(item.tool.name, "native", "standard")
-                print(f"\nSuccessfully installed {item.tool.name}")
+                outcomes[item.tool.name] = "installed (native)"
+            elif item.tool.source:
+                print(f"\nPackage '{item.package}' failed to install. Falling back to source...")
+                fallback.append(item)
             else:
-                print(f"\nInstalling {item.tool.name} from source...")
-                install_from_source(item.tool, shell, system_info)
-                StateManager.mark_installed(item.tool.name, "source", "custom")
-                print(f"\nSuccessfully installed {item.tool.name} from source")
-        except Exception as e:
-            print(f"\nERROR: Installation failed for {item.tool.name}: {e}")
+                outcomes[item.tool.name] = f"FAILED (package '{item.package}' did not install)"
+
+    source_items = fallback + [i for i in installable if i.method == "source"]
+    if source_items:
+        _install_sources(source_items, shell, system_info, outcomes, prefetcher)
+
+
+def _install_sources(items: List[InstallPlanItem], shell: Shell, system_info: SystemInfo,
+                     outcomes: Dict[str, str], prefetcher: Optional[DownloadPrefetcher] = None):
+    """Source installs on the parallel scheduler (install_scheduler.py); Go tools share one toolchain job"""
+    from install_scheduler import Job, JobScheduler
+
+    def source_job(tool: Tool) -> Callable[[Shell], None]:
+        def action(job_shell: Shell):
+            if prefetcher is not None:
+                prefetcher.wait(tool.name)
+            print(f"\nInstalling {tool.name} from source...")
+            install_from_source(tool, job_shell, system_info)
+        return action
+
+    jobs = []
+    go_tools = [i for i in items if (i.tool.source or {}).get("type") == "go"]
+    if go_tools:
+        jobs.append(Job("go-toolchain", lambda job_shell: ensure_go_toolchain(job_shell, system_info)))
+    for item in items:
+        after = ["go-toolchain"] if item in go_tools else []
+        jobs.append(Job(item.tool.name, source_job(item.tool), after))
+
+    names = {item.tool.name for item in items}
+
+    def on_done(job, error):
+        # Runs on the calling thread, so state.json is only written from here
+        if error is not None:
+            print(f"\nERROR: Installation failed for {job.name}: {error}")
+            if job.name in names:
+                outcomes[job.name] = f"FAILED ({error})"
+        elif job.name in names:
+            StateManager.mark_installed(job.name, "source", "custom")
+            outcomes[job.name] = "installed from source"
+            print(f"\nSuccessfully installed {job.name} from source")
+
+    JobScheduler(shell).run(jobs, on_done)
+
+
+def cmd_update(names: List[str], check_only: bool = False, shell: Optional[Shell] = None) -> int:
+    """
+    ``hakpak4 update``: compare every git-based source tool in state.json with
+    its remote HEAD (all ``git ls-remote`` / ``rev-parse`` probes run
+    concurrently) and rebuild only the tools that are behind, on the
+    parallel install scheduler.
+    """
+    shell = shell or Shell()
+    installed = StateManager.load_state().get("installed", {})
+    tools = ToolCatalog.get().tools
+    unknown = [n for n in names if n not in installed]
+    if unknown:
+        print(f"ERROR: Not installed by HakPak4: {', '.join(unknown)}")
+        return 1
+
+    candidates = []
+    for name in names or sorted(installed):
+        tool = tools.get(name)
+        source = (tool.source or {}) if tool else {}
+        if installed[name].get("method") == "source" and source.get("type") in GIT_SOURCE_TYPES \
+                and source.get("repo"):
+            candidates.append(tool)
+    if not candidates:
+        print("No git-based source tools installed.")
+        return 0
 
+    print(f"Checking {len(candidates)} source tool(s) for upstream changes...")
+    probes = []
+    for tool in candidates:
+        probes.append(["env", "GIT_TERMINAL_PROMPT=0", "git", "ls-remote", tool.source["repo"], "HEAD"])
+        probes.append(["git", "-C", str(HAKPAK4_ROOT / "src" / tool.name), "rev-parse", "HEAD"])
+    results = shell.probe_all(probes)
+
+    outdated: List[Tool] = []
+    for i, tool in enumerate(candidates):
+        remote, local = results[2 * i], results[2 * i + 1]
+        remote_head = (remote.stdout or "").split("\t", 1)[0].strip() if remote.returncode == 0 else ""
+        local_head = (local.stdout or "").strip() if local.returncode == 0 else ""
+        if not remote_head:
+            print(f"  {tool.name:<24} remote unreachable, skipped")
+        elif remote_head == local_head:
+            print(f"  {tool.name:<24} up to date ({local_head[:10]})")
+        else:
+            print(f"  {tool.name:<24} {local_head[:10] or 'missing'} -> {remote_head[:10]}")
+            outdated.append(tool)
+
+    if not outdated:
+        print("\nAll source tools are up to date.")
+        return 0
+    if check_only:
+        print(f"\n{len(outdated)} tool(s) can be updated.")
+        return 0
+
+    system_info = OSDetector.get_system_info(shell)
+    PackageInstaller(shell, system_info).ensure_root()
+    outcomes: Dict[str, str] = {}
+    items = [InstallPlanItem(tool=tool, method="source", package=None, dependencies=[])
+             for tool in outdated]
+    _install_sources(items, shell, system_info, outcomes)
 
-def print_tool_list(tools: List[Tool], system_info: SystemInfo, title: str):
-    """Display formatted tool list with metrics"""
+    print("\n" + "="*70)
+    print("  UPDATE RESULTS")
+    print("="*70)
+    for tool in outdated:
+        print(f"  {tool.name:<24} {outcomes.get(tool.name, 'not attempted').replace('installed', 'rebuilt')}")
+    return 0 if all(o.startswith("installed") for o in outcomes.values()) else 1
+
+
+def _install_type(tool: Tool, installed_state: Dict, package: Optional[str],
+                  available: Optional[bool]) -> Optional[str]:
+    """"Type" column for a tool; None while its package's availability is unknown"""
+    if tool.name in installed_state:
+        install_method = installed_state[tool.name].get("method", "unknown")
+        if install_method == "native":
+            return "Native/APT"
+        if install_method == "source":
+            return "HakPak Wrapper"
+        return "Installed"
+    # Show what method would be used
+    if package and available is None:
+        return None
+    if package and available:
+        return "Native/APT"
+    if tool.source:
+        return "HakPak Wrapper"
+    return "N/A"
+
+
+def print_tool_list(tools: List[Tool], system_info: SystemInfo, title: str,
+                    sort_by_name: bool = True, out: Optional[TextIO] = None,
+                    generation: Optional[int] = None):
+    """
+    Display formatted tool list with metrics (pass sort_by_name=False to keep
+    ranking).  Rows render straight away from state.json and cached
+    availability; "Type" cells still waiting on a package-manager query show
+    "pending..." and are rewritten in place as answers arrive.  When the
+    output isn't a terminal (or the table doesn't fit on screen) rows are
+    streamed in order as soon as their Type is known.  Pass the catalog
+    ``generation`` the tools were read at to score them from its score table.
+    """
+    out = out or sys.stdout
     if not tools:
-        print(f"\n{title}: None\n")
+        out.write(f"\n{title}: None\n\n")
         return
 
-    state = StateManager.load_state()
-    installed_state = state.get("installed", {})
+    catalog = ToolCatalog.get()
+    installed_state = catalog.state.get("installed", {})
+    if generation is None:
+        scores = CompatibilityScorer.score_all(tools, system_info)
+    else:
+        scores = catalog.scores(tools, system_info, generation)
     installer = PackageInstaller(Shell(), system_info)
     pm = system_info.package_manager
-    
-    print(f"\n{'='*95}")
-    print(f"  {title}")
-    print('='*95)
-    print(f"{'Tool':<20} {'Compat':<8} {'Size':<10} {'RAM':<10} {'Type':<15} {'Description':<30}")
-    print('-'*95)
-    
-    for tool in sorted(tools, key=lambda t: t.name):
-        score = CompatibilityScorer.score_tool(tool, system_info)
+    ordered = sorted(tools, key=lambda t: t.name) if sort_by_name else list(tools)
+    packages = [
+        (t.packages.get(pm) if t.packages and t.name not in installed_state else None)
+        for t in ordered
+    ]
+
+    rows = []
+    for tool in ordered:
+        score = scores[tool.name]
         tool.metrics.compatibility_score = score
-        
-        size = format_size(tool.metrics.estimated_size_mb + 
-                          tool.metrics.dependencies_size_mb)
+        size = format_size(tool.metrics.estimated_size_mb + tool.metrics.dependencies_size_mb)
         ram = format_size(tool.metrics.ram_required_mb)
-        compat = format_compatibility(score)
         desc = tool.description[:30] + "..." if len(tool.description) > 30 else tool.description
-        
-        # Determine install type and method
-        if tool.name in installed_state:
-            install_method = installed_state[tool.name].get("method", "unknown")
-            if install_method == "native":
-                install_type = "Native/APT"
-            elif install_method == "source":
-                install_type = "HakPak Wrapper"
-            else:
-                install_type = "Installed"
-        else:
-            # Show what method would be used
-            pkg = tool.packages.get(pm) if tool.packages else None
-            if pkg and installer.is_package_available(pkg):
-                install_type = "Native/APT"
-            elif tool.source:
-                install_type = "HakPak Wrapper"
-            else:
-                install_type = "N/A"
-        
-        print(f"{tool.name:<20} {compat:<8} {size:<10} {ram:<10} {install_type:<15} {desc:<30}")
-    
-    print('='*95 + '\n')
+        rows.append((f"{tool.name:<20} {format_compatibility(score):<8} {size:<10} {ram:<10} ",
+                     f" {desc:<30}"))
+
+    availability: Dict[str, bool] = {}
+    types: List[Optional[str]] = [None] * len(ordered)
+
+    def resolve() -> List[int]:
+        """Fill in Type cells that just became known; returns their row numbers"""
+        changed = []
+        for i, tool in enumerate(ordered):
+            if types[i] is None:
+                package = packages[i]
+                types[i] = _install_type(tool, installed_state, package, availability.get(package))
+                if types[i] is not None:
+                    changed.append(i)
+        return changed
+
+    def line(i: int) -> str:
+        head, tail = rows[i]
+        return f"{head}{types[i] or 'pending...':<15}{tail}"
+
+    width, height = shutil.get_terminal_size()
+    in_place = out.isatty() and width >= 95 and len(rows) + 8 <= height
+
+    out.write(f"\n{'='*95}\n  {title}\n{'='*95}\n")
+    out.write(f"{'Tool':<20} {'Compat':<8} {'Size':<10} {'RAM':<10} {'Type':<15} {'Description':<30}\n")
+    out.write('-'*95 + "\n")
+
+    needed = [p for p in dict.fromkeys(packages) if p]
+
+    def batches() -> Iterator[Dict[str, Optional[str]]]:
+        yield from installer.iter_candidates(needed)
+        # Anything a query didn't answer is shown as unavailable
+        yield {p: None for p in needed if p not in availability}
+
+    answers = batches()
+    first = next(answers)
+    availability.update((p, c is not None) for p, c in first.items())
+    resolve()
+
+    if in_place:
+        for i in range(len(rows)):
+            out.write(line(i) + "\n")
+        out.write('='*95 + "\n\n")
+        out.flush()
+        for batch in answers:
+            availability.update((p, c is not None) for p, c in batch.items())
+            for i in resolve():
+                # Cursor sits two lines below the table's last row
+                up = len(rows) - i + 2
+                out.write(f"\x1b[{up}A\r\x1b[2K{line(i)}\x1b[{up}B\r")
+            out.flush()
+        return
+
+    printed = 0
+
+    def flush_ready():
+        nonlocal printed
+        while printed < len(rows) and types[printed] is not None:
+            out.write(line(printed) + "\n")
+            printed += 1
+        out.flush()
+
+    flush_ready()
+    for batch in answers:
+        availability.update((p, c is not None) for p, c in batch.items())
+        resolve()
+        flush_ready()
+    out.write('='*95 + "\n\n")
 
 
 def menu_list_tools(system_info: SystemInfo):
     """Enhanced list tools menu with categorization"""
-    all_tools = ToolLoader.load_kali_tools()
+    catalog = ToolCatalog.get()
     
     while True:
+        all_tools, generation = catalog.tools, catalog.generation
         print("\n" + "="*60)
         print("  LIST TOOLS")
         print("="*60)
@@ -543,32 +992,31 @@ def menu_list_tools(system_info: SystemInfo):
         if choice == '1':
             installed = ToolLoader.get_installed_tools(all_tools)
             print_tool_list(installed, system_info, 
-                          f"INSTALLED TOOLS ({len(installed)})")
+                          f"INSTALLED TOOLS ({len(installed)})", generation=generation)
         
         elif choice == '2':
             standard = ToolLoader.get_standard_tools(all_tools)
             print_tool_list(standard, system_info,
-                          f"STANDARD TOOLS ({len(standard)})")
+                          f"STANDARD TOOLS ({len(standard)})", generation=generation)
         
         elif choice == '3':
             custom = ToolLoader.get_custom_tools(all_tools)
             custom_available = [t for t in all_tools.values() 
                                if t.name not in [x.name for x in ToolLoader.get_standard_tools(all_tools)]]
             print_tool_list(custom_available, system_info,
-                          f"CUSTOM/EXTENDED TOOLS ({len(custom_available)})")
+                          f"CUSTOM/EXTENDED TOOLS ({len(custom_available)})", generation=generation)
         
         elif choice == '4':
             print_tool_list(list(all_tools.values()), system_info,
-                          f"ALL AVAILABLE TOOLS ({len(all_tools)})")
+                          f"ALL AVAILABLE TOOLS ({len(all_tools)})", generation=generation)
         
         elif choice == '5':
-            query = input("\nEnter search term (name/tag): ").strip().lower()
+            query = input("\nEnter search term (name/tag/description): ").strip().lower()
             if query:
-                matches = [t for t in all_tools.values() 
-                          if query in t.name.lower() or 
-                          any(query in tag for tag in t.tags)]
+                matches = catalog.search(query)
                 print_tool_list(matches, system_info,
-                              f"SEARCH RESULTS: '{query}' ({len(matches)} matches)")
+                              f"SEARCH RESULTS: '{query}' ({len(matches)} matches)",
+                              sort_by_name=False, generation=generation)
         
         elif choice == '0':
             break
@@ -576,7 +1024,7 @@ def menu_list_tools(system_info: SystemInfo):
         input("\nPress Enter to continue...")
 
 
-def configure_install_params() -> InstallParams:
+def configure_install_params(system_info: Optional[SystemInfo] = None) -> InstallParams:
     """Interactive parameter configuration for installation filters"""
     print("\n" + "="*70)
     print("  INSTALLATION FILTER PARAMETERS")
@@ -639,6 +1087,8 @@ def configure_install_params() -> InstallParams:
     print(f"  Include Tags:    {', '.join(params.tags_filter) if params.tags_filter else 'All'}")
     print(f"  Exclude Tags:    {', '.join(params.exclude_tags) if params.exclude_tags else 'None'}")
     print(f"  Max Count:       {params.max_count if params.max_count else 'No limit'}")
+    if system_info is not None:
+        print(f"  Matching Tools:  {ToolCatalog.get().count_matching(params, system_info)}")
     print("="*70)
     
     confirm = input("\nUse these filters? (Y/n): ").strip().lower()
@@ -651,18 +1101,15 @@ def configure_install_params() -> InstallParams:
 def menu_install_tools(system_info: SystemInfo, params: Optional[InstallParams] = None):
     """Enhanced install tools menu with smart ranking and parameter filtering"""
     shell = Shell()
-    all_tools = ToolLoader.load_kali_tools()
-    installed_names = set(StateManager.get_installed_tools())
+    catalog = ToolCatalog.get()
+    all_tools, generation = catalog.tools, catalog.generation
     
     # Use provided params or defaults
     if params is None:
         params = InstallParams()
     
     # Apply parameter filters
-    filtered_tools = [
-        tool for tool in all_tools.values()
-        if params.matches(tool, system_info)
-    ]
+    filtered_tools = catalog.filter_tools(params, system_info)
     
     if not filtered_tools:
         print("\nERROR: No tools match the current filter parameters!")
@@ -670,27 +1117,22 @@ def menu_install_tools(system_info: SystemInfo, params: Optional[InstallParams]
         input("\nPress Enter to continue...")
         return
 
-    # Remove already installed tools
-    not_installed = [
-        tool for tool in filtered_tools
-        if tool.name not in installed_names and not shell.which(tool.binary)
-    ]
+    # Remove already installed tools (state.json, then the local package database)
+    installed = catalog.installed_sources(system_info.package_manager, shell.which)
+    not_installed = [tool for tool in filtered_tools if tool.name not in installed]
 
     if not not_installed:
         print("\nAll matching tools are already installed.")
         input("\nPress Enter to continue...")
         return
     
-    # Rank tools by compatibility
-    ranked_tools = sorted(
-        not_installed,
-        key=lambda t: CompatibilityScorer.score_tool(t, system_info),
-        reverse=True
-    )
-    
-    # Apply max count limit
-    if params.max_count:
-        ranked_tools = ranked_tools[:params.max_count]
+    # Rank tools by compatibility, applying the max count limit
+    view = catalog.columns()
+    ranked_tools = [
+        all_tools[name] for name in view.ranked_names(
+            view.mask_of(t.name for t in not_installed), system_info,
+            limit=params.max_count or None)
+    ]
     
     print("\n" + "="*80)
     print("  INSTALL TOOLS (Best matches for your system listed first)")
@@ -717,9 +1159,10 @@ def menu_install_tools(system_info: SystemInfo, params: Optional[InstallParams]
     
     # Show top matches (up to 20)
     display_count = min(20, len(ranked_tools))
+    scores = catalog.scores(ranked_tools[:display_count], system_info, generation)
     print(f"\nTop {display_count} Recommended Tools for Your System:\n")
     for i, tool in enumerate(ranked_tools[:display_count], 1):
-        score = CompatibilityScorer.score_tool(tool, system_info)
+        score = scores[tool.name]
         size = format_size(tool.metrics.estimated_size_mb + 
                           tool.metrics.dependencies_size_mb)
         print(f"  {i:2}. {tool.name:<20} {format_compatibility(score):<18} "
@@ -739,15 +1182,15 @@ def menu_install_tools(system_info: SystemInfo, params: Optional[InstallParams]
         return
     
     if raw.lower() == 'filter':
-        new_params = configure_install_params()
+        new_params = configure_install_params(system_info)
         menu_install_tools(system_info, new_params)
         return
     
     if raw.lower() == 'search':
         query = input("Search for: ").strip().lower()
-        matches = [t for t in filtered_tools 
-                  if query in t.name.lower() or any(query in tag for tag in t.tags)]
-        print_tool_list(matches, system_info, f"Search: '{query}'")
+        matches = catalog.search(query, pool=filtered_tools)
+        print_tool_list(matches, system_info, f"Search: '{query}'", sort_by_name=False,
+                        generation=generation)
         return
     
     # Parse tool selection
@@ -769,6 +1212,9 @@ def menu_install_tools(system_info: SystemInfo, params: Optional[InstallParams]
     for name in selected_names:
         if name not in all_tools:
             print(f"ERROR: Unknown tool: {name}")
+            suggestions = catalog.suggest(name)
+            if suggestions:
+                print(f"   Did you mean: {', '.join(suggestions)}?")
             continue
         selected_tools.append(all_tools[name])
 
@@ -864,7 +1310,12 @@ def install_from_source(tool: Tool, shell: Shell, system_info: SystemInfo):
         raise ValueError("No source installation method defined")
     
     source_type = tool.source.get("type")
-    
+    from toolcaches import caches_in_use
+    with caches_in_use():
+        _install_source_type(tool, source_type, shell, system_info)
+
+
+def _install_source_type(tool: Tool, source_type: Optional[str], shell: Shell, system_info: SystemInfo):
     if source_type == "go":
         install_go_tool(tool, shell, system_info)
     elif source_type == "python-git":
@@ -885,25 +1336,30 @@ def install_from_source(tool: Tool, shell: Shell, system_info: SystemInfo):
         raise ValueError(f"Unknown source type: {source_type}")
 
 
-def install_go_tool(tool: Tool, shell: Shell, system_info: SystemInfo):
-    """Install Go-based tool"""
-    source = tool.source or {}
+def ensure_go_toolchain(shell: Shell, system_info: SystemInfo):
+    """Install the Go toolchain with the package manager if ``go`` is missing"""
     if not shell.which("go"):
         print("  Installing Go toolchain...")
         installer = PackageInstaller(shell, system_info)
         pm = system_info.package_manager
         go_pkg = {"apt": "golang", "dnf": "golang", "pacman": "go", "zypper": "go"}
         installer.install_packages([go_pkg.get(pm, "golang")])
+
+
+def install_go_tool(tool: Tool, shell: Shell, system_info: SystemInfo):
+    """Install Go-based tool"""
+    source = tool.source or {}
+    ensure_go_toolchain(shell, system_info)
     
     module = source.get("module")
     if not module:
         raise ValueError("Missing Go module for source install")
     print(f"  Building from Go module: {module}")
-    shell.run(["go", "install", f"{module}@latest"])
+    from toolcaches import GO_BIN_DIR, with_toolchain_env
+    shell.run(with_toolchain_env(["go", "install", f"{module}@latest"], system_info))
     
     # Link binary
-    gopath = os.environ.get("GOPATH") or str(Path.home() / "go")
-    bin_src = Path(gopath) / "bin" / tool.binary
+    bin_src = GO_BIN_DIR / tool.binary
     if bin_src.exists():
         bin_dst = BIN_LINK_DIR / tool.binary
         bin_dst.parent.mkdir(parents=True, exist_ok=True)
@@ -918,27 +1374,25 @@ def install_python_git_tool(tool: Tool, shell: Shell, system_info: SystemInfo):
     repo = source.get("repo")
     if not repo:
         raise ValueError("Missing repo for python-git source install")
-    src_dir = HAKPAK4_ROOT / "src" / tool.name
     entry = source.get("entry") or tool.binary
     
     # Clone repository
-    if src_dir.exists():
-        shell.run(["git", "-C", str(src_dir), "pull"])
-    else:
-        shell.run(["git", "clone", "--depth", "1", repo, str(src_dir)])
+    src_dir = _checkout_source(tool, repo, shell)
     
-    # Create virtual environment
+    # Create virtual environment (layered on the shared base venv if enabled)
+    from venvbase import create_venv
     venv_dir = HAKPAK4_ROOT / "venv" / tool.name
     venv_dir.parent.mkdir(parents=True, exist_ok=True)
-    shell.run(["python3", "-m", "venv", str(venv_dir)])
+    create_venv(venv_dir, shell)
     
-    # Install requirements
+    # Install requirements (through the shared wheelhouse)
+    from wheelhouse import pip_install, upgrade_pip
     pip = venv_dir / "bin" / "pip"
-    shell.run([str(pip), "install", "--upgrade", "pip"])
+    upgrade_pip(pip, shell)
     
     req_file = src_dir / "requirements.txt"
     if req_file.exists():
-        shell.run([str(pip), "install", "-r", str(req_file)])
+        pip_install(pip, ["-r", str(req_file)], shell)
     
     # Create wrapper script
     wrapper = BIN_LINK_DIR / tool.binary
@@ -973,15 +1427,12 @@ def install_ruby_git_tool(tool: Tool, shell: Shell, system_info: SystemInfo):
     repo = source.get("repo")
     if not repo:
         raise ValueError("Missing repo for ruby-git source install")
-    src_dir = HAKPAK4_ROOT / "src" / tool.name
+    src_dir = _checkout_source(tool, repo, shell)
     
-    if src_dir.exists():
-        shell.run(["git", "-C", str(src_dir), "pull"])
-    else:
-        shell.run(["git", "clone", "--depth", "1", repo, str(src_dir)])
-    
-    # Install with bundler
-    shell.run(["bash", "-c", f"cd {src_dir} && bundle install"], check=False)
+    # Install with bundler (parallel, through the shared gem cache)
+    from toolcaches import bundle_install_commands
+    for cmd in bundle_install_commands(src_dir, system_info):
+        shell.run(cmd, check=False)
     
     # Create wrapper
     entry = source.get("entry") or tool.binary
@@ -1020,12 +1471,7 @@ def install_git_bash_tool(tool: Tool, shell: Shell, system_info: SystemInfo):
         raise ValueError("Missing repo for git-bash source install")
     if not entry:
         raise ValueError("Missing entry for git-bash source install")
-    src_dir = HAKPAK4_ROOT / "src" / tool.name
-    
-    if src_dir.exists():
-        shell.run(["git", "-C", str(src_dir), "pull"])
-    else:
-        shell.run(["git", "clone", "--depth", "1", repo, str(src_dir)])
+    src_dir = _checkout_source(tool, repo, shell)
     
     # Create wrapper
     wrapper = BIN_LINK_DIR / tool.binary
@@ -1060,12 +1506,7 @@ def install_git_repo(tool: Tool, shell: Shell, system_info: SystemInfo):
     entry = source.get("entry")
     if not repo:
         raise ValueError("Missing repo for git source install")
-    src_dir = HAKPAK4_ROOT / "src" / tool.name
-
-    if src_dir.exists():
-        shell.run(["git", "-C", str(src_dir), "pull"])
-    else:
-        shell.run(["git", "clone", "--depth", "1", repo, str(src_dir)])
+    src_dir = _checkout_source(tool, repo, shell)
 
     if entry:
         wrapper = BIN_LINK_DIR / tool.binary
@@ -1102,7 +1543,8 @@ def install_pip_tool(tool: Tool, shell: Shell, system_info: SystemInfo):
     package = source.get("package") or source.get("module")
     if not package:
         raise ValueError("Missing package for pip source install")
-    shell.run(["pip3", "install", "--user", package])
+    from toolcaches import with_toolchain_env
+    shell.run(with_toolchain_env(["pip3", "install", "--user", package], system_info))
 
 
 def install_deb_package(tool: Tool, shell: Shell, system_info: SystemInfo):
@@ -1112,17 +1554,10 @@ def install_deb_package(tool: Tool, shell: Shell, system_info: SystemInfo):
     if not url:
         raise ValueError("Missing URL for deb source install")
     deb_file = source.get("file") or f"{tool.name}.deb"
-    download_path = HAKPAK4_ROOT / "downloads" / deb_file
     
-    # Create downloads directory
-    download_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Download if not already present
-    if not download_path.exists():
-        print(f"  Downloading from {url}...")
-        shell.run(["wget", "-O", str(download_path), url])
-    else:
-        print(f"  Using cached download: {download_path}")
+    # Download (or reuse the verified copy in the download cache)
+    from downloadcache import fetch
+    download_path = fetch(url, source.get("sha256"), shell)
     
     # Install the .deb package
     print(f"  Installing {deb_file}...")
@@ -1141,19 +1576,14 @@ def install_wine_binary(tool: Tool, shell: Shell, system_info: SystemInfo):
     binary_path = source.get("binary_path")
     if not url or not archive_file or not binary_path:
         raise ValueError("Missing fields for wine-binary source install")
-    download_path = HAKPAK4_ROOT / "downloads" / archive_file
     extract_dir = HAKPAK4_ROOT / "wine-apps" / tool.name
     
     # Create directories
-    download_path.parent.mkdir(parents=True, exist_ok=True)
     extract_dir.parent.mkdir(parents=True, exist_ok=True)
     
-    # Download if not already present
-    if not download_path.exists():
-        print(f"  Downloading from {url}...")
-        shell.run(["wget", "-O", str(download_path), url])
-    else:
-        print(f"  Using cached download: {download_path}")
+    # Download (or reuse the verified copy in the download cache)
+    from downloadcache import fetch
+    download_path = fetch(url, source.get("sha256"), shell)
     
     # Extract archive
     print(f"  Extracting {archive_file}...")
@@ -1176,25 +1606,33 @@ def install_wine_binary(tool: Tool, shell: Shell, system_info: SystemInfo):
     print(f"  Created Wine wrapper: {wrapper}")
 
 
-def run_tool(tool_name: str, tool_args: List[str], system_info: SystemInfo, shell: Shell):
-    """Auto-install and run a tool via HakPak wrapper"""
-    all_tools = ToolLoader.load_kali_tools()
+def run_tool(tool_name: str, tool_args: List[str], system_info: Optional[SystemInfo], shell: Shell):
+    """
+    Auto-install and run a tool via HakPak wrapper.
+
+    Only the requested tool's spec is deserialised from the compiled catalog,
+    and system detection is deferred until an install is actually needed, so
+    the already-installed launcher path stays cheap.
+    """
+    catalog = ToolCatalog.get()
+    tool = catalog.tool(tool_name)
     
-    if tool_name not in all_tools:
+    if tool is None:
         print(f"ERROR: Unknown tool '{tool_name}'")
+        suggestions = catalog.suggest(tool_name)
+        if suggestions:
+            print(f"Did you mean: {', '.join(suggestions)}?")
         print(f"Run 'hakpak4' to see available tools")
         return 1
     
-    tool = all_tools[tool_name]
-    
     # Check if tool is installed
-    installed_names = StateManager.get_installed_tools()
-    
-    if tool_name not in installed_names:
+    if tool_name not in catalog.installed_names():
         print(f"\n{tool.name} is not installed. Installing now...")
+        if system_info is None:
+            system_info = OSDetector.get_system_info(shell)
         install_tool(tool, system_info, shell)
         
-        if tool_name not in StateManager.get_installed_tools():
+        if tool_name not in catalog.installed_names():
             print(f"\nERROR: Failed to install {tool.name}")
             return 1
     
@@ -1440,8 +1878,35 @@ def _launch_gui():
     input("\nPress Enter to continue...")
 
 
+def _split_tool_argv(argv: List[str]) -> Optional[Tuple[str, List[str]]]:
+    """
+    Split ``-t <tool> [args...]`` off the command line before argparse sees it.
+
+    Everything after the tool name belongs to the tool (``-sV``, target hosts,
+    ...), which argparse would otherwise try to treat as HakPak options or
+    subcommands.  A leading ``--`` separator is dropped.
+    """
+    if not argv:
+        return None
+    first = argv[0]
+    if first in ("-t", "--tool") and len(argv) >= 2:
+        name, rest = argv[1], argv[2:]
+    elif first.startswith("--tool="):
+        name, rest = first.split("=", 1)[1], argv[1:]
+    else:
+        return None
+    if rest and rest[0] == "--":
+        rest = rest[1:]
+    return name, rest
+
+
 def main():
     """Main entry point"""
+    # ── Fast launcher path: hakpak4 -t <tool> [args...] ───────────────────────
+    tool_argv = _split_tool_argv(sys.argv[1:])
+    if tool_argv:
+        return run_tool(tool_argv[0], tool_argv[1], None, Shell())
+
     parser = argparse.ArgumentParser(
         description="HakPak4 - Ultimate Cross-Distro Hacking Tool Installer & Launcher",
         epilog=(
@@ -1455,6 +1920,10 @@ def main():
             "  hakpak4 repo list                    # List cloned git repos\n"
             "  hakpak4 repo remove <name>           # Remove a cloned git repo\n"
             "  hakpak4 gui                          # Launch Script Builder GUI\n"
+            "  hakpak4 query 'tag:web size<50 compat>=70' --format json\n"
+            "  hakpak4 update                       # Rebuild source tools that changed upstream\n"
+            "  hakpak4 cache                        # Size report of download/toolchain caches\n"
+            "  hakpak4 cache prune go-build npm     # Empty selected caches (all if none given)\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
@@ -1464,6 +1933,8 @@ def main():
                        help="Launch the HakPak4 Script Builder GUI")
     parser.add_argument("-t", "--tool", metavar="TOOL",
                        help="Run a tool (auto-install if not present)")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                       help="Parallel source installs (default: $HAKPAK4_JOBS or 4; 1 = serial)")
 
     subparsers = parser.add_subparsers(dest="subcommand")
 
@@ -1514,15 +1985,65 @@ def main():
         help="Port to listen on (default: 8788)",
     )
 
-    parser.add_argument("tool_args", nargs="*",
-                       help="Arguments to pass to the tool")
-
-    args = parser.parse_args()
+    # query subcommand
+    query_parser = subparsers.add_parser(
+        "query",
+        help="Select tools with a filter expression (e.g. 'tag:web size<50 compat>=70')",
+        # -h would swallow negated terms such as -hydra
+        add_help=False,
+    )
+    query_parser.add_argument("--help", action="help", help="Show this help message and exit")
+    query_parser.add_argument("expression", nargs="+",
+                              help="Filter terms: tag:, pm:, group:, size/ram/compat comparisons, words")
+    query_parser.add_argument("--format", choices=("table", "json", "names"), default="table",
+                              help="Output format (json = one object per line)")
+    query_parser.add_argument("--sort", choices=("catalog", "name", "compat", "size", "ram"),
+                              default="catalog", help="Result order (default: catalog)")
+    query_parser.add_argument("--limit", type=int, metavar="N", help="Return at most N tools")
+    query_parser.add_argument("--os", metavar="ID", help="Score for this os_id instead of the host")
+    query_parser.add_argument("--pm", metavar="PM", help="Score for this package manager")
+    query_parser.add_argument("--ram", type=int, metavar="MB", help="Score for this much free RAM")
+    query_parser.add_argument("--disk", type=float, metavar="GB", help="Score for this much free disk")
+
+    # update subcommand
+    update_parser = subparsers.add_parser(
+        "update",
+        help="Update git-based source tools whose upstream HEAD has changed",
+    )
+    update_parser.add_argument("tools", nargs="*", metavar="TOOL",
+                               help="Only check these tools (default: all installed source tools)")
+    update_parser.add_argument("--check", action="store_true",
+                               help="Only report which tools are out of date")
+
+    # cache subcommand
+    cache_parser = subparsers.add_parser(
+        "cache",
+        help="Report or prune HakPak's download and toolchain caches",
+    )
+    cache_parser.add_argument("cache_action", nargs="?", choices=("report", "prune"), default="report")
+    cache_parser.add_argument("names", nargs="*", metavar="CACHE",
+                              help="Caches to prune (go-mod, go-build, cargo, npm, bundle, pip, "
+                                   "git, wheels, downloads; default: all)")
+
+    # Anything argparse does not recognise is passed through to the -t tool.
+    args, tool_args = parser.parse_known_args()
+    if args.subcommand == "query":
+        # Negated query terms such as -tag:scanner look like options to argparse.
+        terms = [a for a in tool_args if a.startswith("-") and not a.startswith("--")]
+        args.expression += terms
+        tool_args = [a for a in tool_args if a not in terms]
+    if tool_args and not args.tool:
+        parser.error(f"unrecognized arguments: {' '.join(tool_args)}")
 
     if args.version:
         print(f"HakPak4 v{VERSION}")
         return 0
 
+    if args.jobs is not None:
+        if args.jobs < 1:
+            parser.error("--jobs must be at least 1")
+        os.environ["HAKPAK4_JOBS"] = str(args.jobs)
+
     # --gui flag alias (equivalent to: hakpak4 gui)
     if args.gui:
         host = os.environ.get("HAKPAK4_GUI_HOST", "127.0.0.1")
@@ -1557,6 +2078,20 @@ def main():
             pass
         return 0
 
+    # ── query subcommand ──────────────────────────────────────────────────────
+    if args.subcommand == "query":
+        from catalog_query import cmd_query
+        return cmd_query(args, lambda: OSDetector.get_system_info(Shell()))
+
+    # ── update subcommand ─────────────────────────────────────────────────────
+    if args.subcommand == "update":
+        return cmd_update(args.tools, check_only=args.check)
+
+    # ── cache subcommand ──────────────────────────────────────────────────────
+    if args.subcommand == "cache":
+        from toolcaches import cmd_cache
+        return cmd_cache(args.cache_action, args.names)
+
     # ── repo subcommand ───────────────────────────────────────────────────────
     if args.subcommand == "repo":
         shell = Shell()
@@ -1631,9 +2166,7 @@ def main():
 
     # ── tool runner ───────────────────────────────────────────────────────────
     if args.tool:
-        shell = Shell()
-        system_info = OSDetector.get_system_info(shell)
-        return run_tool(args.tool, args.tool_args, system_info, shell)
+        return run_tool(args.tool, tool_args, None, Shell())
 
     # ── Interactive menu ──────────────────────────────────────────────────────
     return cmd_menu()
@@ -1680,7 +2213,7 @@ def cmd_menu():
         
         elif choice == '3':
             # Install with custom parameters
-            params = configure_install_params()
+            params = configure_install_params(system_info)
             menu_install_tools(system_info, params)
         
         elif choice == '4':
@@ -1688,10 +2221,10 @@ def cmd_menu():
             input("\nPress Enter to continue...")
         
         elif choice == '5':
-            all_tools = ToolLoader.load_kali_tools()
-            installed = ToolLoader.get_installed_tools(all_tools)
+            catalog = ToolCatalog.get()
+            installed = ToolLoader.get_installed_tools(catalog.tools)
             print_tool_list(installed, system_info, 
-                          f"INSTALLED TOOLS ({len(installed)})")
+                          f"INSTALLED TOOLS ({len(installed)})", generation=catalog.generation)
             input("\nPress Enter to continue...")
         
         elif choice == '6':
@@ -1728,4 +2261,4 @@ def cmd_menu():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
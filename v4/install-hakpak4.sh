@@ -46,6 +46,7 @@ mkdir -p "$INSTALL_DIR"
 mkdir -p "$INSTALL_DIR/bin"
 mkdir -p "$INSTALL_DIR/src"
 mkdir -p "$INSTALL_DIR/venv"
+mkdir -p "$INSTALL_DIR/cache"
 mkdir -p "$INSTALL_DIR/gui/static"
 
 # Copy files
@@ -53,6 +54,19 @@ echo -e "${GREEN}[2/5]${NC} Copying HakPak4 files..."
 cp "$SCRIPT_DIR/hakpak4.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/hakpak4_core.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/gitclone.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/catalog.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/catalog_sqlite.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/catalog_columns.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/catalog_search.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/catalog_query.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/pkgcache.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/pkgindex.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/install_scheduler.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/gitmirror.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/wheelhouse.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/venvbase.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/downloadcache.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/toolcaches.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/version.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/VERSION" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/kali-tools-db.yaml" "$INSTALL_DIR/"
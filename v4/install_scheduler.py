@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Parallel Install Scheduler
+Runs independent install jobs (source builds: git clone, venv creation, pip,
+bundle, go build, downloads) on a worker pool while honouring a dependency
+graph between jobs, e.g. every Go tool waits for the shared Go toolchain job.
+
+Inside a job, commands go through a JobShell: their output is streamed line
+by line with a ``[tool]`` prefix, and any command that takes the package
+manager's lock (apt, dpkg, dnf, rpm, pacman, zypper) is serialised across
+all workers.  Everything else runs concurrently.
+
+The worker count comes from ``--jobs N`` / ``HAKPAK4_JOBS`` (default 4);
+``1`` keeps the old strictly serial, unprefixed behaviour.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from hakpak4 import Shell
+
+
+DEFAULT_JOBS = 4
+
+# Commands that hold the package manager's lock (and must never overlap)
+PACKAGE_MANAGER_COMMANDS = {
+    "apt", "apt-get", "aptitude", "dpkg",
+    "dnf", "yum", "rpm",
+    "pacman",
+    "zypper",
+}
+
+PM_LOCK = threading.RLock()
+
+
+def install_jobs() -> int:
+    """Worker count from HAKPAK4_JOBS (set by ``--jobs``), at least 1"""
+    try:
+        return max(1, int(os.environ.get("HAKPAK4_JOBS", DEFAULT_JOBS)))
+    except ValueError:
+        return DEFAULT_JOBS
+
+
+def takes_package_lock(cmd: List[str]) -> bool:
+    """True if ``cmd`` runs a package manager (looking through env/sudo wrappers)"""
+    args = list(cmd)
+    while args and (args[0] in ("env", "sudo", "nice") or "=" in args[0] or args[0].startswith("-")):
+        args.pop(0)
+    return bool(args) and os.path.basename(args[0]) in PACKAGE_MANAGER_COMMANDS
+
+
+# ── Prefixed output ───────────────────────────────────────────────────────────
+
+class PrefixedStream:
+    """
+    Line-buffered stdout proxy: text written from a job thread is emitted as
+    whole lines prefixed with that job's name, so concurrent jobs never
+    interleave mid-line.  Threads without a prefix pass straight through.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def set_prefix(self, prefix: Optional[str]):
+        self.flush_pending()
+        self._local.prefix = prefix
+        self._local.pending = ""
+
+    def write(self, text: str) -> int:
+        prefix = getattr(self._local, "prefix", None)
+        if prefix is None:
+            with self._lock:
+                return self.stream.write(text)
+        pending = self._local.pending + text
+        *lines, self._local.pending = pending.split("\n")
+        if lines:
+            with self._lock:
+                for line in lines:
+                    self.stream.write(f"{prefix}{line}\n")
+                self.stream.flush()
+        return len(text)
+
+    def flush_pending(self):
+        pending = getattr(self._local, "pending", "")
+        if pending:
+            self._local.pending = ""
+            with self._lock:
+                self.stream.write(f"{self._local.prefix}{pending}\n")
+
+    def flush(self):
+        with self._lock:
+            self.stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class JobShell(Shell):
+    """Shell for one job: streams command output through sys.stdout, serialises package-manager commands"""
+
+    def run(self, cmd: List[str], check: bool = True, capture: bool = False):
+        if self.dry_run:
+            return super().run(cmd, check=check, capture=capture)
+        if takes_package_lock(cmd):
+            with PM_LOCK:
+                return self._run(cmd, check, capture)
+        return self._run(cmd, check, capture)
+
+    @staticmethod
+    def _run(cmd: List[str], check: bool, capture: bool):
+        if capture:
+            return subprocess.run(cmd, check=check, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, text=True)
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True, errors="replace")
+        for line in proc.stdout:
+            sys.stdout.write(line)
+        proc.wait()
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+        return subprocess.CompletedProcess(cmd, proc.returncode, None, None)
+
+
+# ── Scheduling ────────────────────────────────────────────────────────────────
+
+class DependencyFailed(RuntimeError):
+    """A job was not run because one of its prerequisites failed"""
+
+
+@dataclass
+class Job:
+    """``action(shell)`` runs once every job named in ``after`` has succeeded"""
+    name: str
+    action: Callable[[Shell], None]
+    after: List[str] = field(default_factory=list)
+
+
+class JobScheduler:
+    """Run a DAG of jobs on up to ``workers`` threads"""
+
+    def __init__(self, shell: Shell, workers: Optional[int] = None):
+        self.shell = shell
+        self.workers = workers or install_jobs()
+
+    @staticmethod
+    def _check_graph(jobs: List[Job]):
+        names = {job.name for job in jobs}
+        for job in jobs:
+            missing = [n for n in job.after if n not in names]
+            if missing:
+                raise ValueError(f"job '{job.name}' depends on unknown job(s): {', '.join(missing)}")
+        # Kahn's algorithm: anything left over sits on a cycle
+        indegree = {job.name: len(set(job.after)) for job in jobs}
+        dependents: Dict[str, List[str]] = {}
+        for job in jobs:
+            for prerequisite in set(job.after):
+                dependents.setdefault(prerequisite, []).append(job.name)
+        ready = [n for n, d in indegree.items() if d == 0]
+        seen = 0
+        while ready:
+            seen += 1
+            for dependent in dependents.get(ready.pop(), []):
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+        if seen != len(jobs):
+            raise ValueError("install jobs contain a dependency cycle")
+
+    def run(self, jobs: List[Job],
+            on_done: Optional[Callable[[Job, Optional[BaseException]], None]] = None
+            ) -> Dict[str, Optional[BaseException]]:
+        """
+        Run ``jobs`` and return ``name -> exception`` (None on success).
+        ``on_done`` is called in the calling thread as each job finishes, so
+        it can safely record state.  Jobs whose prerequisites failed are
+        reported with DependencyFailed without being run.
+        """
+        self._check_graph(jobs)
+        results: Dict[str, Optional[BaseException]] = {}
+
+        def finish(job: Job, error: Optional[BaseException]):
+            results[job.name] = error
+            if on_done:
+                on_done(job, error)
+
+        if self.workers <= 1:
+            for job in self._serial_order(jobs):
+                failed = [n for n in job.after if results.get(n) is not None]
+                if failed:
+                    finish(job, DependencyFailed(f"prerequisite failed: {', '.join(failed)}"))
+                    continue
+                try:
+                    job.action(self.shell)
+                    finish(job, None)
+                except Exception as e:
+                    finish(job, e)
+            return results
+
+        stream = PrefixedStream(sys.stdout)
+        previous_stdout, sys.stdout = sys.stdout, stream
+        width = max(len(job.name) for job in jobs)
+
+        def execute(job: Job):
+            stream.set_prefix(f"[{job.name:<{width}}] ")
+            try:
+                job.action(JobShell(dry_run=self.shell.dry_run))
+            finally:
+                stream.set_prefix(None)
+
+        waiting = {job.name: job for job in jobs}
+        running = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while waiting or running:
+                    for name, job in list(waiting.items()):
+                        if any(n not in results for n in job.after):
+                            continue
+                        del waiting[name]
+                        failed = [n for n in job.after if results[n] is not None]
+                        if failed:
+                            finish(job, DependencyFailed(f"prerequisite failed: {', '.join(failed)}"))
+                        else:
+                            running[executor.submit(execute, job)] = job
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = running.pop(future)
+                        error = future.exception()
+                        finish(job, error)
+        finally:
+            sys.stdout = previous_stdout
+        return results
+
+    @staticmethod
+    def _serial_order(jobs: List[Job]) -> List[Job]:
+        """Jobs in their given order, each moved after its prerequisites"""
+        by_name = {job.name: job for job in jobs}
+        ordered: List[Job] = []
+        placed = set()
+
+        def place(job: Job):
+            if job.name in placed:
+                return
+            placed.add(job.name)
+            for prerequisite in job.after:
+                place(by_name[prerequisite])
+            ordered.append(job)
+
+        for job in jobs:
+            place(job)
+        return ordered
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Package Availability Cache
+Persists ``package -> candidate version`` answers per package manager under
+``HAKPAK4_ROOT/cache`` so repeated runs don't query the package manager.
+
+A cache file is only trusted while the package manager's indexes are
+unchanged (mtime/size of the apt lists, dnf/zypper repodata, pacman sync
+databases) and younger than ``HAKPAK4_AVAILABILITY_TTL`` seconds.
+"""
+
+import glob
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from hakpak4 import CACHE_DIR
+
+
+# Seconds an availability answer may be reused even if the indexes look unchanged.
+AVAILABILITY_TTL = int(os.environ.get("HAKPAK4_AVAILABILITY_TTL", "86400"))
+
+_CACHE_VERSION = 1
+
+# Repository definitions; enabling or disabling a repo rewrites its file.
+REPO_CONFIG_GLOBS: Dict[str, List[str]] = {
+    "dnf": ["etc/yum.repos.d/*.repo", "etc/distro.repos.d/*.repo", "usr/share/dnf5/repos.d/*.repo"],
+    "yum": ["etc/yum.repos.d/*.repo"],
+    "zypper": ["etc/zypp/repos.d/*.repo"],
+}
+
+# Index files whose mtime/size change whenever the package manager refreshes.
+INDEX_GLOBS: Dict[str, List[str]] = {
+    "apt": [
+        "var/lib/apt/lists",
+        "var/lib/apt/lists/*_Packages*",
+        "var/lib/dpkg/status",
+    ],
+    "dnf": [
+        "var/cache/dnf/*.solv",
+        "var/cache/dnf/*/repodata/repomd.xml",
+        "var/cache/libdnf5/*/repodata/repomd.xml",
+        "var/lib/rpm/rpmdb.sqlite",
+    ],
+    "pacman": [
+        "var/lib/pacman/sync/*.db",
+    ],
+    "zypper": [
+        "var/cache/zypp/solv/*/solv",
+        "var/cache/zypp/raw/*/repodata/repomd.xml",
+        "var/lib/rpm/rpmdb.sqlite",
+    ],
+}
+INDEX_GLOBS["yum"] = INDEX_GLOBS["dnf"] + ["var/cache/yum/*/*/*/repomd.xml"]
+for _pm, _globs in REPO_CONFIG_GLOBS.items():
+    INDEX_GLOBS[_pm] = INDEX_GLOBS[_pm] + _globs
+
+
+def index_signature(pm: str, root: Path = Path("/")) -> List[List]:
+    """``[path, mtime_ns, size]`` for every index file of ``pm`` that exists"""
+    signature = []
+    for pattern in INDEX_GLOBS.get(pm, []):
+        for path in sorted(glob.glob(str(root / pattern))):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature.append([os.path.relpath(path, root), st.st_mtime_ns, st.st_size])
+    return signature
+
+
+class AvailabilityCache:
+    """On-disk ``package -> candidate`` map for one package manager (None = unavailable)"""
+
+    def __init__(self, pm: str, path: Optional[Path] = None, ttl: int = AVAILABILITY_TTL,
+                 root: Path = Path("/")):
+        self.pm = pm
+        self.path = path or CACHE_DIR / f"availability-{pm}.json"
+        self.ttl = ttl
+        self.root = root
+
+    def _read(self) -> Optional[Dict]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+            return None
+        if data.get("pm") != self.pm:
+            return None
+        if time.time() - data.get("created", 0) > self.ttl:
+            return None
+        if data.get("signature") != index_signature(self.pm, self.root):
+            return None
+        packages = data.get("packages")
+        return data if isinstance(packages, dict) else None
+
+    def load(self) -> Dict[str, Optional[str]]:
+        """Cached answers, or {} if the cache is missing, expired or stale"""
+        data = self._read()
+        return dict(data["packages"]) if data else {}
+
+    def store(self, answers: Dict[str, Optional[str]]):
+        """Merge ``answers`` into the cache (best effort; unwritable caches are ignored)"""
+        if not answers:
+            return
+        data = self._read()
+        if data is None:
+            data = {
+                "version": _CACHE_VERSION,
+                "pm": self.pm,
+                "created": time.time(),
+                "signature": index_signature(self.pm, self.root),
+                "packages": {},
+            }
+        data["packages"].update(answers)
+
+        import tempfile
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".availability-", dir=str(self.path.parent))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+        except OSError:
+            pass
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
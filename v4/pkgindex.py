@@ -0,0 +1,870 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Native Package Indexes
+In-process readers for package manager metadata, so availability checks
+don't fork the package manager at all.
+
+apt:     /var/lib/apt/lists/*_Packages (native architecture and ``all``) plus
+         /var/lib/dpkg/status are memory-mapped and scanned once.
+pacman:  /var/lib/pacman/sync/*.db tar archives are streamed ``desc`` by
+         ``desc``; the first repository in pacman.conf order wins.
+dnf/yum/zypper:
+         each cached repository's primary metadata (``primary_db`` sqlite or
+         ``primary`` xml, optionally compressed) located via repomd.xml and
+         read incrementally; the highest EVR wins.  Only caches of repos
+         enabled in the .repo files are read (the newest cache per repo id).
+
+Every reader produces the same ``name -> (candidate, installed size in KB,
+provides)`` table.  Tables are persisted under HAKPAK4_ROOT/cache and reused
+while the index files' mtimes and sizes are unchanged (see
+pkgcache.index_signature).  Formats that can't be read natively (compressed
+apt lists, zstd/zchunk metadata) make the reader return None so callers fall
+back to the package manager.
+
+apt pin priorities are not evaluated, which only affects the reported
+version, not availability.
+"""
+
+import marshal
+import mmap
+import os
+import platform
+import re
+import stat
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from hakpak4 import CACHE_DIR
+from pkgcache import REPO_CONFIG_GLOBS, index_signature
+
+
+_INDEX_VERSION = 2
+
+# platform.machine() -> Debian architecture
+_DEB_ARCH = {
+    "x86_64": "amd64", "amd64": "amd64",
+    "aarch64": "arm64", "arm64": "arm64",
+    "armv7l": "armhf", "armv6l": "armel",
+    "i386": "i386", "i686": "i386",
+    "ppc64le": "ppc64el", "s390x": "s390x", "riscv64": "riscv64",
+}
+
+# apt can be configured to keep lists compressed; those are not read natively.
+_COMPRESSED_SUFFIXES = (".gz", ".xz", ".lz4", ".zst", ".bz2", ".lzma")
+
+_DEB_FIELD = re.compile(
+    rb"^(Package|Version|Installed-Size|Provides|Status|Architecture):[ \t]*([^\n]*)$", re.M)
+
+
+# Record layout shared by every reader: (candidate version, installed size in KB, provides)
+PackageRecord = Tuple[str, int, Tuple[str, ...]]
+
+
+class PackageIndex:
+    """``name -> PackageRecord`` plus installed versions for one package manager"""
+
+    def __init__(self, pm: str, packages: Dict[str, PackageRecord],
+                 installed: Optional[Dict[str, str]] = None):
+        self.pm = pm
+        self.packages = packages
+        self.installed = installed or {}
+        self._providers: Optional[Dict[str, List[str]]] = None
+
+    def candidate(self, name: str) -> Optional[str]:
+        """Candidate version, or None if ``name`` is not installable (virtual/unknown)"""
+        record = self.packages.get(name)
+        if record is not None:
+            return record[0]
+        return self.installed.get(name)
+
+    def candidates(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {name: self.candidate(name) for name in names}
+
+    def installed_size_kb(self, name: str) -> Optional[int]:
+        record = self.packages.get(name)
+        return record[1] if record is not None else None
+
+    def providers(self, name: str) -> List[str]:
+        """Real packages whose Provides include ``name``"""
+        if self._providers is None:
+            providers: Dict[str, List[str]] = {}
+            for pkg, record in self.packages.items():
+                for virtual in record[2]:
+                    providers.setdefault(virtual, []).append(pkg)
+            self._providers = providers
+        return self._providers.get(name, [])
+
+
+# ── Debian version ordering ───────────────────────────────────────────────────
+
+def _order(ch: str) -> int:
+    if ch == "~":
+        return -1
+    if ch.isdigit():
+        return 0
+    if ch.isalpha():
+        return ord(ch)
+    return ord(ch) + 256
+
+
+def _verrevcmp(a: str, b: str) -> int:
+    """dpkg's verrevcmp() for the upstream-version / revision parts"""
+    i = j = 0
+    while i < len(a) or j < len(b):
+        first_diff = 0
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            ac = _order(a[i]) if i < len(a) else 0
+            bc = _order(b[j]) if j < len(b) else 0
+            if ac != bc:
+                return ac - bc
+            i += 1
+            j += 1
+        while i < len(a) and a[i] == "0":
+            i += 1
+        while j < len(b) and b[j] == "0":
+            j += 1
+        while i < len(a) and a[i].isdigit() and j < len(b) and b[j].isdigit():
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+        if i < len(a) and a[i].isdigit():
+            return 1
+        if j < len(b) and b[j].isdigit():
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def _split_deb_version(version: str) -> Tuple[int, str, str]:
+    epoch, _, rest = version.rpartition(":") if ":" in version else ("0", "", version)
+    upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "")
+    try:
+        epoch_num = int(epoch or 0)
+    except ValueError:
+        epoch_num = 0
+    return epoch_num, upstream, revision
+
+
+def compare_deb_versions(a: str, b: str) -> int:
+    """Negative, zero or positive as Debian version ``a`` is lower, equal or higher than ``b``"""
+    ea, ua, ra = _split_deb_version(a)
+    eb, ub, rb = _split_deb_version(b)
+    if ea != eb:
+        return ea - eb
+    return _verrevcmp(ua, ub) or _verrevcmp(ra, rb)
+
+
+# ── apt / dpkg ────────────────────────────────────────────────────────────────
+
+def deb_architecture() -> Optional[str]:
+    return _DEB_ARCH.get(platform.machine().lower())
+
+
+def _iter_deb_stanzas(path: Path) -> Iterator[Dict[bytes, bytes]]:
+    """Yield the interesting fields of each stanza of a Packages/status file"""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return
+    try:
+        fields: Dict[bytes, bytes] = {}
+        for m in _DEB_FIELD.finditer(mm):
+            key = m.group(1)
+            if key == b"Package" and fields:
+                yield fields
+                fields = {}
+            fields[key] = m.group(2).strip()
+        if fields:
+            yield fields
+    finally:
+        mm.close()
+
+
+def _parse_provides(value: bytes) -> Tuple[str, ...]:
+    names = []
+    for item in value.decode(errors="ignore").split(","):
+        name = item.split("(", 1)[0].strip()
+        if name:
+            names.append(name)
+    return tuple(names)
+
+
+def _apt_list_files(lists_dir: Path, arch: Optional[str]) -> Optional[List[Path]]:
+    """Uncompressed Packages lists for ``arch`` and ``all``; None if some are compressed"""
+    files = []
+    try:
+        entries = sorted(os.listdir(lists_dir))
+    except OSError:
+        return []
+    for name in entries:
+        if "_Packages" not in name:
+            continue
+        if name.endswith(_COMPRESSED_SUFFIXES):
+            return None
+        if arch and "_binary-" in name and not (
+                f"_binary-{arch}_" in name or "_binary-all_" in name):
+            continue
+        files.append(lists_dir / name)
+    return files
+
+
+def read_apt_lists(files: List[Path]) -> Dict[str, PackageRecord]:
+    """Highest version of each package across the given Packages files"""
+    packages: Dict[str, PackageRecord] = {}
+    for path in files:
+        for fields in _iter_deb_stanzas(path):
+            name = fields.get(b"Package", b"").decode(errors="ignore")
+            version = fields.get(b"Version", b"").decode(errors="ignore")
+            if not name or not version:
+                continue
+            current = packages.get(name)
+            if current is not None and compare_deb_versions(version, current[0]) <= 0:
+                continue
+            try:
+                size = int(fields.get(b"Installed-Size", b"0"))
+            except ValueError:
+                size = 0
+            packages[name] = (version, size, _parse_provides(fields.get(b"Provides", b"")))
+    return packages
+
+
+def read_dpkg_status(path: Path, arch: Optional[str] = None) -> Dict[str, PackageRecord]:
+    """Installed packages from a dpkg status file (foreign architectures as name:arch)"""
+    installed: Dict[str, PackageRecord] = {}
+    for fields in _iter_deb_stanzas(path):
+        if not fields.get(b"Status", b"").endswith(b" installed"):
+            continue
+        name = fields.get(b"Package", b"").decode(errors="ignore")
+        version = fields.get(b"Version", b"").decode(errors="ignore")
+        if not name or not version:
+            continue
+        pkg_arch = fields.get(b"Architecture", b"").decode(errors="ignore")
+        if arch and pkg_arch not in ("", "all", arch):
+            name = f"{name}:{pkg_arch}"
+        try:
+            size = int(fields.get(b"Installed-Size", b"0"))
+        except ValueError:
+            size = 0
+        installed[name] = (version, size, _parse_provides(fields.get(b"Provides", b"")))
+    return installed
+
+
+def _build_apt(root: Path) -> Optional[Tuple[Dict[str, PackageRecord], Dict[str, str]]]:
+    lists_dir = root / "var/lib/apt/lists"
+    status_path = root / "var/lib/dpkg/status"
+    if not lists_dir.is_dir() and not status_path.exists():
+        return None
+    arch = deb_architecture()
+    files = _apt_list_files(lists_dir, arch)
+    if files is None:
+        return None
+    packages = read_apt_lists(files)
+    installed = {name: record[0] for name, record in read_dpkg_status(status_path, arch).items()}
+    for name, version in installed.items():
+        current = packages.get(name)
+        if current is None or compare_deb_versions(version, current[0]) > 0:
+            packages[name] = (version, current[1] if current else 0, current[2] if current else ())
+    return packages, installed
+
+
+# ── pacman ────────────────────────────────────────────────────────────────────
+
+def _parse_pacman_desc(text: str) -> Dict[str, List[str]]:
+    """``%KEY%`` sections of a pacman desc file -> list of value lines"""
+    sections: Dict[str, List[str]] = {}
+    key = None
+    for line in text.splitlines():
+        if line.startswith("%") and line.endswith("%") and len(line) > 2:
+            key = line[1:-1]
+            sections[key] = []
+        elif key is not None and line:
+            sections[key].append(line)
+    return sections
+
+
+def _pacman_record(sections: Dict[str, List[str]]) -> Optional[Tuple[str, PackageRecord]]:
+    name = (sections.get("NAME") or [""])[0]
+    version = (sections.get("VERSION") or [""])[0]
+    if not name or not version:
+        return None
+    try:
+        size_kb = int((sections.get("ISIZE") or ["0"])[0]) // 1024
+    except ValueError:
+        size_kb = 0
+    provides = tuple(p.split("=", 1)[0].split("<", 1)[0].split(">", 1)[0]
+                     for p in sections.get("PROVIDES", []))
+    return name, (version, size_kb, provides)
+
+
+def read_pacman_sync_db(path: Path) -> Optional[Dict[str, PackageRecord]]:
+    """Stream the ``desc`` entries of one sync database (None if unreadable)"""
+    import tarfile
+    packages: Dict[str, PackageRecord] = {}
+    try:
+        with tarfile.open(str(path), mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith("/desc"):
+                    continue
+                f = tar.extractfile(member)
+                if f is None:
+                    continue
+                parsed = _pacman_record(_parse_pacman_desc(f.read().decode(errors="ignore")))
+                if parsed:
+                    packages[parsed[0]] = parsed[1]
+    except (OSError, tarfile.TarError, EOFError):
+        return None
+    return packages
+
+
+def read_pacman_local(local_dir: Path) -> Dict[str, str]:
+    """Installed packages from /var/lib/pacman/local/<name-ver>/desc"""
+    installed: Dict[str, str] = {}
+    try:
+        entries = list(os.scandir(local_dir))
+    except OSError:
+        return installed
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        try:
+            text = Path(entry.path, "desc").read_text(errors="ignore")
+        except OSError:
+            continue
+        parsed = _pacman_record(_parse_pacman_desc(text))
+        if parsed:
+            installed[parsed[0]] = parsed[1][0]
+    return installed
+
+
+def _pacman_repo_order(root: Path) -> List[str]:
+    """Repository names in pacman.conf order"""
+    repos = []
+    try:
+        text = (root / "etc/pacman.conf").read_text(errors="ignore")
+    except OSError:
+        return repos
+    for match in re.finditer(r"^\s*\[([^\]]+)\]", text, re.M):
+        if match.group(1) != "options":
+            repos.append(match.group(1))
+    return repos
+
+
+def _build_pacman(root: Path) -> Optional[Tuple[Dict[str, PackageRecord], Dict[str, str]]]:
+    sync_dir = root / "var/lib/pacman/sync"
+    dbs = {p.name[:-3]: p for p in sorted(sync_dir.glob("*.db"))}
+    if not dbs:
+        return None
+    order = [r for r in _pacman_repo_order(root) if r in dbs]
+    order += [r for r in dbs if r not in order]
+
+    packages: Dict[str, PackageRecord] = {}
+    for repo in order:
+        repo_packages = read_pacman_sync_db(dbs[repo])
+        if repo_packages is None:
+            return None
+        for name, record in repo_packages.items():
+            # pacman takes a package from the first repository that has it
+            packages.setdefault(name, record)
+    return packages, read_pacman_local(root / "var/lib/pacman/local")
+
+
+# ── rpm repodata (dnf / yum / zypper) ─────────────────────────────────────────
+
+_RPM_SEGMENT = re.compile(r"[0-9]+|[a-zA-Z]+|~|\^")
+
+_REPO_NS = "{http://linux.duke.edu/metadata/repo}"
+_COMMON_NS = "{http://linux.duke.edu/metadata/common}"
+_RPM_NS = "{http://linux.duke.edu/metadata/rpm}"
+
+_RPM_REPODATA_GLOBS = {
+    "dnf": ["var/cache/dnf/*/repodata", "var/cache/libdnf5/*/repodata"],
+    "yum": ["var/cache/dnf/*/repodata", "var/cache/yum/*/*/*"],
+    "zypper": ["var/cache/zypp/raw/*/repodata"],
+}
+
+
+def _rpmvercmp(a: str, b: str) -> int:
+    """rpm's rpmvercmp(): alternating numeric/alpha segments, ``~`` sorts first, ``^`` after"""
+    if a == b:
+        return 0
+    sa = _RPM_SEGMENT.findall(a)
+    sb = _RPM_SEGMENT.findall(b)
+    for x, y in zip(sa, sb):
+        if x == y:
+            continue
+        if x == "~" or y == "~":
+            return -1 if x == "~" else 1
+        if x == "^" or y == "^":
+            # A caret sorts after the end of the version, but before any further segment
+            return -1 if x == "^" else 1
+        if x.isdigit() != y.isdigit():
+            # A numeric segment is always newer than an alpha one
+            return 1 if x.isdigit() else -1
+        if x.isdigit():
+            x, y = x.lstrip("0"), y.lstrip("0")
+            if len(x) != len(y):
+                return len(x) - len(y)
+        return -1 if x < y else 1
+    rest_a, rest_b = sa[len(sb):], sb[len(sa):]
+    if rest_a:
+        return -1 if rest_a[0] == "~" else 1
+    if rest_b:
+        return 1 if rest_b[0] == "~" else -1
+    return 0
+
+
+def compare_rpm_versions(a: str, b: str) -> int:
+    """Compare ``[epoch:]version-release`` strings the way rpm does"""
+    def split(evr: str) -> Tuple[int, str, str]:
+        epoch, _, rest = evr.partition(":") if ":" in evr else ("0", "", evr)
+        version, _, release = rest.rpartition("-") if "-" in rest else (rest, "", "")
+        return int(epoch) if epoch.isdigit() else 0, version, release
+    ea, va, ra = split(a)
+    eb, vb, rb = split(b)
+    if ea != eb:
+        return ea - eb
+    return _rpmvercmp(va, vb) or _rpmvercmp(ra, rb)
+
+
+def _format_evr(epoch: Optional[str], version: str, release: str) -> str:
+    evr = f"{version}-{release}" if release else version
+    return f"{epoch}:{evr}" if epoch and epoch != "0" else evr
+
+
+def _rpm_arches() -> set:
+    machine = platform.machine().lower()
+    arches = {machine, "noarch"}
+    if machine == "x86_64":
+        arches |= {"i686", "i586", "i386"}
+    return arches
+
+
+def _open_compressed(path: Path):
+    """Binary file object for ``path``, transparently decompressing gz/bz2/xz"""
+    name = path.name
+    if name.endswith(".gz"):
+        import gzip
+        return gzip.open(str(path), "rb")
+    if name.endswith(".bz2"):
+        import bz2
+        return bz2.open(str(path), "rb")
+    if name.endswith(".xz"):
+        import lzma
+        return lzma.open(str(path), "rb")
+    if name.endswith((".zst", ".zck")):
+        return None
+    return open(path, "rb")
+
+
+def _repomd_primary(repodata: Path) -> Optional[Path]:
+    """Local primary metadata file for a repository (sqlite preferred), or None"""
+    import xml.etree.ElementTree as ET
+    try:
+        tree = ET.parse(str(repodata / "repomd.xml"))
+    except (OSError, ET.ParseError):
+        return None
+    locations = {}
+    for data in tree.getroot().iter(f"{_REPO_NS}data"):
+        location = data.find(f"{_REPO_NS}location")
+        if location is not None:
+            locations[data.get("type")] = location.get("href", "")
+    for kind in ("primary_db", "primary"):
+        href = locations.get(kind)
+        if not href:
+            continue
+        path = repodata.parent / href
+        if not path.exists():
+            path = repodata / Path(href).name
+        if path.exists() and not path.name.endswith((".zst", ".zck")):
+            return path
+    return None
+
+
+def read_rpm_primary_xml(path: Path, arches: set) -> Optional[Dict[str, PackageRecord]]:
+    """Incrementally parse a primary.xml[.gz|.bz2|.xz] file"""
+    import xml.etree.ElementTree as ET
+    f = _open_compressed(path)
+    if f is None:
+        return None
+    packages: Dict[str, PackageRecord] = {}
+    try:
+        with f:
+            for _, elem in ET.iterparse(f, events=("end",)):
+                if elem.tag != f"{_COMMON_NS}package":
+                    continue
+                if elem.get("type") == "rpm":
+                    name = elem.findtext(f"{_COMMON_NS}name") or ""
+                    arch = elem.findtext(f"{_COMMON_NS}arch") or ""
+                    ver = elem.find(f"{_COMMON_NS}version")
+                    if name and arch in arches and ver is not None:
+                        evr = _format_evr(ver.get("epoch"), ver.get("ver", ""), ver.get("rel", ""))
+                        size = elem.find(f"{_COMMON_NS}size")
+                        size_kb = int(size.get("installed", "0") or 0) // 1024 if size is not None else 0
+                        provides_elem = elem.find(f"{_COMMON_NS}format/{_RPM_NS}provides")
+                        entries = [] if provides_elem is None else provides_elem
+                        provides = tuple(dict.fromkeys(
+                            e.get("name") for e in entries
+                            if e.get("name") and e.get("name") != name
+                        ))
+                        _merge_rpm(packages, name, (evr, size_kb, provides))
+                elem.clear()
+    except (OSError, EOFError, ET.ParseError, ValueError):
+        return None
+    return packages
+
+
+def read_rpm_primary_sqlite(path: Path, arches: set) -> Optional[Dict[str, PackageRecord]]:
+    """Read a primary_db (sqlite, optionally bz2/xz/gz compressed) file"""
+    import sqlite3
+    import tempfile
+    packages: Dict[str, PackageRecord] = {}
+    tmp = None
+    try:
+        db_path = path
+        if path.suffix in (".bz2", ".xz", ".gz"):
+            f = _open_compressed(path)
+            fd, tmp = tempfile.mkstemp(suffix=".sqlite")
+            with os.fdopen(fd, "wb") as out, f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+            db_path = Path(tmp)
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            provides: Dict[int, List[str]] = {}
+            for pkg_key, prov in conn.execute("SELECT pkgKey, name FROM provides"):
+                provides.setdefault(pkg_key, []).append(prov)
+            rows = conn.execute("SELECT pkgKey, name, arch, epoch, version, release, "
+                                "size_installed FROM packages")
+            for pkg_key, name, arch, epoch, version, release, size in rows:
+                if arch not in arches:
+                    continue
+                evr = _format_evr(epoch, version or "", release or "")
+                record = (evr, int(size or 0) // 1024,
+                          tuple(p for p in dict.fromkeys(provides.get(pkg_key, [])) if p != name))
+                _merge_rpm(packages, name, record)
+        finally:
+            conn.close()
+    except (OSError, EOFError, sqlite3.Error, ValueError):
+        return None
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+    return packages
+
+
+def _merge_rpm(packages: Dict[str, PackageRecord], name: str, record: PackageRecord):
+    current = packages.get(name)
+    if current is None or compare_rpm_versions(record[0], current[0]) > 0:
+        packages[name] = record
+
+
+def _enabled_rpm_repos(root: Path, pm: str) -> Optional[set]:
+    """Ids of the repos enabled in ``pm``'s .repo files, or None if there are none to read"""
+    import configparser
+    import glob
+    files = [p for pattern in REPO_CONFIG_GLOBS[pm] for p in sorted(glob.glob(str(root / pattern)))]
+    if not files:
+        return None
+    enabled = set()
+    for path in files:
+        parser = configparser.RawConfigParser(strict=False)
+        try:
+            parser.read(path)
+        except (OSError, configparser.Error):
+            return None
+        for section in parser.sections():
+            if parser.get(section, "enabled", fallback="1").strip().lower() in ("1", "true", "yes"):
+                enabled.add(section)
+    return enabled
+
+
+def _rpm_repo_id(repodata: Path) -> str:
+    """Repo id of a metadata cache directory"""
+    if repodata.name != "repodata":
+        return repodata.name                    # yum: var/cache/yum/<arch>/<release>/<repoid>
+    if repodata.parent.parent.name == "raw":
+        return repodata.parent.name             # zypper: var/cache/zypp/raw/<alias>
+    return repodata.parent.name.rsplit("-", 1)[0]   # dnf: var/cache/dnf/<repoid>-<hash>
+
+
+def _build_rpm(root: Path, pm: str) -> Optional[Tuple[Dict[str, PackageRecord], Dict[str, str]]]:
+    import glob
+    enabled = _enabled_rpm_repos(root, pm)
+    if enabled is None:
+        return None
+    # Leftover caches of disabled repos or an older release must not count;
+    # for a repo cached more than once (e.g. before an upgrade) the newest wins
+    newest: Dict[str, Tuple[int, Path]] = {}
+    for pattern in _RPM_REPODATA_GLOBS[pm]:
+        for p in sorted(glob.glob(str(root / pattern))):
+            try:
+                mtime = os.stat(os.path.join(p, "repomd.xml")).st_mtime_ns
+            except OSError:
+                continue
+            repo_id = _rpm_repo_id(Path(p))
+            if repo_id in enabled and mtime >= newest.get(repo_id, (-1, None))[0]:
+                newest[repo_id] = (mtime, Path(p))
+    repodata_dirs = [path for _, path in sorted(newest.values())]
+    if not repodata_dirs:
+        return None
+
+    arches = _rpm_arches()
+    packages: Dict[str, PackageRecord] = {}
+    for repodata in repodata_dirs:
+        primary = _repomd_primary(repodata)
+        if primary is None:
+            return None
+        if ".sqlite" in primary.name:
+            repo_packages = read_rpm_primary_sqlite(primary, arches)
+        else:
+            repo_packages = read_rpm_primary_xml(primary, arches)
+        if repo_packages is None:
+            return None
+        for name, record in repo_packages.items():
+            _merge_rpm(packages, name, record)
+    return packages, {}
+
+
+# ── Index persistence ─────────────────────────────────────────────────────────
+
+def _read_trusted(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            # Only trust index files nobody else could have rewritten.
+            if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) or st.st_uid not in (0, os.getuid()):
+                return None
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return data if isinstance(data, dict) and data.get("version") == _INDEX_VERSION else None
+
+
+def _write_index(path: Path, data: Dict):
+    import tempfile
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".pkgindex-", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(data, f)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+    except OSError:
+        pass
+
+
+_BUILDERS = {
+    "apt": _build_apt,
+    "pacman": _build_pacman,
+    "dnf": lambda root: _build_rpm(root, "dnf"),
+    "yum": lambda root: _build_rpm(root, "yum"),
+    "zypper": lambda root: _build_rpm(root, "zypper"),
+}
+
+
+def load_index(pm: str, root: Path = Path("/"),
+               cache_path: Optional[Path] = None) -> Optional[PackageIndex]:
+    """
+    PackageIndex for ``pm`` from the persisted copy if the package manager's
+    index files are unchanged, else rebuilt from them.  None if the metadata
+    is missing or can't be read natively, in which case callers ask the
+    package manager.
+    """
+    builder = _BUILDERS.get(pm)
+    if builder is None:
+        return None
+    cache_path = cache_path or CACHE_DIR / f"{pm}-index.marshal"
+    arch = platform.machine().lower()
+    signature = index_signature(pm, root)
+    cached = _read_trusted(cache_path)
+    if cached and cached.get("signature") == signature and cached.get("arch") == arch:
+        return PackageIndex(pm, cached["packages"], cached["installed"])
+
+    built = builder(root)
+    if built is None:
+        return None
+    packages, installed = built
+    _write_index(cache_path, {
+        "version": _INDEX_VERSION,
+        "signature": signature,
+        "arch": arch,
+        "packages": packages,
+        "installed": installed,
+    })
+    return PackageIndex(pm, packages, installed)
+
+
+def native_index(pm: str, root: Path = Path("/")) -> Optional[PackageIndex]:
+    """In-process index for ``pm``, or None if it has to be queried via subprocess"""
+    if os.environ.get("HAKPAK4_NATIVE_INDEX", "1") == "0":
+        return None
+    return load_index(pm, root)
+
+
+# ── Installed packages ────────────────────────────────────────────────────────
+
+# rpmdb locations: the sqlite backend is read natively, Berkeley DB / ndb via ``rpm -qa``.
+_RPMDB_SQLITE = ["var/lib/rpm/rpmdb.sqlite", "usr/lib/sysimage/rpm/rpmdb.sqlite"]
+_RPMDB_OTHER = ["var/lib/rpm/Packages", "var/lib/rpm/Packages.db"]
+
+# Local package database of each package manager, relative to the root.
+INSTALLED_DBS: Dict[str, List[str]] = {
+    "apt": ["var/lib/dpkg/status"],
+    "pacman": ["var/lib/pacman/local"],
+    "dnf": _RPMDB_SQLITE + _RPMDB_OTHER,
+    "yum": _RPMDB_SQLITE + _RPMDB_OTHER,
+    "zypper": _RPMDB_SQLITE + _RPMDB_OTHER,
+}
+
+_RPMTAG_NAME, _RPMTAG_VERSION, _RPMTAG_RELEASE, _RPMTAG_EPOCH = 1000, 1001, 1002, 1003
+_RPM_INT32, _RPM_STRING = 4, 6
+
+# (pm, root) -> (database signature, installed packages)
+_installed_memo: Dict[Tuple[str, str], Tuple[List, Dict[str, str]]] = {}
+
+
+def _installed_signature(pm: str, root: Path) -> List[List]:
+    """``[path, mtime_ns, size]`` of the local package database (plus sqlite WAL)"""
+    signature = []
+    for rel in INSTALLED_DBS.get(pm, []):
+        for suffix in ("", "-wal"):
+            try:
+                st = os.stat(root / (rel + suffix))
+            except OSError:
+                continue
+            signature.append([rel + suffix, st.st_mtime_ns, st.st_size])
+    return signature
+
+
+def rpm_header_fields(blob: bytes) -> Dict[int, object]:
+    """NAME/VERSION/RELEASE/EPOCH tags of an rpm header blob as stored in rpmdb.sqlite"""
+    import struct
+    fields: Dict[int, object] = {}
+    if len(blob) < 8:
+        return fields
+    count, data_len = struct.unpack_from(">II", blob, 0)
+    data_start = 8 + count * 16
+    if data_start + data_len > len(blob):
+        return fields
+    for i in range(count):
+        tag, kind, offset, n = struct.unpack_from(">IIII", blob, 8 + i * 16)
+        if tag not in (_RPMTAG_NAME, _RPMTAG_VERSION, _RPMTAG_RELEASE, _RPMTAG_EPOCH):
+            continue
+        start = data_start + offset
+        if kind == _RPM_STRING:
+            end = blob.find(b"\0", start, data_start + data_len)
+            if end >= 0:
+                fields[tag] = blob[start:end].decode(errors="ignore")
+        elif kind == _RPM_INT32 and n >= 1 and start + 4 <= data_start + data_len:
+            fields[tag] = struct.unpack_from(">i", blob, start)[0]
+    return fields
+
+
+def read_rpmdb_sqlite(path: Path) -> Optional[Dict[str, str]]:
+    """Installed packages from an rpmdb.sqlite ``Packages`` table"""
+    import sqlite3
+    installed: Dict[str, str] = {}
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for (blob,) in conn.execute("SELECT blob FROM Packages"):
+                fields = rpm_header_fields(bytes(blob))
+                name = fields.get(_RPMTAG_NAME)
+                if not name or name == "gpg-pubkey":
+                    continue
+                epoch = fields.get(_RPMTAG_EPOCH)
+                installed[name] = _format_evr(str(epoch) if epoch else None,
+                                              fields.get(_RPMTAG_VERSION, ""),
+                                              fields.get(_RPMTAG_RELEASE, ""))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return installed
+
+
+def _read_rpmdb_query(root: Path) -> Optional[Dict[str, str]]:
+    """``rpm -qa`` for Berkeley DB / ndb rpmdbs that can't be read natively"""
+    import subprocess
+    cmd = ["rpm", "-qa", "--qf", "%{NAME}\\t%{EPOCHNUM}:%{VERSION}-%{RELEASE}\\n"]
+    if root != Path("/"):
+        cmd[1:1] = ["--root", str(root)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120,
+                                env=dict(os.environ, LC_ALL="C"))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    installed: Dict[str, str] = {}
+    for line in result.stdout.splitlines():
+        name, _, evr = line.partition("\t")
+        if name and name != "gpg-pubkey":
+            installed[name] = evr[2:] if evr.startswith("0:") else evr
+    return installed
+
+
+def _read_installed(pm: str, root: Path) -> Optional[Dict[str, str]]:
+    if pm == "apt":
+        status = root / "var/lib/dpkg/status"
+        if not status.exists():
+            return None
+        records = read_dpkg_status(status, deb_architecture())
+        return {name: record[0] for name, record in records.items()}
+    if pm == "pacman":
+        local = root / "var/lib/pacman/local"
+        return read_pacman_local(local) if local.is_dir() else None
+    if pm in ("dnf", "yum", "zypper"):
+        for rel in _RPMDB_SQLITE:
+            if (root / rel).exists():
+                return read_rpmdb_sqlite(root / rel)
+        if any((root / rel).exists() for rel in _RPMDB_OTHER):
+            return _read_rpmdb_query(root)
+    return None
+
+
+def installed_packages(pm: str, root: Path = Path("/"),
+                       cache_path: Optional[Path] = None) -> Optional[Dict[str, str]]:
+    """
+    ``package -> installed version`` from the local package database of
+    ``pm``, read once and then reused (in-process and from
+    HAKPAK4_ROOT/cache) until the database's mtime or size changes.  None
+    if there is no readable database for ``pm``.
+    """
+    signature = _installed_signature(pm, root)
+    if not signature:
+        return None
+    key = (pm, str(root))
+    memo = _installed_memo.get(key)
+    if memo and memo[0] == signature:
+        return memo[1]
+
+    cache_path = cache_path or CACHE_DIR / f"installed-{pm}.marshal"
+    cached = _read_trusted(cache_path)
+    if cached and cached.get("signature") == signature and cached.get("root") == str(root):
+        installed = cached["installed"]
+    else:
+        installed = _read_installed(pm, root)
+        if installed is None:
+            return None
+        _write_index(cache_path, {
+            "version": _INDEX_VERSION,
+            "signature": signature,
+            "root": str(root),
+            "installed": installed,
+        })
+    _installed_memo[key] = (signature, installed)
+    return installed
@@ -117,6 +117,1066 @@ else
     test_fail "Import errors (may be normal without PyYAML)"
 fi
 
+# Test 11: Compiled catalog cache
+echo -n "Testing compiled catalog cache... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" python3 -c "import sys; sys.path.insert(0, '$SCRIPT_DIR'); from catalog import load_compiled_catalog as l; a = l(); b = l(); assert a.tools.keys() == b.tools.keys() and a.sha256 == b.sha256" 2>/dev/null && \
+   [[ -f "$CACHE_ROOT/cache/kali-tools-db.cache" ]]; then
+    test_pass "Catalog compiled and reused"
+else
+    test_fail "Catalog cache not created (PyYAML may not be installed)"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 12: SQLite catalog backend agrees with InstallParams.matches
+echo -n "Testing SQLite catalog backend... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" HAKPAK4_CATALOG_BACKEND=sqlite python3 - "$SCRIPT_DIR" <<'PY' 2>/dev/null
+import sys
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import CompatibilityScorer, InstallParams, SystemInfo
+from catalog import ToolCatalog
+si = SystemInfo("Ubuntu", "22.04", "ubuntu", "debian", "5.15", "x86_64", 4,
+                8192, 512, 500.0, 0.05, "apt")
+cat = ToolCatalog.get()
+for params in (InstallParams(), InstallParams(min_compatibility=60, max_size_mb=50),
+               InstallParams(max_ram_mb=256, tags_filter=["web"], exclude_tags=["scanner"])):
+    expected = [t.name for t in cat.tools.values() if params.matches(t, si)]
+    assert [t.name for t in cat.filter_tools(params, si)] == expected
+assert cat.sqlite().match_names("scan") == [
+    t.name for t in cat.tools.values() if "scan" in t.name or any("scan" in g for g in t.tags)]
+# Both backends score exactly like CompatibilityScorer.score_tool
+view, db = cat.columns(), cat.sqlite()
+for si in (si,
+           SystemInfo("Kali", "2024", "kali", "debian", "6.6", "x86_64", 8, 16384, 96, 500.0, 2.0, "apt"),
+           SystemInfo("Arch", "rolling", "arch", "", "6.9", "x86_64", 2, 1024, 300, 0.3, 0.1, "pacman"),
+           SystemInfo("Fedora", "40", "fedora", "", "6.8", "x86_64", 4, 300, 150, 2.0, 0.5, "dnf"),
+           SystemInfo("Alpine", "3.20", "alpine", "", "6.6", "x86_64", 1, 64, 32, 0.05, 0.0, "apk")):
+    expected = {t.name: CompatibilityScorer.score_tool(t, si) for t in cat.tools.values()}
+    assert view.score_table(si) == expected
+    for score in set(expected.values()):
+        band = InstallParams(min_compatibility=score, max_compatibility=score)
+        assert db.filter_names(band, si) == [n for n, s in expected.items() if s == score]
+PY
+then
+    test_pass "SQLite filters and search match in-memory results"
+else
+    test_fail "SQLite catalog backend mismatch"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 13: -t launcher path resolves tools without argparse errors
+echo -n "Testing -t launcher path... "
+CACHE_ROOT="$(mktemp -d)"
+OUTPUT="$(HAKPAK4_ROOT="$CACHE_ROOT" python3 "$SCRIPT_DIR/hakpak4_core.py" -t __no_such_tool__ -x --flag 2>&1)"
+RC=$?
+if [[ $RC -eq 1 ]] && echo "$OUTPUT" | grep -q "Unknown tool '__no_such_tool__'" && \
+   HAKPAK4_ROOT="$CACHE_ROOT" python3 "$SCRIPT_DIR/hakpak4_core.py" -t nmpa 2>&1 | grep -q "Did you mean: nmap"; then
+    test_pass "Launcher lookup and suggestions work"
+else
+    test_fail "Launcher lookup failed (rc=$RC)"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 14: Columnar filter engine agrees with InstallParams.matches and score ranking
+echo -n "Testing columnar filter engine... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" python3 - "$SCRIPT_DIR" <<'PY' 2>/dev/null
+import sys
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import CompatibilityScorer, InstallParams, SystemInfo
+from catalog import ToolCatalog
+cat = ToolCatalog.get()
+view = cat.columns()
+for si in (SystemInfo("Ubuntu", "22.04", "ubuntu", "debian", "5.15", "x86_64", 4,
+                      8192, 512, 500.0, 0.05, "apt"),
+           SystemInfo("Kali", "2024", "kali", "debian", "6.6", "x86_64", 8,
+                      16384, 96, 500.0, 2.0, "apt")):
+    for params in (InstallParams(), InstallParams(min_compatibility=60, max_size_mb=50),
+                   InstallParams(max_compatibility=80, max_ram_mb=256,
+                                 tags_filter=["web", "network"], exclude_tags=["scanner"])):
+        expected = [t.name for t in cat.tools.values() if params.matches(t, si)]
+        assert view.names_in(view.filter_mask(params, si)) == expected
+    ranked = sorted(cat.tools.values(), key=lambda t: CompatibilityScorer.score_tool(t, si),
+                    reverse=True)
+    assert view.ranked_names(view.all_mask, si, limit=25) == [t.name for t in ranked[:25]]
+    tools = list(cat.tools.values())
+    expected = {t.name: CompatibilityScorer.score_tool(t, si) for t in tools}
+    assert cat.scores(tools, si, cat.generation) == expected and view.has_score_table(si)
+    assert cat.scores(tools[:3], si, cat.generation - 1) == {t.name: expected[t.name] for t in tools[:3]}
+    assert CompatibilityScorer.score_all(tools, si) == expected
+PY
+then
+    test_pass "Bitmap filters, ranking and score_all match per-tool scoring"
+else
+    test_fail "Columnar filter engine mismatch"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 15: hakpak4 query agrees with InstallParams filtering
+echo -n "Testing query subcommand... "
+CACHE_ROOT="$(mktemp -d)"
+QUERY_OUT="$(HAKPAK4_ROOT="$CACHE_ROOT" python3 "$SCRIPT_DIR/hakpak4_core.py" query \
+    'tag:web size<=50 compat>=70' -tag:scanner --os kali --pm apt --ram 4096 --disk 40 \
+    --format names 2>/dev/null)"
+EXPECTED="$(HAKPAK4_ROOT="$CACHE_ROOT" python3 - "$SCRIPT_DIR" <<'PY' 2>/dev/null
+import sys
+sys.path.insert(0, sys.argv[1])
+from dataclasses import replace
+from hakpak4 import InstallParams, OSDetector, Shell
+from catalog import ToolCatalog
+si = replace(OSDetector.get_system_info(Shell()), os_id="kali", package_manager="apt",
+             available_ram_mb=4096, available_disk_gb=40.0)
+params = InstallParams(min_compatibility=70, max_size_mb=50, tags_filter=["web"],
+                       exclude_tags=["scanner"])
+print("\n".join(t.name for t in ToolCatalog.get().tools.values() if params.matches(t, si)))
+PY
+)"
+# Negated terms starting with "h" must not be taken for -h
+NEGATED_OUT="$(HAKPAK4_ROOT="$CACHE_ROOT" python3 "$SCRIPT_DIR/hakpak4_core.py" query \
+    -hydra tag:password --os kali --pm apt --ram 4096 --disk 40 --format names 2>/dev/null)"
+if [[ -n "$QUERY_OUT" ]] && [[ "$QUERY_OUT" == "$EXPECTED" ]] && [[ -n "$NEGATED_OUT" ]] \
+        && ! grep -q -e "^hydra$" -e "^usage:" <<<"$NEGATED_OUT"; then
+    test_pass "Query results match InstallParams filtering"
+else
+    test_fail "Query subcommand mismatch"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 16: Batched package availability (one query per call, then served from cache)
+echo -n "Testing batched package availability... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" HAKPAK4_NATIVE_INDEX=0 python3 - "$SCRIPT_DIR" <<'PY' 2>/dev/null
+import subprocess, sys
+sys.path.insert(0, sys.argv[1])
+from dataclasses import replace
+from hakpak4 import Shell, SystemInfo
+from hakpak4_core import PackageInstaller
+
+OUTPUT = {
+    "apt-cache": "nmap:\n  Installed: (none)\n  Candidate: 7.94\nvirt:\n  Candidate: (none)\n",
+    "dnf": "Available Packages\nnmap.x86_64    3:7.92-1.fc39    fedora\n",
+    "pacman": "Repository      : extra\nName            : nmap\nVersion         : 7.95-1\n",
+    "zypper": "Information for package nmap:\n----\nName : nmap\npackage 'virt' not found.\n",
+}
+
+class RecordingShell(Shell):
+    calls = []
+    def probe_all(self, cmds):
+        self.calls.extend(cmds)
+        return [subprocess.CompletedProcess(cmd, 0, OUTPUT[cmd[2]], "") for cmd in cmds]
+
+base = SystemInfo("Test", "1", "test", "", "", "x86_64", 1, 1024, 512, 10.0, 5.0, "apt")
+for pm in ("apt", "dnf", "pacman", "zypper"):
+    shell = RecordingShell()
+    shell.calls.clear()
+    installer = PackageInstaller(shell, replace(base, package_manager=pm))
+    got = installer.packages_available(["nmap", "virt", "missing", "nmap"])
+    assert got == {"nmap": True, "virt": False, "missing": False}, (pm, got)
+    assert installer.is_package_available("nmap") and len(shell.calls) == 1, pm
+    # A new process (installer) reuses the on-disk answers
+    shell.calls.clear()
+    again = PackageInstaller(shell, replace(base, package_manager=pm))
+    assert again.packages_available(["nmap", "virt"]) == {"nmap": True, "virt": False}
+    assert not shell.calls, pm
+PY
+then
+    test_pass "One package-manager call answers a batch; repeats hit the cache"
+else
+    test_fail "Batched package availability broken"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 17: Native apt index from fixture lists (no apt-cache)
+echo -n "Testing native apt index... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" python3 - "$SCRIPT_DIR" "$CACHE_ROOT" <<'PY' 2>/dev/null
+import sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from pkgindex import compare_deb_versions, deb_architecture, load_index
+
+root = Path(sys.argv[2]) / "fs"
+lists = root / "var/lib/apt/lists"
+lists.mkdir(parents=True)
+arch = deb_architecture() or "amd64"
+(lists / f"mirror_dists_main_binary-{arch}_Packages").write_text(
+    "Package: nmap\nVersion: 7.93+dfsg1-1\nInstalled-Size: 4500\n"
+    "Description: scanner\n Package: not-a-field\n\n"
+    "Package: nmap\nVersion: 7.94+git20230807-2\nInstalled-Size: 4600\n\n"
+    "Package: mawk\nVersion: 1.3.4-1\nProvides: awk\n")
+(lists / "mirror_dists_main_binary-zz99_Packages").write_text("Package: foreign\nVersion: 1\n")
+(root / "var/lib/dpkg").mkdir(parents=True)
+(root / "var/lib/dpkg/status").write_text(
+    "Package: localtool\nStatus: install ok installed\nVersion: 2:1.0\n\n"
+    "Package: removed\nStatus: deinstall ok config-files\nVersion: 1.0\n")
+
+assert compare_deb_versions("1.0~rc1", "1.0") < 0 < compare_deb_versions("1:0.9", "2.0")
+assert compare_deb_versions("1.0-2", "1.0-10") < 0 and compare_deb_versions("1.0a", "1.0") > 0
+cache = Path(sys.argv[2]) / "apt-index.marshal"
+for _ in range(2):  # build, then reuse the persisted index
+    index = load_index("apt", root, cache)
+    assert index.candidates(["nmap", "awk", "mawk", "localtool", "removed", "foreign"]) == {
+        "nmap": "7.94+git20230807-2", "awk": None, "mawk": "1.3.4-1",
+        "localtool": "2:1.0", "removed": None, "foreign": None}
+    assert index.installed_size_kb("nmap") == 4600 and index.providers("awk") == ["mawk"]
+    assert cache.exists()
+PY
+then
+    test_pass "Packages/status lists indexed in-process"
+else
+    test_fail "Native apt index mismatch"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 18: Native pacman sync DB and rpm repodata indexes from fixtures
+echo -n "Testing native pacman/rpm indexes... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" python3 - "$SCRIPT_DIR" "$CACHE_ROOT" <<'PY' 2>/dev/null
+import gzip, io, platform, sqlite3, sys, tarfile
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from pkgindex import compare_rpm_versions, load_index
+
+tmp = Path(sys.argv[2])
+arch = platform.machine().lower()
+
+# pacman: two repos, pacman.conf order decides which copy wins
+root = tmp / "pacman"
+sync = root / "var/lib/pacman/sync"
+sync.mkdir(parents=True)
+(root / "etc").mkdir()
+(root / "etc/pacman.conf").write_text("[options]\nArchitecture = auto\n[core]\n[extra]\n")
+def sync_db(path, entries):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, version, extra in entries:
+            data = f"%NAME%\n{name}\n\n%VERSION%\n{version}\n\n%ISIZE%\n2048000\n\n{extra}".encode()
+            info = tarfile.TarInfo(f"{name}-{version}/desc")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+sync_db(sync / "extra.db", [("nmap", "7.95-1", "%PROVIDES%\nncat=7.95\n"), ("gawk", "5.3-1", "")])
+sync_db(sync / "core.db", [("gawk", "5.2-1", "%PROVIDES%\nawk\n")])
+local = root / "var/lib/pacman/local/bash-5.2-1"
+local.mkdir(parents=True)
+(local / "desc").write_text("%NAME%\nbash\n\n%VERSION%\n5.2-1\n")
+for _ in range(2):
+    index = load_index("pacman", root, tmp / "pacman-index.marshal")
+    assert index.candidates(["nmap", "gawk", "ncat", "missing"]) == {
+        "nmap": "7.95-1", "gawk": "5.2-1", "ncat": None, "missing": None}
+    assert index.providers("ncat") == ["nmap"] and index.installed_size_kb("nmap") == 2000
+    assert index.installed == {"bash": "5.2-1"}
+
+# rpm: an xml primary repo and a primary_db repo
+C, R = "http://linux.duke.edu/metadata/common", "http://linux.duke.edu/metadata/rpm"
+def repomd(repodata, kind, href):
+    repodata.mkdir(parents=True)
+    (repodata / "repomd.xml").write_text(
+        '<repomd xmlns="http://linux.duke.edu/metadata/repo">'
+        f'<data type="{kind}"><location href="{href}"/></data></repomd>')
+def pkg(name, epoch, ver, rel, pkg_arch, provides=()):
+    entries = "".join(f'<rpm:entry name="{p}"/>' for p in provides)
+    return (f'<package type="rpm"><name>{name}</name><arch>{pkg_arch}</arch>'
+            f'<version epoch="{epoch}" ver="{ver}" rel="{rel}"/><size installed="4096000"/>'
+            f'<format><rpm:provides>{entries}</rpm:provides></format></package>')
+root = tmp / "dnf"
+repomd(root / "var/cache/dnf/fedora-1/repodata", "primary", "repodata/p-primary.xml.gz")
+with gzip.open(root / "var/cache/dnf/fedora-1/repodata/p-primary.xml.gz", "wt") as f:
+    f.write(f'<metadata xmlns="{C}" xmlns:rpm="{R}">'
+            + pkg("nmap", "2", "7.92", "1.fc39", arch, ["nmap", "ncat"])
+            + pkg("nmap", "2", "7.92", "1.fc39", "src")
+            + pkg("hydra", "0", "9.4", "1", "s390x-foreign") + "</metadata>")
+repomd(root / "var/cache/dnf/updates-2/repodata", "primary_db", "repodata/p-primary.sqlite")
+db = sqlite3.connect(str(root / "var/cache/dnf/updates-2/repodata/p-primary.sqlite"))
+db.execute("CREATE TABLE packages (pkgKey INTEGER, name TEXT, arch TEXT, epoch TEXT, "
+           "version TEXT, release TEXT, size_installed INTEGER)")
+db.execute("CREATE TABLE provides (pkgKey INTEGER, name TEXT)")
+db.executemany("INSERT INTO packages VALUES (?,?,?,?,?,?,?)", [
+    (1, "nmap", arch, "2", "7.92", "3.fc39", 4200000), (2, "nmap", arch, "1", "9.0", "1", 1),
+    (3, "sqlmap", "noarch", "0", "1.8", "1", 1024)])
+db.executemany("INSERT INTO provides VALUES (?,?)", [(1, "ncat"), (3, "sqlmap")])
+db.commit()
+db.close()
+# Without repo definitions the package manager is asked instead
+assert load_index("dnf", root, tmp / "dnf-index.marshal") is None
+(root / "etc/yum.repos.d").mkdir(parents=True)
+(root / "etc/yum.repos.d/fedora.repo").write_text(
+    "[fedora]\nname=Fedora\n\n[updates]\nname=Updates\nenabled=1\n\n[old]\nenabled=0\n")
+# A cache left by the disabled repo is ignored
+repomd(root / "var/cache/dnf/old-3/repodata", "primary", "repodata/p-primary.xml.gz")
+with gzip.open(root / "var/cache/dnf/old-3/repodata/p-primary.xml.gz", "wt") as f:
+    f.write(f'<metadata xmlns="{C}" xmlns:rpm="{R}">' + pkg("hydra", "0", "9.4", "1", arch) + "</metadata>")
+for _ in range(2):
+    index = load_index("dnf", root, tmp / "dnf-index.marshal")
+    assert index.candidates(["nmap", "sqlmap", "hydra", "ncat"]) == {
+        "nmap": "2:7.92-3.fc39", "sqlmap": "1.8-1", "hydra": None, "ncat": None}
+    assert index.providers("ncat") == ["nmap"] and index.installed_size_kb("nmap") == 4101
+
+assert compare_rpm_versions("1.0~rc1-1", "1.0-1") < 0 < compare_rpm_versions("1:0.9-1", "2.0-1")
+assert compare_rpm_versions("1.0^git1-1", "1.0-1") > 0 and compare_rpm_versions("1.10-1", "1.9-1") > 0
+assert compare_rpm_versions("1.0^git1-1", "1.0.1-1") < 0 < compare_rpm_versions("1.0.1-1", "1.0^git1-1")
+assert compare_rpm_versions("1.0a-1", "1.0.1-1") < 0 and compare_rpm_versions("2.0-1", "2.0-1") == 0
+PY
+then
+    test_pass "pacman sync DBs and rpm repodata indexed in-process"
+else
+    test_fail "Native pacman/rpm index mismatch"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 19: Installed-package detection from local package databases
+echo -n "Testing installed-package detection... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" python3 - "$SCRIPT_DIR" "$CACHE_ROOT" <<'PY' 2>/dev/null
+import os, sqlite3, struct, sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+import pkgindex
+from catalog import ToolCatalog
+from pkgindex import installed_packages
+
+tmp = Path(sys.argv[2])
+root = tmp / "fs"
+(root / "var/lib/dpkg").mkdir(parents=True)
+status = root / "var/lib/dpkg/status"
+status.write_text("Package: nmap\nStatus: install ok installed\nVersion: 7.94-1\n\n"
+                  "Package: hydra\nStatus: deinstall ok config-files\nVersion: 9.4-1\n")
+assert installed_packages("apt", root) == {"nmap": "7.94-1"}
+status.write_text(status.read_text().replace("deinstall ok config-files", "install ok installed"))
+os.utime(status, ns=(1, 1))  # the database changed: re-read despite the memo
+assert installed_packages("apt", root) == {"nmap": "7.94-1", "hydra": "9.4-1"}
+
+(root / "var/lib/pacman/local/sqlmap-1.8-1").mkdir(parents=True)
+(root / "var/lib/pacman/local/sqlmap-1.8-1/desc").write_text("%NAME%\nsqlmap\n\n%VERSION%\n1.8-1\n")
+assert installed_packages("pacman", root) == {"sqlmap": "1.8-1"}
+
+def header(tags):
+    index, data = b"", b""
+    for tag, kind, value in tags:
+        index += struct.pack(">IIII", tag, kind, len(data), 1)
+        data += struct.pack(">i", value) if kind == 4 else value.encode() + b"\0"
+    return struct.pack(">II", len(tags), len(data)) + index + data
+(root / "var/lib/rpm").mkdir(parents=True)
+db = sqlite3.connect(str(root / "var/lib/rpm/rpmdb.sqlite"))
+db.execute("CREATE TABLE Packages (hnum INTEGER PRIMARY KEY, blob BLOB NOT NULL)")
+db.executemany("INSERT INTO Packages (blob) VALUES (?)", [
+    (header([(1000, 6, "john"), (1001, 6, "1.9.0"), (1002, 6, "2.fc39"), (1003, 4, 1)]),),
+    (header([(1000, 6, "wireshark"), (1001, 6, "4.2"), (1002, 6, "1")]),),
+    (header([(1000, 6, "gpg-pubkey"), (1001, 6, "x"), (1002, 6, "y")]),)])
+db.commit()
+db.close()
+assert installed_packages("dnf", root) == {"john": "1:1.9.0-2.fc39", "wireshark": "4.2-1"}
+assert installed_packages("apt", tmp / "empty") is None
+
+# Catalog mapping: state.json first, then the package database, PATH only without a native package
+cat = ToolCatalog.get()
+pkgindex.installed_packages = lambda pm, root=Path("/"): {"nmap": "7.94-1"}
+looked_up = []
+sources = cat.installed_sources("apt", lambda b: looked_up.append(b) and None)
+assert sources == {"nmap": "package"}
+assert looked_up and all("apt" not in t.packages for t in cat.tools.values() if t.binary in looked_up)
+PY
+then
+    test_pass "dpkg/pacman/rpmdb databases read once and mapped onto the catalog"
+else
+    test_fail "Installed-package detection mismatch"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 20: PATH executable index answers like shutil.which
+echo -n "Testing PATH executable index... "
+BIN_ROOT="$(mktemp -d)"
+if python3 - "$SCRIPT_DIR" "$BIN_ROOT" <<'PY' 2>/dev/null
+import os, shutil, sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import PathIndex
+
+first, second = Path(sys.argv[2]) / "a", Path(sys.argv[2]) / "b"
+for d in (first, second):
+    d.mkdir()
+def make(path, mode=0o755):
+    path.write_text("#!/bin/sh\n")
+    path.chmod(mode)
+make(first / "tool")
+make(second / "tool")
+make(second / "other")
+make(second / "plain", 0o644)
+os.environ["PATH"] = f"{first}:{second}"
+
+index = PathIndex()
+index.REVALIDATE_INTERVAL = 0
+for name in ("tool", "other", "plain", "missing", "sh", ""):
+    assert index.which(name) == shutil.which(name), name
+assert index.which("tool") == str(first / "tool")
+make(second / "new")                      # directory mtime changes -> rescanned
+assert index.which("new") == str(second / "new")
+(first / "tool").unlink()
+assert index.which("tool") == str(second / "tool")
+os.environ["PATH"] = str(second)
+assert index.which("other") == str(second / "other")
+PY
+then
+    test_pass "PATH directories scanned once, rescanned on change"
+else
+    test_fail "PATH index disagrees with shutil.which"
+fi
+rm -rf "$BIN_ROOT"
+
+# Test 21: Concurrent probe pool (limit, timeout, de-duplication)
+echo -n "Testing concurrent probe pool... "
+PROBE_ROOT="$(mktemp -d)"
+if python3 - "$SCRIPT_DIR" "$PROBE_ROOT" <<'PY' 2>/dev/null
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import ProbePool
+
+log = f"{sys.argv[2]}/runs"
+sleepers = [["sh", "-c", f"sleep 0.4; echo {i}"] for i in range(4)]
+counted = ["sh", "-c", f"echo run >> {log}; echo counted"]
+start = time.monotonic()
+results = ProbePool(concurrency=4, timeout=10).run(sleepers + [counted] * 3 + [["no-such-probe-binary"]])
+assert time.monotonic() - start < 1.2                      # 4 sleeps overlap
+assert [r.stdout.strip() for r in results[:7]] == ["0", "1", "2", "3"] + ["counted"] * 3
+assert open(log).read() == "run\n"                        # identical commands run once
+assert results[7].returncode == 127
+
+start = time.monotonic()
+slow = ProbePool(concurrency=1, timeout=0.3).run([["sleep", "5"], ["echo", "ok"]])
+assert slow[0].returncode == 124 and slow[1].stdout == "ok\n" and time.monotonic() - start < 3
+PY
+then
+    test_pass "Probes overlap up to the limit, time out, and run once per command"
+else
+    test_fail "Probe pool misbehaves"
+fi
+rm -rf "$PROBE_ROOT"
+
+# Test 22: Progressive tool list (renders before availability queries finish)
+echo -n "Testing progressive tool list... "
+CACHE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$CACHE_ROOT" HAKPAK4_NATIVE_INDEX=0 python3 - "$SCRIPT_DIR" <<'PY' 2>/dev/null
+import io, re, shutil, subprocess, sys, threading
+sys.path.insert(0, sys.argv[1])
+import hakpak4_core
+from catalog import ToolCatalog
+from hakpak4 import Shell, SystemInfo
+
+release = threading.Event()
+class SlowShell(Shell):
+    def probe_all(self, cmds):
+        release.wait(10)
+        # every package whose name has an even length is available
+        return [subprocess.CompletedProcess(cmd, 0, "".join(
+            f"{p}:\n  Candidate: {'1.0' if len(p) % 2 == 0 else '(none)'}\n" for p in cmd[4:]), "")
+            for cmd in cmds]
+hakpak4_core.Shell = SlowShell
+hakpak4_core.PackageInstaller.PROGRESS_CHUNK = 4
+
+si = SystemInfo("Test", "1", "test", "", "", "x86_64", 1, 1024, 512, 10.0, 5.0, "apt")
+tools = [t for t in ToolCatalog.get().tools.values() if t.packages.get("apt")][:12]
+def expected(t):
+    if len(t.packages["apt"]) % 2 == 0:
+        return "Native/APT"
+    return "HakPak Wrapper" if t.source else "N/A"
+
+class Terminal(io.StringIO):
+    def isatty(self):
+        return True
+shutil.get_terminal_size = lambda fallback=None: (120, 60)
+tty = Terminal()
+worker = threading.Thread(target=hakpak4_core.print_tool_list, args=(tools, si, "Tools"), kwargs={"out": tty})
+worker.start()
+worker.join(0.5)
+# The whole table is on screen before any query has answered
+assert worker.is_alive() and tty.getvalue().count("pending...") == len(tools)
+release.set()
+worker.join(10)
+rewrites = re.findall(r"\x1b\[\d+A\r\x1b\[2K(\S+).*?(Native/APT|HakPak Wrapper|N/A)", tty.getvalue())
+assert {name: kind for name, kind in rewrites} == {t.name: expected(t) for t in tools}
+
+piped = io.StringIO()                       # not a TTY: rows stream in order, no placeholders
+hakpak4_core.print_tool_list(tools, si, "Tools", out=piped)
+by_name = {t.name: t for t in tools}
+rows = [l for l in piped.getvalue().splitlines() if l.split() and l.split()[0] in by_name]
+assert [r.split()[0] for r in rows] == sorted(by_name) and "pending" not in piped.getvalue()
+assert all(f" {expected(by_name[r.split()[0]])} " in r for r in rows)
+PY
+then
+    test_pass "Table renders immediately; Type cells fill in as probes finish"
+else
+    test_fail "Progressive tool list broken"
+fi
+rm -rf "$CACHE_ROOT"
+
+# Test 23: Native packages install in one transaction; failures are bisected out
+echo -n "Testing single-transaction native installs... "
+if python3 - "$SCRIPT_DIR" <<'PY' >/dev/null 2>&1
+import subprocess, sys
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import Shell, SystemInfo
+from hakpak4_core import PackageInstaller
+
+BROKEN = {"p3": 100}
+LOCKED = []
+class TransactionShell(Shell):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+    def run(self, cmd, check=True, capture=False):
+        self.calls.append(cmd)
+        code = 100 if LOCKED else next((BROKEN[p] for p in cmd if p in BROKEN), 0)
+        stderr = "E: Could not get lock /var/lib/dpkg/lock-frontend\n" if LOCKED else "E: broken\n"
+        if code and check:
+            raise subprocess.CalledProcessError(code, cmd, "", stderr)
+        return subprocess.CompletedProcess(cmd, code, "", stderr if code else "")
+
+si = SystemInfo("Test", "1", "test", "", "", "x86_64", 1, 1024, 512, 10.0, 5.0, "dnf")
+packages = [f"p{i}" for i in range(16)]
+shell = TransactionShell()
+installed, failed = PackageInstaller(shell, si).install_transaction(packages + ["p1"])
+assert failed == ["p3"] and sorted(installed) == sorted(set(packages) - set(BROKEN))
+assert len(shell.calls) <= 1 + 2 * 4          # log2(16) bisection levels
+
+# Bad packages in both halves (same exit code) are still isolated
+BROKEN.update({"p10": 100})
+installed, failed = PackageInstaller(TransactionShell(), si).install_transaction(packages)
+assert sorted(failed) == ["p10", "p3"] and sorted(installed) == sorted(set(packages) - set(BROKEN))
+
+# A lock or network error stops the bisection at the first attempt
+LOCKED.append(True)
+shell = TransactionShell()
+installed, failed = PackageInstaller(shell, si).install_transaction(packages)
+assert failed == packages and installed == [] and len(shell.calls) == 2
+LOCKED.clear()
+
+# apt's --allow-downgrades retry runs for the whole transaction only
+del BROKEN["p10"]
+apt = SystemInfo("Test", "1", "test", "", "", "x86_64", 1, 1024, 512, 10.0, 5.0, "apt")
+installer = PackageInstaller(TransactionShell(), apt)
+installer.install_transaction(packages[:4])
+assert sum("--allow-downgrades" in cmd for cmd in installer.shell.calls) == 1
+
+BROKEN.clear()
+shell = TransactionShell()
+assert PackageInstaller(shell, si).install_transaction(packages) == (packages, [])
+assert len(shell.calls) == 1                  # 16 packages, one transaction
+PY
+then
+    test_pass "One transaction for all packages; failing packages isolated"
+else
+    test_fail "Native install transaction broken"
+fi
+
+# Test 24: Parallel source-install scheduler (DAG order, package-manager lock, prefixed output)
+echo -n "Testing parallel install scheduler... "
+JOB_ROOT="$(mktemp -d)"
+if python3 - "$SCRIPT_DIR" "$JOB_ROOT" <<'PY' 2>/dev/null
+import io, sys, time
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import Shell
+from install_scheduler import DependencyFailed, Job, JobScheduler
+
+root = Path(sys.argv[2])
+fake_dpkg = root / "dpkg"                  # basename marks it as a package-manager command
+fake_dpkg.write_text(f"#!/bin/sh\necho start >> {root}/pm.log; sleep 0.2; echo end >> {root}/pm.log\n")
+fake_dpkg.chmod(0o755)
+order = []
+
+def build(name):
+    def action(shell):
+        shell.run(["sh", "-c", f"sleep 0.3; echo built {name}"])
+        shell.run([str(fake_dpkg)])
+        order.append(name)
+    return action
+def broken(shell):
+    shell.run(["false"])
+
+jobs = [Job("toolchain", build("toolchain"))]
+jobs += [Job(f"tool{i}", build(f"tool{i}"), ["toolchain"]) for i in range(4)]
+jobs += [Job("bad", broken), Job("needs-bad", build("x"), ["bad"])]
+
+out, real = io.StringIO(), sys.stdout
+sys.stdout = out
+start = time.monotonic()
+try:
+    results = JobScheduler(Shell(), workers=4).run(jobs)
+finally:
+    sys.stdout = real
+elapsed = time.monotonic() - start
+
+assert order[0] == "toolchain" and sorted(order[1:]) == [f"tool{i}" for i in range(4)]
+assert elapsed < 2.0                                    # 5 x 0.3s builds overlap after the toolchain
+assert (root / "pm.log").read_text() == "start\nend\n" * 5   # package-manager steps never overlap
+assert all(results[f"tool{i}"] is None for i in range(4)) and results["bad"] is not None
+assert isinstance(results["needs-bad"], DependencyFailed)
+assert "[tool2    ] built tool2" in out.getvalue().splitlines()
+try:
+    JobScheduler(Shell(), workers=2).run([Job("a", broken, ["b"]), Job("b", broken, ["a"])])
+    raise AssertionError("cycle not detected")
+except ValueError:
+    pass
+PY
+then
+    test_pass "Independent jobs overlap; prerequisites and package-manager lock honoured"
+else
+    test_fail "Install scheduler broken"
+fi
+rm -rf "$JOB_ROOT"
+
+# Test 25: Download-ahead prefetch (git mirrors, archives)
+echo -n "Testing download-ahead prefetch... "
+FETCH_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$FETCH_ROOT/root" python3 - "$SCRIPT_DIR" "$FETCH_ROOT" <<'PY' >/dev/null 2>&1
+import functools, http.server, subprocess, sys, threading
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import HAKPAK4_ROOT, Shell, SystemInfo, Tool, ToolCategory, ToolMetrics
+from hakpak4_core import DownloadPrefetcher, _checkout_source
+
+tmp = Path(sys.argv[2])
+repo = tmp / "upstream"
+git = ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(repo)]
+subprocess.run(["git", "init", "-q", str(repo)], check=True)
+(repo / "tool.sh").write_text("echo hi\n")
+subprocess.run(git + ["add", "tool.sh"], check=True)
+subprocess.run(git + ["commit", "-qm", "init"], check=True)
+(tmp / "www").mkdir()
+(tmp / "www/tool.deb").write_bytes(b"!<arch>\n" + b"x" * 4096)
+server = http.server.ThreadingHTTPServer(
+    ("127.0.0.1", 0), functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp / "www")))
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def tool(name, source):
+    return Tool(name, name, ToolCategory.CUSTOM, "", {}, source, [], ToolMetrics(1, 0, 64, 0), None, [])
+cloned = tool("cloned", {"type": "git-bash", "repo": str(repo), "entry": "tool.sh"})
+deb = tool("debtool", {"type": "deb", "url": f"http://127.0.0.1:{server.server_address[1]}/tool.deb"})
+
+si = SystemInfo("Test", "1", "test", "", "", "x86_64", 1, 1024, 512, 10.0, 5.0, "dnf")
+prefetcher = DownloadPrefetcher(Shell(), si, workers=4)
+prefetcher.sources([cloned, deb, cloned])
+prefetcher.wait("cloned")
+prefetcher.wait("debtool")
+prefetcher.close()
+import hashlib
+from downloadcache import DOWNLOAD_CACHE_DIR, object_path
+body = (tmp / "www/tool.deb").read_bytes()
+assert object_path(hashlib.sha256(body).hexdigest()).read_bytes() == body
+assert not list((DOWNLOAD_CACHE_DIR / "partial").glob("*.part"))
+
+from gitmirror import mirror_path
+assert (mirror_path(str(repo)) / "HEAD").exists()
+server.shutdown()
+PY
+then
+    test_pass "Clones and archives fetched ahead of install"
+else
+    test_fail "Download-ahead prefetch broken"
+fi
+rm -rf "$FETCH_ROOT"
+
+# Test 26: Shared git mirror cache (clone once, later checkouts are local)
+echo -n "Testing git mirror cache... "
+MIRROR_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$MIRROR_ROOT/root" python3 - "$SCRIPT_DIR" "$MIRROR_ROOT" <<'PY' >/dev/null 2>&1
+import shutil, subprocess, sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import CACHE_DIR, Shell
+import gitmirror
+
+tmp = Path(sys.argv[2])
+repo = tmp / "upstream"
+git = ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(repo)]
+subprocess.run(["git", "init", "-q", str(repo)], check=True)
+(repo / "tool.sh").write_text("v1\n")
+subprocess.run(git + ["add", "tool.sh"], check=True)
+subprocess.run(git + ["commit", "-qm", "v1"], check=True)
+
+assert gitmirror.mirror_path("https://github.com/owner/Tool.git") == CACHE_DIR / "git/github.com/owner/Tool.git"
+assert gitmirror.mirror_path("git@gitlab.com:group/sub/tool") == CACHE_DIR / "git/gitlab.com/group/sub/tool.git"
+
+class CountingShell(Shell):
+    calls = []
+    def run(self, cmd, check=True, capture=False):
+        self.calls.append(cmd)
+        return super().run(cmd, check=check, capture=capture)
+
+shell = CountingShell()
+src = tmp / "src/tool"
+gitmirror.checkout(str(repo), src, shell)
+assert (src / "tool.sh").read_text() == "v1\n"
+assert subprocess.run(["git", "-C", str(src), "remote", "get-url", "origin"],
+                      capture_output=True, text=True).stdout.strip() == str(repo)
+
+# Upstream gone: after rm -rf src/ the tree is rebuilt from the mirror alone
+shutil.rmtree(src)
+shutil.move(str(repo), str(tmp / "moved"))
+calls = len(shell.calls)
+gitmirror.checkout(str(repo), src, shell)                  # fetched once this run: no network
+assert (src / "tool.sh").read_text() == "v1\n"
+assert not any("fetch" in c or "--mirror" in c for c in shell.calls[calls:])
+
+# A fresh run fetches new upstream commits into the mirror and pulls them from it
+shutil.move(str(tmp / "moved"), str(repo))
+(repo / "tool.sh").write_text("v2\n")
+subprocess.run(git + ["commit", "-qam", "v2"], check=True)
+gitmirror._fetched.clear()
+gitmirror.checkout(str(repo), src, shell)
+assert (src / "tool.sh").read_text() == "v2\n"
+
+import os
+os.environ["HAKPAK4_GIT_MIRRORS"] = "0"
+assert gitmirror.update_mirror(str(repo), shell) is None
+PY
+then
+    test_pass "Mirrors created once, fetched incrementally, checkouts cloned locally"
+else
+    test_fail "Git mirror cache broken"
+fi
+rm -rf "$MIRROR_ROOT"
+
+# Test 27: hakpak4 update (concurrent ls-remote, only changed tools rebuilt)
+echo -n "Testing source tool update... "
+UPDATE_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$UPDATE_ROOT/root" python3 - "$SCRIPT_DIR" "$UPDATE_ROOT" <<'PY' >/dev/null 2>&1
+import json, subprocess, sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import HAKPAK4_ROOT, STATE_FILE, Tool, ToolCategory, ToolMetrics
+import hakpak4_core
+
+tmp = Path(sys.argv[2])
+def upstream(name):
+    repo = tmp / name
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    (repo / "tool.sh").write_text("v1\n")
+    subprocess.run(["git", "-C", str(repo), "add", "tool.sh"], check=True)
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(repo),
+                    "commit", "-qm", "v1"], check=True)
+    subprocess.run(["git", "clone", "-q", str(repo), str(HAKPAK4_ROOT / "src" / name)], check=True)
+    return repo
+
+def tool(name, source):
+    return Tool(name, name, ToolCategory.CUSTOM, "", {"apt": name}, source, [], ToolMetrics(1, 0, 64, 0), None, [])
+current, behind = upstream("current"), upstream("behind")
+subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(behind),
+                "commit", "-qm", "v2", "--allow-empty"], check=True)
+tools = {
+    "current": tool("current", {"type": "git-bash", "repo": str(current), "entry": "tool.sh"}),
+    "behind": tool("behind", {"type": "python-git", "repo": str(behind)}),
+    "gone": tool("gone", {"type": "git", "repo": str(tmp / "missing")}),
+    "native": tool("native", {"type": "git", "repo": str(current)}),
+}
+STATE_FILE.write_text(json.dumps({"installed": {
+    "current": {"method": "source"}, "behind": {"method": "source"},
+    "gone": {"method": "source"}, "native": {"method": "native"}}, "custom": {}}))
+
+class Catalog:
+    @staticmethod
+    def get():
+        return type("C", (), {"tools": tools})
+rebuilt = []
+def install_sources(items, shell, system_info, outcomes, prefetcher=None):
+    for item in items:
+        rebuilt.append(item.tool.name)
+        outcomes[item.tool.name] = "installed from source"
+hakpak4_core.ToolCatalog = Catalog
+hakpak4_core._install_sources = install_sources
+
+assert hakpak4_core.cmd_update([], check_only=True) == 0 and rebuilt == []
+assert hakpak4_core.cmd_update([]) == 0 and rebuilt == ["behind"]
+assert hakpak4_core.cmd_update(["current"]) == 0 and rebuilt == ["behind"]
+assert hakpak4_core.cmd_update(["nope"]) == 1
+PY
+then
+    test_pass "Only tools behind their remote HEAD are rebuilt"
+else
+    test_fail "Source tool update broken"
+fi
+rm -rf "$UPDATE_ROOT"
+
+# Test 28: Wheelhouse (shared dependencies built once, index upgrades picked up, offline fallback)
+echo -n "Testing python wheelhouse... "
+WHEEL_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$WHEEL_ROOT/root" python3 - "$SCRIPT_DIR" "$WHEEL_ROOT" <<'PY' >/dev/null 2>&1
+import subprocess, sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import Shell
+import wheelhouse
+
+tmp = Path(sys.argv[2])
+
+class PipShell(Shell):
+    """Stands in for pip and a package index: 'wheel' builds what the wheelhouse lacks"""
+    calls, built, index, online = [], [], {}, True
+    def run(self, cmd, check=True, capture=False):
+        self.calls.append(cmd)
+        wanted = Path(cmd[-1]).read_text().split() if cmd[-2] == "-r" else [cmd[-1]]
+        if "--no-index" in cmd:
+            have = {w.name.split("-")[0] for w in wheelhouse.WHEELHOUSE_DIR.glob("*.whl")}
+            return subprocess.CompletedProcess(cmd, 0 if set(wanted) <= have else 1, "", "")
+        if not self.online:
+            return subprocess.CompletedProcess(cmd, 1, "", "")
+        if cmd[1] == "wheel":
+            out = Path(cmd[cmd.index("--wheel-dir") + 1])
+            for name in wanted:
+                wheel = f"{name}-{self.index.get(name, '1.0')}-py3-none-any.whl"
+                if not (wheelhouse.WHEELHOUSE_DIR / wheel).exists():
+                    (out / wheel).write_text(name)
+                    self.built.append(wheel)
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+shell, pip = PipShell(), tmp / "venv/bin/pip"
+for tool, reqs in [("a", "requests impacket"), ("b", "requests pycryptodome"), ("c", "impacket requests")]:
+    (tmp / f"{tool}.txt").write_text(reqs)
+    wheelhouse.upgrade_pip(pip, shell)
+    wheelhouse.pip_install(pip, ["-r", str(tmp / f"{tool}.txt")], shell)
+assert [w.split("-")[0] for w in shell.built] == ["pip", "requests", "impacket", "pycryptodome"]
+assert not list(wheelhouse.WHEELHOUSE_DIR.glob(".build-*"))
+assert all("--no-index" in c for c in shell.calls if c[1] == "install")
+
+# New releases on the index reach unpinned requirements and pip itself
+shell.index.update(pip="2.0", requests="2.0")
+wheelhouse.upgrade_pip(pip, shell)
+wheelhouse.pip_install(pip, ["-r", str(tmp / "c.txt")], shell)
+assert shell.built[4:] == ["pip-2.0-py3-none-any.whl", "requests-2.0-py3-none-any.whl"]
+
+# Offline: install from the wheelhouse without reaching for the index again
+shell.online, shell.calls[:] = False, []
+wheelhouse.pip_install(pip, ["-r", str(tmp / "b.txt")], shell)
+assert [c[1] for c in shell.calls] == ["wheel", "install"] and "--no-index" in shell.calls[-1]
+PY
+then
+    test_pass "Shared wheels built once, upgraded from the index, reused offline"
+else
+    test_fail "Python wheelhouse broken"
+fi
+rm -rf "$WHEEL_ROOT"
+
+# Test 29: Layered venvs (tool venvs see the base venv, their own packages win)
+echo -n "Testing layered base venv... "
+LAYER_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$LAYER_ROOT/root" HAKPAK4_LAYERED_VENV=1 HAKPAK4_BASE_PACKAGES="" \
+        python3 - "$SCRIPT_DIR" <<'PY' >/dev/null 2>&1
+import subprocess, sys
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import HAKPAK4_ROOT, Shell
+import venvbase
+
+class NoPipShell(Shell):
+    """Skips ensurepip so the test stays fast"""
+    def run(self, cmd, check=True, capture=False):
+        if cmd[1:3] == ["-m", "venv"]:
+            cmd = cmd + ["--without-pip"]
+        elif "pip" in cmd[0]:
+            return subprocess.CompletedProcess(cmd, 0, "", "")
+        return super().run(cmd, check=check, capture=capture)
+
+shell = NoPipShell()
+base = venvbase.ensure_base(shell)
+(base / "shared_dep.py").write_text("WHERE = 'base'\n")
+(base / "pinned_dep.py").write_text("WHERE = 'base'\n")
+
+tool_a, tool_b = HAKPAK4_ROOT / "venv/a", HAKPAK4_ROOT / "venv/b"
+assert venvbase.create_venv(tool_a, shell) == base
+assert venvbase.create_venv(tool_b, shell) == base
+(venvbase.site_packages(tool_b) / "pinned_dep.py").write_text("WHERE = 'tool'\n")
+
+def where(venv, module):
+    return subprocess.run([str(venv / "bin/python"), "-c", f"import {module}; print({module}.WHERE)"],
+                          capture_output=True, text=True, check=True).stdout.strip()
+assert where(tool_a, "shared_dep") == "base" and where(tool_b, "shared_dep") == "base"
+assert where(tool_a, "pinned_dep") == "base" and where(tool_b, "pinned_dep") == "tool"
+
+# A base built by another python3 feature release is rebuilt; patch releases keep it
+marker = venvbase.BASE_VENV_DIR / venvbase._MARKER
+minor = "%d.%d" % sys.version_info[:2]
+assert marker.read_text().startswith(f"python {minor}\n")
+marker.write_text(marker.read_text().replace(f"python {minor}", f"python {minor}.99", 1))
+venvbase.ensure_base(shell)
+assert (base / "shared_dep.py").exists()
+marker.write_text("python 2.7.18\n")
+assert venvbase.ensure_base(shell) == base and not (base / "shared_dep.py").exists()
+PY
+then
+    test_pass "Tool venvs share the base venv and override it locally"
+else
+    test_fail "Layered base venv broken"
+fi
+rm -rf "$LAYER_ROOT"
+
+# Test 30: Content-addressed download cache (hash check, Range resume, revalidation, LRU eviction)
+echo -n "Testing download cache... "
+DL_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$DL_ROOT/root" python3 - "$SCRIPT_DIR" <<'PY' >/dev/null 2>&1
+import hashlib, http.server, os, sys, threading
+sys.path.insert(0, sys.argv[1])
+import downloadcache
+from downloadcache import DownloadError, fetch, object_path
+
+FILES = {"/tool.deb": os.urandom(300_000), "/a.zip": b"a" * 4096, "/b.zip": b"b" * 4096}
+requests, cut = [], {"/tool.deb": 100_000}
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+    def do_GET(self):
+        body = FILES[self.path]
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        requests.append((self.path, self.headers.get("Range"), self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == etag:
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        stop = cut.pop(self.path, len(body))      # first response is cut short
+        self.wfile.write(body[start:stop])
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+deb = FILES["/tool.deb"]
+digest = hashlib.sha256(deb).hexdigest()
+
+# Interrupted download is kept and resumed with Range; the hash covers both parts
+try:
+    fetch(base + "/tool.deb", digest)
+    raise SystemExit("truncated download was accepted")
+except DownloadError:
+    pass
+path = fetch(base + "/tool.deb", digest)
+assert path == object_path(digest) and path.read_bytes() == deb
+assert requests[-1][1] == "bytes=100000-"
+
+# Pinned hashes are served from the cache without a request; mismatches are rejected
+count = len(requests)
+assert fetch(base + "/tool.deb", digest) == path and len(requests) == count
+try:
+    fetch(base + "/a.zip", "0" * 64)
+    raise SystemExit("hash mismatch was accepted")
+except DownloadError:
+    pass
+assert not any(object_path("0" * 64).parent.glob("*"))
+
+# Unpinned URLs are revalidated with the ETag once per run
+a = fetch(base + "/a.zip")
+downloadcache._validated.clear()
+assert fetch(base + "/a.zip") == a and requests[-1] == ("/a.zip", None, '"%s"' % hashlib.md5(FILES["/a.zip"]).hexdigest())
+
+# A changed artifact is taken from the revalidation response, without a second GET
+FILES["/a.zip"] = b"A" * 4096
+downloadcache._validated.clear()
+count = len(requests)
+a = fetch(base + "/a.zip")
+assert a.read_bytes() == FILES["/a.zip"] and len(requests) == count + 1
+
+# Least recently used objects go first when over budget; objects handed out
+# in this run are never evicted
+assert downloadcache.evict(budget_mb=0) == 0 and path.exists()
+downloadcache._handed_out.clear()           # as in a later run
+os.utime(path, (1, 1))
+b = fetch(base + "/b.zip")
+freed = downloadcache.evict(budget_mb=0.1)
+assert freed == len(deb) and not path.exists() and a.exists() and b.exists()
+downloadcache.evict(budget_mb=0)
+assert list(object_path(digest).parent.parent.glob("*/*")) == [b]
+os.environ["HAKPAK4_DOWNLOAD_CACHE_MB"] = "2G"
+assert downloadcache._cache_budget_mb() == downloadcache.DEFAULT_CACHE_BUDGET_MB
+server.shutdown()
+PY
+then
+    test_pass "Downloads verified, resumed, revalidated and evicted LRU-first"
+else
+    test_fail "Download cache broken"
+fi
+rm -rf "$DL_ROOT"
+
+# Test 31: Managed toolchain caches (shared env, job sizing, report and prune)
+echo -n "Testing toolchain caches... "
+TC_ROOT="$(mktemp -d)"
+if HAKPAK4_ROOT="$TC_ROOT/root" HAKPAK4_BIN="$TC_ROOT/bin" HAKPAK4_JOBS=2 \
+        python3 - "$SCRIPT_DIR" <<'PY' >/dev/null 2>&1
+import subprocess, sys
+sys.path.insert(0, sys.argv[1])
+from hakpak4 import BIN_LINK_DIR, CACHE_DIR, Shell, SystemInfo, Tool, ToolCategory, ToolMetrics
+import toolcaches
+from hakpak4_core import install_go_tool
+
+si = SystemInfo("Test", "1", "test", "", "", "x86_64", 8, 1024, 512, 10.0, 5.0, "apt")
+assert toolcaches.build_jobs(si) == 4                     # 8 CPUs shared by 2 install workers
+env = toolcaches.toolchain_env(si)
+assert env["GOMODCACHE"] == str(CACHE_DIR / "go/mod") and env["CARGO_HOME"] == str(CACHE_DIR / "cargo")
+assert env["GOFLAGS"] == "-p=4" and env["CARGO_BUILD_JOBS"] == "4" and env["MAKEFLAGS"] == "-j4"
+import os
+os.environ["GOFLAGS"] = "-mod=mod"                         # the user's GOFLAGS are kept
+assert toolcaches.toolchain_env(si)["GOFLAGS"] == "-mod=mod -p=4"
+del os.environ["GOFLAGS"]
+
+class GoShell(Shell):
+    calls = []
+    def which(self, name):
+        return "/usr/bin/" + name
+    def run(self, cmd, check=True, capture=False):
+        self.calls.append(cmd)
+        gobin = next(a.split("=", 1)[1] for a in cmd if a.startswith("GOBIN="))
+        from pathlib import Path
+        Path(gobin).mkdir(parents=True, exist_ok=True)
+        (Path(gobin) / "gotool").write_text("")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+tool = Tool("gotool", "gotool", ToolCategory.CUSTOM, "", {}, {"type": "go", "module": "example.com/gotool"},
+            [], ToolMetrics(1, 0, 64, 0), None, [])
+install_go_tool(tool, GoShell(), si)
+assert GoShell.calls[-1][0] == "env" and GoShell.calls[-1][-3:] == ["go", "install", "example.com/gotool@latest"]
+assert (BIN_LINK_DIR / "gotool").resolve() == (toolcaches.GO_BIN_DIR / "gotool").resolve()
+
+bundle = toolcaches.bundle_install_commands(CACHE_DIR.parent / "src/rb", si)
+assert all(f"BUNDLE_GEMFILE={CACHE_DIR.parent}/src/rb/Gemfile" in cmd for cmd in bundle)
+assert bundle[-1][-2:] == ["bundle", "install"]
+
+(CACHE_DIR / "npm").mkdir(parents=True)
+(CACHE_DIR / "npm/blob").write_bytes(b"x" * 5000)
+(CACHE_DIR / "cargo").mkdir()
+(CACHE_DIR / "cargo/crate").write_bytes(b"y" * 3000)
+sizes = {name: size for name, _, size in toolcaches.cache_report()}
+assert sizes["npm"] == 5000 and sizes["cargo"] == 3000 and sizes["git"] == 0
+with toolcaches.caches_in_use():                        # a running install blocks pruning
+    try:
+        toolcaches.prune(["npm"])
+        raise SystemExit("pruned under a running install")
+    except toolcaches.CachesBusyError:
+        pass
+assert toolcaches.prune(["npm"]) == 5000 and not any((CACHE_DIR / "npm").iterdir())
+(CACHE_DIR / "git/local/repo.git").mkdir(parents=True)
+(CACHE_DIR / "git/local/repo.git.lock").write_text("")
+(CACHE_DIR / "git/local/repo.git/HEAD").write_bytes(b"z" * 100)
+assert toolcaches.prune(["git"]) == 100 and not (CACHE_DIR / "git/local/repo.git").exists()
+assert (CACHE_DIR / "git/local/repo.git.lock").exists()   # lock files survive
+assert (CACHE_DIR / "cargo/crate").exists() and toolcaches.prune() == 3000
+try:
+    toolcaches.prune(["bogus"])
+    raise SystemExit("unknown cache accepted")
+except ValueError:
+    pass
+PY
+then
+    test_pass "Installers share one cache layout; caches reported and pruned"
+else
+    test_fail "Toolchain caches broken"
+fi
+rm -rf "$TC_ROOT"
+
 # Summary
 echo ""
 echo -e "${CYAN}================================${NC}"
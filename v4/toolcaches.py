@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Toolchain Caches
+One managed cache layout under ``HAKPAK4_ROOT/cache`` shared by every
+source installer (catalog installs and ``hakpak4 gitclone``):
+
+  go/mod      GOMODCACHE        go/build   GOCACHE
+  cargo       CARGO_HOME        npm        npm_config_cache
+  bundle      bundler gem cache pip        PIP_CACHE_DIR
+
+together with the caches kept by other modules (git mirrors, wheelhouse,
+downloads).  Build commands get these as ``env VAR=...`` prefixes, plus
+parallel job flags sized to the CPU count divided by the install worker
+count.  ``hakpak4 cache`` prints a size report; ``hakpak4 cache prune``
+empties some or all of them, and refuses to while an install (which holds
+``caches_in_use()``) is running.
+"""
+
+import fcntl
+import os
+import shutil
+import stat
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from hakpak4 import CACHE_DIR, HAKPAK4_ROOT, SystemInfo
+
+
+TOOLCHAIN_CACHES: Dict[str, Path] = {
+    "go-mod": CACHE_DIR / "go" / "mod",
+    "go-build": CACHE_DIR / "go" / "build",
+    "cargo": CACHE_DIR / "cargo",
+    "npm": CACHE_DIR / "npm",
+    "bundle": CACHE_DIR / "bundle",
+    "pip": CACHE_DIR / "pip",
+}
+
+# Caches owned by other modules, reported and pruned alongside
+OTHER_CACHES: Dict[str, Path] = {
+    "git": CACHE_DIR / "git",
+    "wheels": CACHE_DIR / "wheels",
+    "downloads": CACHE_DIR / "downloads",
+}
+
+# Go binaries are installed outside the cache so pruning never breaks them
+GO_BIN_DIR = HAKPAK4_ROOT / "go-bin"
+
+# Installs hold a shared flock on this file; ``cache prune`` needs it exclusively
+CACHE_LOCK = CACHE_DIR / "caches.lock"
+
+
+class CachesBusyError(RuntimeError):
+    """``cache prune`` while another hakpak4 process is installing"""
+
+
+@contextmanager
+def caches_in_use():
+    """
+    Shared lock held while installs read and write the caches, so
+    ``hakpak4 cache prune`` never deletes a mirror, download, wheel or
+    toolchain cache under a running install.  Without write access to the
+    cache directory (dry runs as a normal user) no lock is taken.
+    """
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        lock_file = open(CACHE_LOCK, "a")
+    except OSError:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        yield
+
+
+def all_caches() -> Dict[str, Path]:
+    return {**TOOLCHAIN_CACHES, **OTHER_CACHES}
+
+
+def build_jobs(system_info: SystemInfo) -> int:
+    """Parallel jobs for one build: the CPUs shared among concurrent install workers"""
+    from install_scheduler import install_jobs
+    return max(1, (system_info.cpu_count or 1) // install_jobs())
+
+
+def _goflags(jobs: str) -> str:
+    """The user's GOFLAGS with ``-p=N`` appended (unless they already set -p)"""
+    flags = os.environ.get("GOFLAGS", "").split()
+    if not any(f == "-p" or f.startswith("-p=") for f in flags):
+        flags.append(f"-p={jobs}")
+    return " ".join(flags)
+
+
+def toolchain_env(system_info: SystemInfo) -> Dict[str, str]:
+    jobs = str(build_jobs(system_info))
+    return {
+        "GOMODCACHE": str(TOOLCHAIN_CACHES["go-mod"]),
+        "GOCACHE": str(TOOLCHAIN_CACHES["go-build"]),
+        "GOPATH": str(CACHE_DIR / "go"),
+        "GOBIN": str(GO_BIN_DIR),
+        "GOFLAGS": _goflags(jobs),
+        "CARGO_HOME": str(TOOLCHAIN_CACHES["cargo"]),
+        "CARGO_BUILD_JOBS": jobs,
+        "npm_config_cache": str(TOOLCHAIN_CACHES["npm"]),
+        "BUNDLE_USER_CACHE": str(TOOLCHAIN_CACHES["bundle"]),
+        "BUNDLE_GLOBAL_GEM_CACHE": "true",
+        "BUNDLE_JOBS": jobs,
+        "PIP_CACHE_DIR": str(TOOLCHAIN_CACHES["pip"]),
+        "MAKEFLAGS": f"-j{jobs}",
+    }
+
+
+def with_toolchain_env(cmd: List[str], system_info: SystemInfo,
+                       extra: Optional[Dict[str, str]] = None) -> List[str]:
+    """``cmd`` prefixed with ``env`` assignments for the shared caches and job counts"""
+    env = {**toolchain_env(system_info), **(extra or {})}
+    return ["env", *(f"{k}={v}" for k, v in env.items()), *cmd]
+
+
+def bundle_install_commands(gemfile_dir: Path, system_info: SystemInfo) -> List[List[str]]:
+    """
+    Commands that install a Gemfile's gems into the app's ``vendor/bundle``
+    with ``--jobs``, fetching .gem files through the shared gem cache.  The
+    settings are stored in the app's ``.bundle/config`` so later
+    ``bundle exec`` calls from the wrappers find the gems.
+    """
+    gemfile = {"BUNDLE_GEMFILE": str(gemfile_dir / "Gemfile")}
+    return [
+        with_toolchain_env(["bundle", "config", "set", "--local", "path", "vendor/bundle"],
+                           system_info, gemfile),
+        with_toolchain_env(["bundle", "config", "set", "--local", "jobs",
+                            str(build_jobs(system_info))], system_info, gemfile),
+        with_toolchain_env(["bundle", "install"], system_info, gemfile),
+    ]
+
+
+# ── Report / prune ────────────────────────────────────────────────────────────
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def cache_report() -> List[Tuple[str, Path, int]]:
+    return [(name, path, directory_size(path)) for name, path in all_caches().items()]
+
+
+def _make_writable(func, path, _exc_info):
+    # The Go module cache is read-only by design
+    parent = os.path.dirname(path)
+    os.chmod(parent, os.stat(parent).st_mode | stat.S_IWUSR)
+    if os.path.exists(path) and not os.path.islink(path):
+        os.chmod(path, os.stat(path).st_mode | stat.S_IWUSR)
+    func(path)
+
+
+def _empty(path: Path, descend: Callable[[Path], bool], keep: Callable[[Path], bool]):
+    """
+    Delete the contents of ``path``: directories selected by ``descend`` are
+    emptied recursively (and removed if nothing was kept), files selected by
+    ``keep`` stay, everything else is removed.
+    """
+    for entry in list(path.iterdir()):
+        if entry.is_dir() and not entry.is_symlink():
+            if descend(entry):
+                _empty(entry, descend, keep)
+                if not any(entry.iterdir()):
+                    entry.rmdir()
+            else:
+                shutil.rmtree(entry, onerror=_make_writable)
+        elif not keep(entry):
+            entry.unlink()
+
+
+# Lock files other modules flock inside a cache: <repo>.git.lock next to each
+# git mirror, partial/<url-hash>.lock for downloads.  Pruning keeps them, so a
+# lock is never split between an old and a new inode.
+_PRUNE_RULES: Dict[str, Tuple[Callable[[Path], bool], Callable[[Path], bool]]] = {
+    "git": (lambda d: not d.name.endswith(".git"), lambda f: f.name.endswith(".git.lock")),
+    "downloads": (lambda d: d.name == "partial", lambda f: f.suffix == ".lock"),
+}
+
+
+def prune(names: Optional[List[str]] = None) -> int:
+    """
+    Empty the named caches (all when None); returns bytes freed.  Refuses
+    (CachesBusyError) while any hakpak4 install holds caches_in_use().
+    """
+    caches = all_caches()
+    unknown = [n for n in names or [] if n not in caches]
+    if unknown:
+        raise ValueError(f"unknown cache(s): {', '.join(unknown)}")
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_LOCK, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise CachesBusyError("an install is using the caches; try again when it has finished")
+        freed = 0
+        for name in names or list(caches):
+            path = caches[name]
+            if path.is_dir():
+                freed += directory_size(path)
+                descend, keep = _PRUNE_RULES.get(name, (lambda d: False, lambda f: False))
+                _empty(path, descend, keep)
+        return freed
+
+
+def cmd_cache(action: str, names: List[str]) -> int:
+    """Entry point for ``hakpak4 cache [report|prune [NAME...]]``"""
+    from hakpak4 import format_size
+    if action == "prune":
+        from hakpak4_core import PackageInstaller
+        PackageInstaller.ensure_root()
+        try:
+            freed = prune(names or None)
+        except (ValueError, CachesBusyError) as e:
+            print(f"ERROR: {e}")
+            return 1
+        except OSError as e:
+            print(f"ERROR: Could not prune caches: {e}")
+            return 1
+        print(f"Freed {format_size(freed / (1024 * 1024))}")
+        return 0
+
+    print(f"{'Cache':<12} {'Size':<10} Path")
+    print("-" * 72)
+    total = 0
+    for name, path, size in cache_report():
+        total += size
+        print(f"{name:<12} {format_size(size / (1024 * 1024)):<10} {path}")
+    print("-" * 72)
+    print(f"{'total':<12} {format_size(total / (1024 * 1024))}")
+    return 0
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Layered Virtualenvs
+Optional mode (``HAKPAK4_LAYERED_VENV=1``) in which python-git tools share
+one base virtualenv at ``HAKPAK4_ROOT/venv-base`` holding the common
+dependencies (``BASE_PACKAGES``, or ``HAKPAK4_BASE_PACKAGES`` as a comma
+separated list).  Each tool venv links the base site-packages with a
+``hakpak4-base.pth`` file appended after its own site-packages, so:
+
+  * requirements already satisfied by the base are not installed again;
+  * packages a tool pins differently (or that only it needs) are installed
+    into the tool's own venv and shadow the base copy.
+
+Base packages are installed once (through the wheelhouse) and never
+upgraded in place, so the versions every tool sees stay pinned.  The base
+is rebuilt when ``python3`` is no longer the version it was built with.
+"""
+
+import fcntl
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from hakpak4 import HAKPAK4_ROOT, Shell
+
+
+BASE_VENV_DIR = HAKPAK4_ROOT / "venv-base"
+BASE_PTH_NAME = "hakpak4-base.pth"
+
+# Dependencies shared by many python-git tools in the catalog
+BASE_PACKAGES = [
+    "requests", "urllib3", "impacket", "pycryptodome", "pycryptodomex",
+    "cryptography", "pyOpenSSL", "ldap3", "dnspython", "beautifulsoup4",
+    "lxml", "colorama", "termcolor", "PyYAML", "six",
+]
+
+# First line "python <major.minor>", then one installed base package per line
+_MARKER = "hakpak4-base-packages.txt"
+_base_lock = threading.Lock()
+
+
+def layered_enabled() -> bool:
+    return os.environ.get("HAKPAK4_LAYERED_VENV", "0") == "1"
+
+
+def base_packages() -> List[str]:
+    configured = os.environ.get("HAKPAK4_BASE_PACKAGES")
+    if configured is None:
+        return list(BASE_PACKAGES)
+    return [p.strip() for p in configured.split(",") if p.strip()]
+
+
+def site_packages(venv_dir: Path) -> Path:
+    """purelib directory of ``venv_dir`` (asked from its interpreter)"""
+    result = subprocess.run(
+        [str(venv_dir / "bin" / "python"), "-c",
+         "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    return Path(result.stdout.strip())
+
+
+def _minor_version(version: str) -> str:
+    """"3.11.4" -> "3.11": venvs only break across feature releases"""
+    return ".".join(version.split(".")[:2])
+
+
+def _interpreter_version() -> str:
+    """major.minor of the ``python3`` that venvs are created with"""
+    result = subprocess.run(
+        ["python3", "-c", "import platform; print(platform.python_version())"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    return _minor_version(result.stdout.strip())
+
+
+def _read_marker(marker: Path) -> Tuple[Optional[str], Set[str]]:
+    """(python major.minor, installed packages) recorded in the base venv"""
+    try:
+        lines = marker.read_text().split("\n")
+    except OSError:
+        return None, set()
+    if not lines[0].startswith("python "):
+        return None, set(" ".join(lines).split())
+    return _minor_version(lines[0].split()[1]), set(" ".join(lines[1:]).split())
+
+
+def ensure_base(shell: Shell) -> Path:
+    """Create or extend the base venv; returns its site-packages directory"""
+    from wheelhouse import pip_install, upgrade_pip
+    packages = base_packages()
+    if shell.dry_run:
+        shell.run(["python3", "-m", "venv", str(BASE_VENV_DIR)])
+        if packages:
+            pip_install(BASE_VENV_DIR / "bin" / "pip", packages, shell)
+        return BASE_VENV_DIR / "lib" / "site-packages"
+
+    with _base_lock:
+        BASE_VENV_DIR.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{BASE_VENV_DIR}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            marker = BASE_VENV_DIR / _MARKER
+            version = _interpreter_version()
+            recorded, present = _read_marker(marker)
+            if (BASE_VENV_DIR / "bin" / "python").exists() and recorded != version:
+                print(f"  Rebuilding shared base venv for Python {version}")
+                shutil.rmtree(BASE_VENV_DIR)
+                present = set()
+            if not (BASE_VENV_DIR / "bin" / "python").exists():
+                print(f"  Creating shared base venv {BASE_VENV_DIR}")
+                shell.run(["python3", "-m", "venv", str(BASE_VENV_DIR)])
+                upgrade_pip(BASE_VENV_DIR / "bin" / "pip", shell)
+            missing = [p for p in packages if p not in present]
+            if missing:
+                pip_install(BASE_VENV_DIR / "bin" / "pip", missing, shell)
+            if missing or recorded != version:
+                marker.write_text(f"python {version}\n" +
+                                  "".join(f"{p}\n" for p in sorted(present | set(missing))))
+    return site_packages(BASE_VENV_DIR)
+
+
+def create_venv(venv_dir: Path, shell: Shell) -> Optional[Path]:
+    """
+    ``python3 -m venv venv_dir``; in layered mode also link it to the base
+    venv and return the base site-packages (None otherwise).
+    """
+    shell.run(["python3", "-m", "venv", str(venv_dir)])
+    if not layered_enabled():
+        return None
+    base = ensure_base(shell)
+    if shell.dry_run:
+        print(f"[dry-run] link {venv_dir} -> {base}")
+        return base
+    (site_packages(venv_dir) / BASE_PTH_NAME).write_text(f"{base}\n")
+    return base
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+HakPak4 – Local Wheelhouse
+Shared cache of built wheels under ``HAKPAK4_ROOT/cache/wheels`` for the
+per-tool virtualenvs of python-git tools.  Requirements are resolved
+against the package index with ``pip wheel --find-links``: wheels already in
+the wheelhouse are reused, anything missing or newer (unpinned requirements,
+pip itself) is downloaded/built into a private directory and moved into the
+wheelhouse, and the venv is then installed from the wheelhouse with
+``--no-index``.  Dependencies shared by many tools (requests, impacket,
+pycryptodome, ...) are therefore built once.  When the index can't be reached
+the install falls back to whatever the wheelhouse already holds.
+
+``HAKPAK4_WHEELHOUSE=0`` restores plain ``pip install`` from the network.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List
+
+from hakpak4 import CACHE_DIR, Shell
+from toolcaches import TOOLCHAIN_CACHES
+
+
+WHEELHOUSE_DIR = CACHE_DIR / "wheels"
+
+# pip's HTTP cache lives with the other toolchain caches (toolcaches.py)
+_PIP_CACHE = ["--cache-dir", str(TOOLCHAIN_CACHES["pip"])]
+
+
+def wheelhouse_enabled() -> bool:
+    return os.environ.get("HAKPAK4_WHEELHOUSE", "1") != "0"
+
+
+def _harvest(build_dir: Path) -> int:
+    """Move newly built wheels into the wheelhouse (atomic per file); returns how many were added"""
+    added = 0
+    for wheel in build_dir.glob("*.whl"):
+        target = WHEELHOUSE_DIR / wheel.name
+        if not target.exists():
+            os.replace(wheel, target)
+            added += 1
+    return added
+
+
+def _build_wheels(pip: Path, requirements: List[str], shell: Shell) -> bool:
+    """``pip wheel`` the requirements (reusing cached wheels) and add the results to the wheelhouse"""
+    if shell.dry_run:
+        return shell.run([str(pip), "wheel", *_PIP_CACHE, "--wheel-dir", str(WHEELHOUSE_DIR),
+                          "--find-links", str(WHEELHOUSE_DIR), *requirements]).returncode == 0
+    WHEELHOUSE_DIR.mkdir(parents=True, exist_ok=True)
+    build_dir = Path(tempfile.mkdtemp(prefix=".build-", dir=str(WHEELHOUSE_DIR)))
+    try:
+        result = shell.run([str(pip), "wheel", *_PIP_CACHE, "--wheel-dir", str(build_dir),
+                            "--find-links", str(WHEELHOUSE_DIR), *requirements], check=False)
+        added = _harvest(build_dir)
+        if added:
+            print(f"  Added {added} wheel(s) to {WHEELHOUSE_DIR}")
+        return result.returncode == 0
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def pip_install(pip: Path, requirements: List[str], shell: Shell):
+    """
+    Install ``requirements`` (pip arguments, e.g. ``["-r", "requirements.txt"]``)
+    with the venv's ``pip``, resolving against the index and building through
+    the wheelhouse.
+    """
+    if not wheelhouse_enabled():
+        shell.run([str(pip), "install", *_PIP_CACHE, *requirements])
+        return
+    offline = [str(pip), "install", "--no-index", "--find-links", str(WHEELHOUSE_DIR), *requirements]
+    if _build_wheels(pip, requirements, shell):
+        shell.run(offline)
+        return
+    # Index unreachable (or something can't be built as a wheel): use what the
+    # wheelhouse already has, else let pip install it the usual way
+    if WHEELHOUSE_DIR.is_dir() and shell.run(offline, check=False, capture=True).returncode == 0:
+        print("  Installed requirements from wheelhouse (offline)")
+        return
+    shell.run([str(pip), "install", *_PIP_CACHE, "--find-links", str(WHEELHOUSE_DIR), *requirements])
+
+
+def upgrade_pip(pip: Path, shell: Shell):
+    """Upgrade the venv's pip to the index's latest via the wheelhouse (offline: the newest cached pip)"""
+    if not wheelhouse_enabled():
+        shell.run([str(pip), "install", *_PIP_CACHE, "--upgrade", "pip"])
+        return
+    _build_wheels(pip, ["pip"], shell)
+    shell.run([str(pip), "install", "--upgrade", "--no-index",
+               "--find-links", str(WHEELHOUSE_DIR), "pip"], check=False)